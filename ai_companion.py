@@ -1,26 +1,76 @@
-from typing import Optional, Dict, List
-from openai import OpenAI
+from typing import Optional, Dict, List, Iterator
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from conversation_memory import ConversationMemory
+from interaction import Interaction
+from keyword_classifier import KeywordClassifier
+from memory_store import open_store
+from session_manager import SessionManager
+from llm_scheduler import RequestScheduler
+from response_cache import ResponseCache
+from prompt_builder import PromptBuilder, PromptSection, TokenCounter
+from metrics import MetricsRegistry
 import os
 import json
+import threading
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 
-class AICompanion:
-    def __init__(self, personality_file: str = "personality.json"):
+# Replies that stand in for a failed turn start with this
+ERROR_RESPONSE_PREFIX = "I apologize, but I encountered an error: "
+
+_env_loaded = False
+
+
+def load_environment():
+    """Load .env into the environment once per process; later calls are no-ops."""
+    global _env_loaded
+    if not _env_loaded:
         load_dotenv()
+        _env_loaded = True
+
+
+class AICompanion:
+    def __init__(self, personality_file: str = "personality.json", client=None,
+                 response_cache: Optional[ResponseCache] = None, memory_backend: Optional[str] = None,
+                 session_dir: str = os.path.join("data", "sessions"), max_sessions: int = 256,
+                 scheduler_options: Optional[Dict] = None, max_session_memories: Optional[int] = None):
+        load_environment()
+        
+        self.model = "gpt-3.5-turbo"
+        self.temperature = 0.7
+        self.max_tokens = 500
+        
+        # Latency numbers for the most recent turn (seconds), plus aggregated metrics for /stats
+        self.last_turn_metrics = {}
+        self.metrics = MetricsRegistry()
         
-        # Initialize OpenAI
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # LLM calls go through a scheduler: rate limits, bounded concurrency, retries, coalescing.
+        # A pre-built client (e.g. a fake LLM) can be injected; otherwise the OpenAI client is
+        # created on the first request, keeping the openai import off the startup path.
+        self.llm = RequestScheduler(client, metrics=self.metrics, client_factory=self._create_client,
+                                    **(scheduler_options or self._scheduler_options(8)))
         
-        # Initialize components
-        self.memory = ConversationMemory()
+        # Optional cache for repeated prompts; time-sensitive queries get a short TTL (0 bypasses)
+        self.response_cache = response_cache
+        self.time_sensitive_cache_ttl = 60.0
+        
+        # Prompt size is bounded by a token budget shared by all prompt sections
+        self.prompt_builder = PromptBuilder(token_budget=3000, counter=TokenCounter(self.model))
+        self.memory_retrieval_limit = 3
         
         # Load personality from file or use default
+        self.personality_file = personality_file
         self.personality = self._load_personality(personality_file)
         
-        # Initialize user preferences
-        self.user_preferences = {}
+        # The persona block opens every system prompt. It is compiled once and kept byte-identical
+        # between turns so providers can reuse its cached prefix; modify_personality and edits to
+        # the personality file (checked at most every personality_check_interval seconds) rebuild it
+        self.personality_check_interval = 1.0
+        self._persona_prompt = None
+        self._personality_stamp = self._file_stamp(personality_file)
+        self._personality_checked = time.monotonic()
         
         # Knowledge domains and their weights (0-1)
         self.knowledge_domains = {
@@ -33,6 +83,34 @@ class AICompanion:
             "psychology": 0.8
         }
         
+        # One keyword pass per turn decides web search, topics and memory importance;
+        # trigger vocabularies can be extended in the personality file's "triggers" section
+        self.classifier = KeywordClassifier.from_config(self.personality, topics=self.knowledge_domains)
+        
+        # Initialize components; long-term memory lives in a journal, SQLite ('sqlite') or tiered store,
+        # opened on first use (or by warm_up)
+        self.memory_backend = memory_backend or os.getenv('AI_COMPANION_MEMORY_BACKEND', 'journal')
+        self.memory = ConversationMemory(
+            store_factory=lambda: open_store(self.memory_backend, "long_term_memory.json"),
+            classifier=self.classifier
+        )
+        # Other sessions get isolated memories under session_dir; only the most recent stay resident
+        self.session_dir = session_dir
+        self.sessions = SessionManager(session_dir, max_resident=max_sessions, memory_backend=self.memory_backend,
+                                       classifier=self.classifier, max_resident_memories=max_session_memories)
+        self.sessions.add('default', self.memory, pinned=True)
+        self._web_searcher = None
+        
+        # Saved conversations searchable with /search; the index is opened on first use
+        self.archive_patterns = ['conversation_*.json']
+        self.archive_index_path = os.path.join("data", "conversation_index.sqlite")
+        self._archive = None
+        
+        # Web lookups run alongside request preparation and are dropped if they miss the budget (seconds)
+        self.pipelined_web_search = True
+        self.web_search_budget = 2.5
+        self._search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="web-search")
+        
         # Command shortcuts
         self.commands = {
             "exit": self._cmd_exit,
@@ -41,7 +119,79 @@ class AICompanion:
             "load": self._cmd_load_conversation,
             "help": self._cmd_help,
             "preferences": self._cmd_preferences,
-            "summary": self._cmd_get_summary
+            "summary": self._cmd_get_summary,
+            "stats": self._cmd_stats,
+            "search": self._cmd_search
+        }
+
+    @staticmethod
+    def _create_client():
+        from openai import OpenAI
+        # The scheduler retries, behind its rate limits and honoring Retry-After
+        return OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+
+    @property
+    def client(self):
+        """The LLM client behind the scheduler, created on first use."""
+        return self.llm.client
+
+    @property
+    def web_searcher(self):
+        """Web searcher, created (and requests imported) on the first time-sensitive query."""
+        if self._web_searcher is None:
+            from web_searcher import WebSearcher
+            self._web_searcher = WebSearcher()
+        return self._web_searcher
+
+    @web_searcher.setter
+    def web_searcher(self, searcher):
+        self._web_searcher = searcher
+
+    @property
+    def archive(self):
+        """Search index over saved conversations, opened on the first /search."""
+        if self._archive is None:
+            from conversation_archive import ConversationArchive
+            self._archive = ConversationArchive(self.archive_patterns, self.archive_index_path)
+        return self._archive
+
+    @archive.setter
+    def archive(self, archive):
+        self._archive = archive
+
+    @property
+    def archive_loaded(self) -> bool:
+        return self._archive is not None
+
+    def warm_up(self) -> threading.Thread:
+        """
+        Initialize the lazily created components (LLM client, long-term memory and
+        its near-duplicate index, web searcher, tokenizer) on a background thread, so they are ready by
+        the first turn without delaying startup. Returns the thread.
+        """
+        def run():
+            try:
+                self.client
+                self.memory.store
+                self.memory.build_consolidator()
+                self.web_searcher
+                self.prompt_builder.counter.count("warm up")
+            except Exception as e:
+                print(f"Error warming up: {e}")
+
+        thread = threading.Thread(target=run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _scheduler_options(default_concurrency: int) -> Dict:
+        """Scheduler limits from AI_COMPANION_LLM_RPM / _TPM / _CONCURRENCY (rates unlimited by default)."""
+        rpm = os.getenv('AI_COMPANION_LLM_RPM')
+        tpm = os.getenv('AI_COMPANION_LLM_TPM')
+        return {
+            'max_concurrency': int(os.getenv('AI_COMPANION_LLM_CONCURRENCY', default_concurrency)),
+            'requests_per_minute': float(rpm) if rpm else None,
+            'tokens_per_minute': float(tpm) if tpm else None
         }
 
     def _load_personality(self, personality_file: str) -> Dict:
@@ -79,65 +229,356 @@ class AICompanion:
                 ]
             }
 
-    def generate_response(self, user_input: str, additional_context: Optional[Dict] = None) -> str:
+    @staticmethod
+    def _file_stamp(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload_personality_if_changed(self):
+        """Pick up edits to the personality file; a file that cannot be parsed keeps the current personality."""
+        stamp = self._file_stamp(self.personality_file)
+        if stamp == self._personality_stamp:
+            return
+        self._personality_stamp = stamp
+        try:
+            with open(self.personality_file, 'r') as f:
+                personality = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reloading personality: {str(e)}")
+            return
+        self.personality = personality
+        self._persona_prompt = None
+
+    def _persona(self) -> str:
+        """The compiled persona block of the system prompt."""
+        now = time.monotonic()
+        if now - self._personality_checked >= self.personality_check_interval:
+            self._personality_checked = now
+            self._reload_personality_if_changed()
+        persona = self._persona_prompt
+        if persona is None:
+            persona = self._persona_prompt = self._compile_persona()
+            self.metrics.increment('persona_compiles')
+        return persona
+
+    def _compile_persona(self) -> str:
+        return f"""You are {self.personality['name']}, an AI companion with the following traits: {', '.join(self.personality['traits'])}.
+You speak in a {self.personality['speaking_style']} manner.
+Your responses should be natural, engaging, and show genuine interest in the conversation.
+
+Guidelines:
+1. Be conversational and friendly while maintaining helpfulness
+2. Show empathy and understanding when appropriate
+3. Ask follow-up questions to show interest
+4. Share insights and relevant information naturally
+5. Admit when you're not sure about something
+"""
+
+    def get_memory(self, session_id: str = 'default') -> ConversationMemory:
+        """Return the memory for a session, loading it from disk if it is not resident."""
+        return self.sessions.get(session_id)
+
+    def generate_response(self, user_input: str, additional_context: Optional[Dict] = None,
+                          session_id: str = 'default') -> str:
         """Generate a response to user input using GPT and web search when needed."""
+        with self.sessions.use(session_id) as memory:
+            return self._generate_response(user_input, additional_context, memory)
+
+    def _generate_response(self, user_input: str, additional_context: Optional[Dict],
+                           memory: ConversationMemory) -> str:
         # Check for commands
         if user_input.startswith('/'):
-            return self._handle_command(user_input[1:])
+            return self._handle_command(user_input[1:], memory)
         
-        # Get conversation history and context
-        conversation_context = self.memory.get_recent_context()
-        current_context = self._build_context(user_input, additional_context)
-        
-        # Determine if web search is needed and perform search
-        web_info = self._gather_web_information(user_input) if self._needs_web_search(user_input) else ""
-        
-        # Construct the prompt for GPT
-        system_prompt = self._construct_system_prompt(web_info, current_context)
+        request = self._prepare_request(user_input, additional_context, memory)
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Previous conversation:\n{conversation_context}\n\nUser: {user_input}"}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
+            start = time.perf_counter()
+            ai_response = request['cached_response']
+            usage = None
+            if ai_response is None:
+                response = self.llm.chat.completions.create(
+                    model=self.model,
+                    messages=request['messages'],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+                ai_response = response.choices[0].message.content
+                usage = getattr(response, 'usage', None)
+                self._cache_response(request, ai_response)
             
-            ai_response = response.choices[0].message.content
+            end = time.perf_counter()
+            self.last_turn_metrics = self._turn_metrics(request, start, end, end, usage)
             
             # Save the interaction with context
-            self.memory.add_interaction(
-                user_input=user_input,
-                ai_response=ai_response,
-                context=current_context
-            )
+            with self.metrics.timer('stage_seconds', stage='memory_write'):
+                memory.add_interaction(
+                    user_input=user_input,
+                    ai_response=ai_response,
+                    context=request['context'],
+                    input_important=request['input_important']
+                )
             
             return ai_response
             
         except Exception as e:
-            return f"I apologize, but I encountered an error: {str(e)}"
+            return ERROR_RESPONSE_PREFIX + str(e)
 
-    def _needs_web_search(self, user_input: str) -> bool:
-        """Determine if the user's input requires a web search."""
-        # Keywords that might indicate need for current information
-        search_triggers = {
-            'current_events': ['news', 'current', 'latest', 'recent', 'update', 'today', 'now'],
-            'factual_queries': ['what is', 'who is', 'when did', 'where is', 'how does'],
-            'temporal': ['weather', 'price', 'stock', 'happening', 'trend'],
-            'comparative': ['versus', 'vs', 'compared to', 'difference between']
+    def generate_response_stream(self, user_input: str, additional_context: Optional[Dict] = None,
+                                 session_id: str = 'default') -> Iterator[str]:
+        """
+        Generate a response like generate_response, yielding text chunks as they arrive.
+        The completed response is saved to memory once the stream finishes.
+        """
+        with self.sessions.use(session_id) as memory:
+            yield from self._generate_response_stream(user_input, additional_context, memory)
+
+    def _generate_response_stream(self, user_input: str, additional_context: Optional[Dict],
+                                  memory: ConversationMemory) -> Iterator[str]:
+        if user_input.startswith('/'):
+            yield self._handle_command(user_input[1:], memory)
+            return
+        
+        request = self._prepare_request(user_input, additional_context, memory)
+        
+        start = time.perf_counter()
+        first_token_at = None
+        usage = None
+        parts = []
+        stream = []
+        try:
+            if request['cached_response'] is not None:
+                stream = [self._text_chunk(request['cached_response'])]
+            else:
+                stream = self.llm.chat.completions.create(
+                    model=self.model,
+                    messages=request['messages'],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            
+            for chunk in stream:
+                # With include_usage the last chunk has no choices and carries the token usage
+                usage = getattr(chunk, 'usage', None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            yield ERROR_RESPONSE_PREFIX + str(e)
+            return
+        finally:
+            # Frees the response's connection also when the consumer stops early
+            if hasattr(stream, 'close'):
+                stream.close()
+        
+        end = time.perf_counter()
+        ai_response = ''.join(parts)
+        if request['cached_response'] is None:
+            self._cache_response(request, ai_response)
+        self.last_turn_metrics = self._turn_metrics(request, start, first_token_at or end, end, usage)
+        
+        with self.metrics.timer('stage_seconds', stage='memory_write'):
+            memory.add_interaction(
+                user_input=user_input,
+                ai_response=ai_response,
+                context=request['context'],
+                input_important=request['input_important']
+            )
+
+    def _prepare_request(self, user_input: str, additional_context: Optional[Dict],
+                         memory: ConversationMemory, signals: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """
+        Build the chat messages and the context for a user turn. ``signals`` is the
+        classifier's result for ``user_input`` if the caller already computed it.
+        Returns a dict with 'messages', 'context', 'prompt_tokens', 'cache_key',
+        'time_sensitive', 'input_important', 'cached_response' (None unless the
+        response cache has a hit), 'web_search_used' and per-stage 'timings' in seconds.
+        """
+        timings = {}
+        stage_start = time.perf_counter()
+        if signals is None:
+            signals = self.classifier.classify(user_input)
+        time_sensitive = bool(signals['web_search'])
+        
+        # Start the web lookup first so it overlaps with memory retrieval and prompt building
+        search_future = None
+        if time_sensitive and self.pipelined_web_search:
+            search_future = self._search_executor.submit(self._gather_web_information, user_input)
+        search_started = time.perf_counter()
+        timings['routing'] = search_started - stage_start
+        
+        # Get conversation history, relevant long-term memories and context
+        stage_start = time.perf_counter()
+        recent_turns = memory.get_recent_turns()
+        memories = [
+            self._render_memory(item)
+            for item in memory.get_relevant_memories(user_input, limit=self.memory_retrieval_limit)
+        ]
+        timings['memory_retrieval'] = time.perf_counter() - stage_start
+        
+        stage_start = time.perf_counter()
+        current_context = self._build_context(user_input, additional_context, signals['topics'], memory)
+        timings['context'] = time.perf_counter() - stage_start
+        
+        request = {
+            'context': current_context,
+            'time_sensitive': time_sensitive,
+            'input_important': bool(signals['memory']),
+            'cache_key': None,
+            'cached_response': None,
+            'web_search_used': False,
+            'timings': timings
         }
+        if self.response_cache is not None and not (time_sensitive and self.time_sensitive_cache_ttl <= 0):
+            stage_start = time.perf_counter()
+            # Key on the prompt without web results or the per-request timestamp, so a hit skips the search
+            stable_context = {k: v for k, v in current_context.items() if k != 'timestamp'}
+            stable_messages, _ = self._assemble_messages(
+                user_input, stable_context, "", memories, memory.summary, recent_turns
+            )
+            request['cache_key'] = ResponseCache.make_key(
+                self.model,
+                stable_messages[0]['content'],
+                stable_messages[1]['content'],
+                user_input
+            )
+            request['cached_response'] = self.response_cache.get(request['cache_key'])
+            timings['cache_lookup'] = time.perf_counter() - stage_start
         
-        input_lower = user_input.lower()
+        # Use web results only if they arrive within the latency budget
+        stage_start = time.perf_counter()
+        web_info = ""
+        if request['cached_response'] is not None:
+            if search_future is not None:
+                search_future.cancel()
+        elif search_future is not None:
+            remaining = self.web_search_budget - (time.perf_counter() - search_started)
+            try:
+                web_info = search_future.result(timeout=max(0.0, remaining))
+                request['web_search_used'] = True
+            except FutureTimeoutError:
+                # Let it finish in the background; its results stay in the searcher's cache
+                pass
+        elif time_sensitive:
+            web_info = self._gather_web_information(user_input)
+            request['web_search_used'] = True
+        timings['web_search'] = time.perf_counter() - stage_start
         
-        # Check each category of triggers
-        for triggers in search_triggers.values():
-            if any(trigger in input_lower for trigger in triggers):
-                return True
+        stage_start = time.perf_counter()
+        request['messages'], request['prompt_tokens'] = self._assemble_messages(
+            user_input, current_context, web_info, memories, memory.summary, recent_turns
+        )
+        timings['prompt_assembly'] = time.perf_counter() - stage_start
+        return request
+
+    def _assemble_messages(self, user_input: str, context: Dict, web_info: str,
+                           memories: List[str], summary: str, recent_turns: List[str]):
+        """
+        Fill the prompt token budget by priority: personality and context first, then
+        user preferences, web results, retrieved memories, the summary of earlier turns
+        and finally recent turns (newest first). Returns the chat messages and their
+        estimated token count.
+        """
+        preferences = context.get('user_preferences') or {}
+        prompt_context = {k: v for k, v in context.items() if k != 'user_preferences'}
+        preferences_text = json.dumps(preferences) if preferences else ""
+        
+        assembled = self.prompt_builder.assemble([
+            PromptSection('persona', [self._persona(), self._context_block(prompt_context)], required=True),
+            PromptSection('user_input', [user_input], required=True),
+            PromptSection('preferences', [preferences_text]),
+            PromptSection('web', [web_info]),
+            PromptSection('memories', memories),
+            PromptSection('summary', [summary]),
+            PromptSection('recent_turns', list(reversed(recent_turns)))
+        ])
+        kept = assembled['sections']
+        
+        system_prompt = self._construct_system_prompt(
+            ''.join(kept['web']),
+            prompt_context,
+            preferences=''.join(kept['preferences']),
+            memories=kept['memories'],
+            summary=''.join(kept['summary'])
+        )
+        conversation_context = ''.join(reversed(kept['recent_turns']))
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Previous conversation:\n{conversation_context}\n\nUser: {user_input}"}
+        ]
+        return messages, assembled['tokens']
+
+    @staticmethod
+    def _render_memory(memory: Interaction) -> str:
+        return f"User: {memory.user_input} | AI: {memory.ai_response}"
+
+    @staticmethod
+    def _cached_prompt_tokens(usage) -> int:
+        """Prompt tokens the provider served from its prefix cache, 0 if it did not report any."""
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return getattr(details, 'cached_tokens', None) or 0
+
+    def _turn_metrics(self, request: Dict, start: float, first_token_at: float, end: float,
+                      usage=None) -> Dict:
+        """
+        Collect the latency numbers of a completed turn and record them in the registry.
+        ``usage`` is the provider's token usage for the LLM call, if it reported one.
+        """
+        request['timings']['llm'] = end - start
+        turn = {
+            'time_to_first_token': first_token_at - start,
+            'total_latency': end - start,
+            'cache_hit': request['cached_response'] is not None,
+            'prompt_tokens': request['prompt_tokens'],
+            'cached_prompt_tokens': self._cached_prompt_tokens(usage),
+            'web_search_used': request['web_search_used'],
+            'stages': request['timings']
+        }
         
-        return False
+        metrics = self.metrics
+        if metrics.enabled:
+            for stage, seconds in request['timings'].items():
+                metrics.observe('stage_seconds', seconds, stage=stage)
+            metrics.observe('time_to_first_token_seconds', turn['time_to_first_token'])
+            metrics.observe('turn_seconds', turn['total_latency'])
+            metrics.observe('prompt_tokens', request['prompt_tokens'])
+            if usage is not None:
+                metrics.observe('cached_prompt_tokens', turn['cached_prompt_tokens'])
+            metrics.observe('prompt_chars', sum(len(m['content']) for m in request['messages']))
+            metrics.increment('turns')
+            if request['cache_key'] is not None:
+                metrics.increment('response_cache_lookups', result='hit' if turn['cache_hit'] else 'miss')
+            if request['time_sensitive']:
+                metrics.increment('web_searches', result='used' if turn['web_search_used'] else 'skipped')
+        return turn
+
+    def _cache_response(self, request: Dict, ai_response: str):
+        """Store a completed response in the response cache, if enabled."""
+        if request['cache_key'] is None or not ai_response:
+            return
+        ttl = self.time_sensitive_cache_ttl if request['time_sensitive'] else None
+        self.response_cache.set(request['cache_key'], ai_response, ttl=ttl)
+
+    @staticmethod
+    def _text_chunk(text: str):
+        """Wrap text in an object shaped like a streamed completion chunk."""
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    def _needs_web_search(self, user_input: str) -> bool:
+        """Determine if the user's input requires a web search."""
+        # Triggers for current information live in the classifier's 'web_search' group
+        return self.classifier.matches('web_search', user_input)
 
     def _gather_web_information(self, query: str) -> str:
         """Gather and synthesize information from multiple web sources."""
@@ -153,12 +594,14 @@ class AICompanion:
         except Exception as e:
             return f"(Note: Unable to gather web information: {str(e)})"
 
-    def _build_context(self, user_input: str, additional_context: Optional[Dict]) -> Dict:
-        """Build current context including time, user preferences, and any additional context."""
+    def _build_context(self, user_input: str, additional_context: Optional[Dict],
+                       topics: Optional[List[str]] = None,
+                       memory: Optional[ConversationMemory] = None) -> Dict:
+        """Build current context including time, the session's preferences, and any additional context."""
         context = {
             'timestamp': datetime.now().isoformat(),
-            'user_preferences': self.user_preferences,
-            'detected_topics': self._detect_topics(user_input)
+            'user_preferences': (memory or self.memory).user_preferences,
+            'detected_topics': topics if topics is not None else self._detect_topics(user_input)
         }
         
         if additional_context:
@@ -168,46 +611,41 @@ class AICompanion:
 
     def _detect_topics(self, text: str) -> List[str]:
         """Detect main topics in the text."""
-        topics = []
-        for domain in self.knowledge_domains:
-            # Simple keyword matching for now - could be enhanced with NLP
-            if domain.replace('_', ' ') in text.lower():
-                topics.append(domain)
-        return topics
-
-    def _handle_command(self, command: str) -> str:
+        return self.classifier.classify(text)['topics']
+
+    def _handle_command(self, command: str, memory: Optional[ConversationMemory] = None) -> str:
         """Handle special commands starting with '/'."""
         cmd_parts = command.split()
         cmd_name = cmd_parts[0].lower()
         cmd_args = cmd_parts[1:] if len(cmd_parts) > 1 else []
         
         if cmd_name in self.commands:
-            return self.commands[cmd_name](cmd_args)
+            return self.commands[cmd_name](cmd_args, memory or self.memory)
         return f"Unknown command: {cmd_name}. Type /help for available commands."
 
     # Command handlers
-    def _cmd_exit(self, args: List[str]) -> str:
+    def _cmd_exit(self, args: List[str], memory: ConversationMemory) -> str:
         return "exit"
 
-    def _cmd_clear(self, args: List[str]) -> str:
-        self.memory.clear_memory()
+    def _cmd_clear(self, args: List[str], memory: ConversationMemory) -> str:
+        memory.clear_memory()
         return "Conversation history cleared!"
 
-    def _cmd_save_conversation(self, args: List[str]) -> str:
+    def _cmd_save_conversation(self, args: List[str], memory: ConversationMemory) -> str:
         filename = args[0] if args else f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        self.memory.save_to_file(filename)
+        memory.save_in_background(filename)
         return f"Conversation saved to {filename}"
 
-    def _cmd_load_conversation(self, args: List[str]) -> str:
+    def _cmd_load_conversation(self, args: List[str], memory: ConversationMemory) -> str:
         if not args:
             return "Please specify a filename to load"
         try:
-            self.memory.load_from_file(args[0])
+            memory.load_from_file(args[0])
             return f"Conversation loaded from {args[0]}"
         except Exception as e:
             return f"Error loading conversation: {str(e)}"
 
-    def _cmd_help(self, args: List[str]) -> str:
+    def _cmd_help(self, args: List[str], memory: ConversationMemory) -> str:
         return """Available commands:
 /help - Show this help message
 /clear - Clear conversation history
@@ -215,42 +653,92 @@ class AICompanion:
 /load <filename> - Load conversation from file
 /preferences - Show/set user preferences
 /summary - Get conversation summary
+/stats [json|prometheus|export <file>] - Show latency and cache statistics
+/search <terms> [topic:<name>] [since:YYYY-MM-DD] [until:YYYY-MM-DD] - Search saved conversations
 /exit - End conversation"""
 
-    def _cmd_preferences(self, args: List[str]) -> str:
+    def _cmd_preferences(self, args: List[str], memory: ConversationMemory) -> str:
         if not args:
-            return f"Current preferences: {json.dumps(self.user_preferences, indent=2)}"
+            return f"Current preferences: {json.dumps(memory.user_preferences, indent=2)}"
         try:
             key, value = ' '.join(args).split('=')
-            self.user_preferences[key.strip()] = value.strip()
+            memory.user_preferences[key.strip()] = value.strip()
             return f"Preference set: {key.strip()} = {value.strip()}"
         except ValueError:
             return "Usage: /preferences [key=value]"
 
-    def _cmd_get_summary(self, args: List[str]) -> str:
-        return self.memory.get_conversation_summary()
+    def _cmd_get_summary(self, args: List[str], memory: ConversationMemory) -> str:
+        return memory.get_conversation_summary()
 
-    def _construct_system_prompt(self, web_info: str, context: Dict) -> str:
-        """Construct the system prompt including personality and any web search results."""
-        base_prompt = f"""You are {self.personality['name']}, an AI companion with the following traits: {', '.join(self.personality['traits'])}.
-You speak in a {self.personality['speaking_style']} manner.
-Your responses should be natural, engaging, and show genuine interest in the conversation.
+    def _cmd_stats(self, args: List[str], memory: ConversationMemory) -> str:
+        fmt = args[0].lower() if args else ''
+        if fmt == 'json':
+            return self.metrics.to_json_line()
+        if fmt == 'prometheus':
+            return self.metrics.to_prometheus()
+        if fmt == 'export':
+            if len(args) < 2:
+                return "Usage: /stats export <file.jsonl>"
+            self.metrics.export_json_line(args[1])
+            return f"Metrics appended to {args[1]}"
+        return self.metrics.format_summary()
 
-Guidelines:
-1. Be conversational and friendly while maintaining helpfulness
-2. Show empathy and understanding when appropriate
-3. Ask follow-up questions to show interest
-4. Share insights and relevant information naturally
-5. Admit when you're not sure about something
+    def _cmd_search(self, args: List[str], memory: ConversationMemory) -> str:
+        return self.search_conversations(args)
 
-Context:
-{json.dumps(context, indent=2)}
+    def search_conversations(self, args: List[str], directory: Optional[str] = None) -> str:
+        """/search over the saved conversations, limited to files under ``directory`` if given."""
+        filters, terms = {}, []
+        for arg in args:
+            key, sep, value = arg.partition(':')
+            if sep and key.lower() in ('topic', 'since', 'until') and value:
+                filters[key.lower()] = value
+            else:
+                terms.append(arg)
+        if not terms and not filters:
+            return "Usage: /search <terms> [topic:<name>] [since:YYYY-MM-DD] [until:YYYY-MM-DD]"
+        try:
+            self.archive.refresh()
+            results = self.archive.search(' '.join(terms), limit=5, directory=directory, **filters)
+        except Exception as e:
+            return f"Error searching conversations: {str(e)}"
+        if not results:
+            return "No matching conversations found."
+        lines = []
+        for result in results:
+            lines.append(f"{os.path.basename(result['path'])} ({result['timestamp'][:16].replace('T', ' ')}):")
+            lines.append(f"  User: {result['user_input'][:200]}")
+            lines.append(f"  AI: {result['ai_response'][:200]}")
+        return '\n'.join(lines)
 
-Relevant information from the web:
-{web_info}
+    def _construct_system_prompt(self, web_info: str, context: Dict, preferences: str = "",
+                                 memories: Optional[List[str]] = None, summary: str = "") -> str:
+        """
+        Construct the system prompt including personality, context, memories and any web search results.
+        Parts are ordered from most to least stable, so consecutive turns share the longest possible
+        prefix: the compiled persona, preferences, the conversation summary, retrieved memories, web
+        results and finally the per-turn context with its timestamp.
+        """
+        parts = [self._persona()]
+        if preferences:
+            parts.append(f"\nUser preferences:\n{preferences}\n")
+        if summary:
+            parts.append(f"\nSummary of earlier parts of this conversation:\n{summary}\n")
+        if memories:
+            parts.append("\nThings you remember from earlier conversations:\n")
+            parts.extend(f"- {memory}\n" for memory in memories)
+        if web_info:
+            parts.append(f"\nRelevant information from the web:\n{web_info}\n")
+        parts.append(self._context_block(context))
+        return ''.join(parts)
 
-Please respond to the user's input."""
-        return base_prompt
+    @staticmethod
+    def _context_block(context: Dict) -> str:
+        # The timestamp changes every turn, so it goes last
+        ordered = {k: v for k, v in context.items() if k != 'timestamp'}
+        if 'timestamp' in context:
+            ordered['timestamp'] = context['timestamp']
+        return f"\nContext:\n{json.dumps(ordered)}\n\nPlease respond to the user's input."
 
     def get_personality(self) -> Dict:
         """Return the current personality settings."""
@@ -262,3 +750,4 @@ Please respond to the user's input."""
             self.personality['traits'] = new_traits
         if new_style:
             self.personality['speaking_style'] = new_style
+        self._persona_prompt = None
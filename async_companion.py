@@ -0,0 +1,217 @@
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, AsyncIterator
+from ai_companion import ERROR_RESPONSE_PREFIX, AICompanion, load_environment
+from conversation_memory import ConversationMemory
+from response_cache import ResponseCache
+from llm_scheduler import AsyncRequestScheduler
+import asyncio
+import functools
+import os
+import time
+
+
+class AsyncAICompanion(AICompanion):
+    """
+    Asynchronous AI companion that serves many concurrent conversations from one event loop.
+    Each session id gets its own ConversationMemory, while all sessions share a single
+    async client backed by a bounded HTTP connection pool. Session loads, commands and
+    memory writes run on executor threads so they don't stall the loop.
+    """
+
+    def __init__(self, personality_file: str = "personality.json", client=None,
+                 max_connections: int = 100, max_keepalive_connections: int = 20,
+                 session_dir: str = os.path.join("data", "sessions"),
+                 response_cache: Optional[ResponseCache] = None, memory_backend: Optional[str] = None,
+                 max_sessions: int = 256, max_session_memories: Optional[int] = None):
+        load_environment()
+        super().__init__(personality_file, client=client, response_cache=response_cache,
+                         memory_backend=memory_backend, session_dir=session_dir, max_sessions=max_sessions,
+                         max_session_memories=max_session_memories)
+
+        # Without an injected client, the pooled async client is created on the first request
+        self.llm = AsyncRequestScheduler(
+            client, metrics=self.metrics,
+            client_factory=lambda: self._create_async_client(max_connections, max_keepalive_connections),
+            **self._scheduler_options(max_connections)
+        )
+
+        # Latency numbers for the most recent turn of each resident session (seconds)
+        self.session_metrics = {}
+        self.sessions.on_evict = lambda session_id: self.session_metrics.pop(session_id, None)
+
+    @staticmethod
+    def _create_async_client(max_connections: int, max_keepalive_connections: int):
+        """Create an AsyncOpenAI client whose connection pool is shared and bounded."""
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+        # The scheduler retries, behind its rate limits and honoring Retry-After
+        return AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client, max_retries=0)
+
+    def generate_response(self, *args, **kwargs):
+        raise TypeError("AsyncAICompanion talks to the LLM through an async client; "
+                        "use 'await companion.agenerate_response(...)'")
+
+    def generate_response_stream(self, *args, **kwargs):
+        raise TypeError("AsyncAICompanion talks to the LLM through an async client; "
+                        "use 'async for chunk in companion.agenerate_response_stream(...)'")
+
+    @asynccontextmanager
+    async def _use_session(self, session_id: str):
+        """sessions.use with the session's load from disk on an executor thread."""
+        holder = self.sessions.use(session_id)
+        future = asyncio.get_running_loop().run_in_executor(None, holder.__enter__)
+        try:
+            memory = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The load still finishes on its thread; give the session back once it does
+            def release(done):
+                if not done.cancelled() and done.exception() is None:
+                    holder.__exit__(None, None, None)
+            future.add_done_callback(release)
+            raise
+        try:
+            yield memory
+        finally:
+            holder.__exit__(None, None, None)
+
+    @staticmethod
+    async def _off_loop(fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    async def agenerate_response(self, user_input: str, session_id: str = 'default',
+                                 additional_context: Optional[Dict] = None) -> str:
+        """Asynchronously generate a response for one session."""
+        async with self._use_session(session_id) as memory:
+            return await self._agenerate_response(user_input, session_id, additional_context, memory)
+
+    async def _agenerate_response(self, user_input: str, session_id: str, additional_context: Optional[Dict],
+                                  memory: ConversationMemory) -> str:
+        if user_input.startswith('/'):
+            return await self._off_loop(self._handle_command, user_input[1:], memory)
+
+        request = await self._aprepare_request(user_input, additional_context, memory)
+
+        try:
+            start = time.perf_counter()
+            ai_response = request['cached_response']
+            usage = None
+            if ai_response is None:
+                response = await self.llm.chat.completions.create(
+                    model=self.model,
+                    messages=request['messages'],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+                ai_response = response.choices[0].message.content
+                usage = getattr(response, 'usage', None)
+                self._cache_response(request, ai_response)
+
+            end = time.perf_counter()
+            self.session_metrics[session_id] = self._turn_metrics(request, start, end, end, usage)
+
+            with self.metrics.timer('stage_seconds', stage='memory_write'):
+                await self._off_loop(
+                    memory.add_interaction,
+                    user_input=user_input,
+                    ai_response=ai_response,
+                    context=request['context'],
+                    input_important=request['input_important']
+                )
+
+            return ai_response
+
+        except Exception as e:
+            return ERROR_RESPONSE_PREFIX + str(e)
+
+    async def agenerate_response_stream(self, user_input: str, session_id: str = 'default',
+                                        additional_context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Asynchronously generate a response for one session, yielding chunks as they arrive."""
+        async with self._use_session(session_id) as memory:
+            async for chunk in self._agenerate_response_stream(user_input, session_id, additional_context, memory):
+                yield chunk
+
+    async def _agenerate_response_stream(self, user_input: str, session_id: str,
+                                         additional_context: Optional[Dict],
+                                         memory: ConversationMemory) -> AsyncIterator[str]:
+        if user_input.startswith('/'):
+            yield await self._off_loop(self._handle_command, user_input[1:], memory)
+            return
+
+        request = await self._aprepare_request(user_input, additional_context, memory)
+
+        start = time.perf_counter()
+        first_token_at = None
+        usage = None
+        parts = []
+        try:
+            if request['cached_response'] is not None:
+                first_token_at = time.perf_counter()
+                parts.append(request['cached_response'])
+                yield request['cached_response']
+            else:
+                stream = await self.llm.chat.completions.create(
+                    model=self.model,
+                    messages=request['messages'],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+
+                try:
+                    async for chunk in stream:
+                        usage = getattr(chunk, 'usage', None) or usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(delta)
+                        yield delta
+                finally:
+                    # Also when the consumer stops early, e.g. a WebSocket disconnect
+                    await stream.aclose()
+        except Exception as e:
+            yield ERROR_RESPONSE_PREFIX + str(e)
+            return
+
+        end = time.perf_counter()
+        ai_response = ''.join(parts)
+        if request['cached_response'] is None:
+            self._cache_response(request, ai_response)
+        self.session_metrics[session_id] = self._turn_metrics(request, start, first_token_at or end, end, usage)
+
+        with self.metrics.timer('stage_seconds', stage='memory_write'):
+            await self._off_loop(
+                memory.add_interaction,
+                user_input=user_input,
+                ai_response=ai_response,
+                context=request['context'],
+                input_important=request['input_important']
+            )
+
+    async def _aprepare_request(self, user_input: str, additional_context: Optional[Dict],
+                                memory: ConversationMemory):
+        """Build the request, moving blocking web searches off the event loop."""
+        signals = self.classifier.classify(user_input)
+        if signals['web_search']:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._prepare_request, user_input, additional_context, memory, signals
+            )
+        return self._prepare_request(user_input, additional_context, memory, signals)
+
+    async def aclose(self):
+        """Persist resident sessions and close the shared HTTP connection pool."""
+        self.sessions.close()
+        await self.llm.close()
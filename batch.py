@@ -0,0 +1,280 @@
+"""
+Batch mode: run a JSONL file of scripted prompts through AICompanion.
+
+Each input line is a JSON object with a ``message`` and optionally a
+``session_id``, an ``id`` to carry through to the output and a ``context``
+dict (passed as additional_context). Lines without a session id are
+independent one-turn sessions. Each output line is the input plus
+``line`` (1-based input line number), ``response`` and ``latency_s``, and
+``error`` if the turn failed. Output lines appear in completion order.
+
+    python batch.py prompts.jsonl results.jsonl --workers 16 --rpm 3000
+    python batch.py prompts.jsonl results.jsonl --fake-llm --latency 0.2
+
+Input is read lazily and at most ``--max-pending`` lines are held at once, so
+the input can be arbitrarily long. Turns of one session run in input order and
+turns of different sessions run in parallel on ``--workers`` threads. LLM
+calls share the scheduler's ``--concurrency``, ``--rpm`` and ``--tpm`` limits.
+
+The output file doubles as the checkpoint. Rerunning the same command after a
+crash skips lines that already have a successful result, replays them into
+their sessions so later turns see the same history, and retries the failed
+lines, whose old error records are dropped from the output first. Each session keeps its memory in a temporary directory for the run, so
+results do not depend on earlier runs. A throughput report is printed as one
+JSON line at the end.
+"""
+from collections import deque
+from typing import Dict, Iterator, Optional, Tuple
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ai_companion import ERROR_RESPONSE_PREFIX, AICompanion, load_environment
+from perf_stats import latency_summary, peak_rss_mb
+from write_behind import atomic_write_text
+
+
+def read_jobs(path: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (line number, job) for each non-blank input line. Lines that are not
+    a JSON object with a string ``message`` yield a job with an ``error``.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                yield number, {'error': f"invalid JSON: {e}"}
+                continue
+            if not isinstance(job, dict) or not isinstance(job.get('message'), str):
+                yield number, {'error': "each line must be a JSON object with a string 'message'"}
+                continue
+            if job.get('context') is not None and not isinstance(job['context'], dict):
+                yield number, {**job, 'error': "'context' must be an object"}
+                continue
+            yield number, job
+
+
+def read_checkpoint(path: str) -> Dict[int, Dict]:
+    """
+    Successful results already in the output file, by input line number. A
+    torn last line left by a crash is cut off, and error records (whose lines
+    are about to be retried) are dropped, so the resumed run's output holds
+    one result per input line.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+    lines = data[:end].decode('utf-8').splitlines()
+    kept = {}
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if (isinstance(record, dict) and 'error' not in record and isinstance(record.get('line'), int)
+                and isinstance(record.get('message'), str) and isinstance(record.get('response'), str)):
+            done[record['line']] = record
+            kept[record['line']] = line
+    if len(kept) < len(lines):
+        atomic_write_text(path, ''.join(line + '\n' for line in kept.values()))
+    return done
+
+
+class BatchRunner:
+    """
+    Runs jobs from ``read_jobs`` through a companion with per-session ordering
+    and at most ``max_pending`` jobs in memory.
+    """
+
+    def __init__(self, companion: AICompanion, workers: int = 8, max_pending: Optional[int] = None,
+                 fsync_every: int = 100):
+        self.companion = companion
+        self.workers = workers
+        self.max_pending = max_pending or workers * 8
+        self.fsync_every = fsync_every
+        self._cond = threading.Condition()
+        # session id -> jobs waiting for the session's running turn; a key is present while a turn runs
+        self._queued: Dict[str, deque] = {}
+        self._pending = 0
+        self._written = 0
+        self._latencies = []
+        self._errors = 0
+
+    @staticmethod
+    def _session_id(number: int, job: Dict) -> str:
+        # Namespaced so an input id such as 'default' cannot reach the companion's own memory
+        session_id = job.get('session_id')
+        return f"batch:{session_id}" if session_id is not None else f"batch-line:{number}"
+
+    def run(self, input_path: str, output_path: str) -> Dict:
+        done = read_checkpoint(output_path)
+        stats = {'lines': 0, 'resumed': 0}
+        start = time.perf_counter()
+        with open(output_path, 'a', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+            for number, job in read_jobs(input_path):
+                stats['lines'] += 1
+                if number in done:
+                    # Replayed in order with the session's other turns, so later turns see the same history
+                    self._submit(executor, out, number, done.pop(number), replay=True)
+                    stats['resumed'] += 1
+                    continue
+                if 'error' in job:
+                    self._write(out, number, job, None, 0.0, job['error'])
+                    continue
+                self._submit(executor, out, number, job)
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending == 0)
+            out.flush()
+            os.fsync(out.fileno())
+        elapsed = time.perf_counter() - start
+
+        completed = len(self._latencies)
+        return {
+            'lines': stats['lines'],
+            'resumed': stats['resumed'],
+            'completed': completed,
+            'errors': self._errors,
+            'elapsed_s': round(elapsed, 3),
+            'turns_per_second': round(completed / elapsed, 1) if elapsed > 0 else 0.0,
+            'latency': latency_summary(self._latencies),
+            'workers': self.workers,
+            'llm': self.companion.llm.stats(),
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+    def _submit(self, executor: ThreadPoolExecutor, out, number: int, job: Dict, replay: bool = False):
+        session_id = self._session_id(number, job)
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending < self.max_pending)
+            self._pending += 1
+            if session_id in self._queued:
+                # The session has a turn running; this one starts when it finishes
+                self._queued[session_id].append((number, job, replay))
+                return
+            self._queued[session_id] = deque()
+        executor.submit(self._run_session, executor, out, session_id, number, job, replay)
+
+    def _run_session(self, executor: ThreadPoolExecutor, out, session_id: str, number: int, job: Dict,
+                     replay: bool):
+        try:
+            if replay:
+                self._replay(session_id, job)
+            else:
+                self._run_turn(out, session_id, number, job)
+        except Exception as e:
+            print(f"Error in batch line {number}: {e}")
+
+        with self._cond:
+            self._pending -= 1
+            queued = self._queued[session_id]
+            if queued:
+                executor.submit(self._run_session, executor, out, session_id, *queued.popleft())
+            else:
+                del self._queued[session_id]
+            self._cond.notify_all()
+
+    def _run_turn(self, out, session_id: str, number: int, job: Dict):
+        start = time.perf_counter()
+        error = None
+        try:
+            response = self.companion.generate_response(job['message'], additional_context=job.get('context'),
+                                                        session_id=session_id)
+            if response.startswith(ERROR_RESPONSE_PREFIX):
+                error = response[len(ERROR_RESPONSE_PREFIX):]
+        except Exception as e:
+            response, error = None, str(e)
+        self._write(out, number, job, response, time.perf_counter() - start, error)
+
+    def _replay(self, session_id: str, record: Dict):
+        """Restore a turn finished in an earlier run into its session's memory."""
+        if record['message'].startswith('/'):
+            return
+        with self.companion.sessions.use(session_id) as memory:
+            memory.add_interaction(record['message'], record['response'], record.get('context'))
+
+    def _write(self, out, number: int, job: Dict, response: Optional[str], latency: float, error: Optional[str]):
+        record = {**job, 'line': number, 'response': response, 'latency_s': round(latency, 4)}
+        if error is not None:
+            record['error'] = error
+        line = json.dumps(record) + '\n'
+        with self._cond:
+            out.write(line)
+            out.flush()
+            if error is None:
+                self._latencies.append(latency)
+            else:
+                self._errors += 1
+            self._written += 1
+            if self._written % self.fsync_every == 0:
+                os.fsync(out.fileno())
+
+
+def build_companion(args, session_dir: str) -> AICompanion:
+    client = None
+    if args.fake_llm:
+        from fake_llm import Distribution, FakeLLMClient
+        client = FakeLLMClient(
+            latency=Distribution.parse(args.latency, seed=args.seed),
+            tokens_per_second=Distribution.parse(args.tokens_per_second, seed=args.seed + 1),
+            reply_words=args.reply_words
+        )
+    scheduler_options = {'max_concurrency': args.concurrency or args.workers,
+                         'requests_per_minute': args.rpm, 'tokens_per_minute': args.tpm}
+    return AICompanion(args.personality, client=client, session_dir=session_dir,
+                       max_sessions=args.max_sessions, scheduler_options=scheduler_options,
+                       max_session_memories=args.max_session_memories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the AI companion")
+    parser.add_argument('input', help="JSONL file of {\"message\", \"session_id\"?, \"id\"?, \"context\"?}")
+    parser.add_argument('output', help="JSONL results file; also the checkpoint for resuming")
+    parser.add_argument('--workers', type=int, default=8, help="turns processed concurrently")
+    parser.add_argument('--max-pending', type=int, help="input lines held in memory (default 8 per worker)")
+    parser.add_argument('--concurrency', type=int, help="concurrent LLM calls (default: --workers)")
+    parser.add_argument('--rpm', type=float, help="LLM requests per minute")
+    parser.add_argument('--tpm', type=float, help="LLM tokens per minute")
+    parser.add_argument('--max-sessions', type=int, default=256, help="resident session cap")
+    parser.add_argument('--max-session-memories', type=int,
+                        help="cap on long-term memories held in RAM across resident sessions")
+    parser.add_argument('--personality', default="personality.json")
+    parser.add_argument('--fake-llm', action='store_true', help="answer with the offline fake LLM")
+    parser.add_argument('--latency', default='0', help="fake LLM latency in seconds, e.g. 0.2 or lognormal:0.2:0.5")
+    parser.add_argument('--tokens-per-second', default='0', help="fake LLM token rate (0 = instant)")
+    parser.add_argument('--reply-words', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--report', help="append the throughput report to this JSON-lines file")
+    args = parser.parse_args()
+
+    load_environment()
+    if not args.fake_llm and not os.getenv('OPENAI_API_KEY'):
+        print("Error: OPENAI_API_KEY not found in environment variables (or use --fake-llm)")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as session_dir:
+        companion = build_companion(args, session_dir)
+        runner = BatchRunner(companion, workers=args.workers, max_pending=args.max_pending)
+        report = runner.run(args.input, args.output)
+        companion.sessions.close()
+    line = json.dumps(report)
+    print(line)
+    if args.report:
+        with open(args.report, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Offline throughput benchmark for AsyncAICompanion.
+
+Drives many concurrent sessions against the fake LLM backend and prints the
+results as JSON, e.g.:
+
+    python bench_async.py --sessions 200 --turns 5 --latency 0.2
+"""
+from async_companion import AsyncAICompanion
+from fake_llm import AsyncFakeLLMClient
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+PERSONALITY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personality.json")
+
+
+async def _run_session(companion: AsyncAICompanion, session_id: str, turns: int):
+    for turn in range(turns):
+        await companion.agenerate_response(f"Tell me something interesting, turn {turn}", session_id=session_id)
+
+
+async def run_benchmark(sessions: int, turns: int, latency: float, tokens_per_second: float) -> dict:
+    client = AsyncFakeLLMClient(latency=latency, tokens_per_second=tokens_per_second)
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            companion = AsyncAICompanion(PERSONALITY_FILE, client=client)
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                _run_session(companion, f"user-{i}", turns) for i in range(sessions)
+            ))
+            elapsed = time.perf_counter() - start
+            await companion.aclose()
+        finally:
+            os.chdir(cwd)
+
+    total_turns = sessions * turns
+    return {
+        'sessions': sessions,
+        'turns_per_session': turns,
+        'llm_latency_s': latency,
+        'total_turns': total_turns,
+        'elapsed_s': round(elapsed, 4),
+        'turns_per_second': round(total_turns / elapsed, 2),
+        'serial_estimate_s': round(client.backend.calls * latency, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AsyncAICompanion against a fake LLM")
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--tokens-per-second', type=float, default=0)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args.sessions, args.turns, args.latency, args.tokens_per_second))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compare long-term memory retrieval via the inverted index against the old linear scan.
+
+    python bench_memory_index.py --memories 100000 --queries 200
+"""
+from memory_index import InvertedIndex
+import argparse
+import json
+import random
+import time
+
+VOCABULARY = [
+    'coffee', 'tea', 'python', 'garden', 'birthday', 'sister', 'marathon', 'guitar', 'paris',
+    'allergy', 'peanuts', 'vegetarian', 'meeting', 'project', 'deadline', 'cat', 'dog', 'movie',
+    'novel', 'piano', 'hiking', 'recipe', 'pasta', 'weekend', 'holiday', 'doctor', 'exam',
+    'spanish', 'chess', 'football', 'podcast', 'budget', 'apartment', 'bicycle', 'camera',
+]
+FILLER = ['remember', 'that', 'i', 'really', 'like', 'my', 'favorite', 'always', 'never', 'note']
+
+
+def make_memories(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = VOCABULARY + [f"word{i}" for i in range(5000)]
+    memories = []
+    for _ in range(count):
+        user = ' '.join(rng.choice(FILLER) if rng.random() < 0.4 else rng.choice(words) for _ in range(12))
+        ai = ' '.join(rng.choice(FILLER) if rng.random() < 0.4 else rng.choice(words) for _ in range(20))
+        memories.append({'user_input': user, 'ai_response': ai})
+    return memories
+
+
+def linear_scan(memories, query: str, limit: int = 5):
+    """The retrieval algorithm ConversationMemory used before the index."""
+    relevant = []
+    query_terms = query.lower().split()
+    for memory in memories:
+        relevance_score = 0
+        memory_text = f"{memory['user_input']} {memory['ai_response']}".lower()
+        for term in query_terms:
+            if term in memory_text:
+                relevance_score += 1
+        if relevance_score > 0:
+            relevant.append({'memory': memory, 'score': relevance_score})
+    relevant.sort(key=lambda x: x['score'], reverse=True)
+    return [item['memory'] for item in relevant[:limit]]
+
+
+def _time_per_query(fn, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark long-term memory retrieval")
+    parser.add_argument('--memories', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scan-queries', type=int, default=5, help="queries timed for the slow linear scan")
+    args = parser.parse_args()
+
+    memories = make_memories(args.memories)
+    rng = random.Random(11)
+    queries = [' '.join(rng.sample(VOCABULARY, 3)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = InvertedIndex()
+    for doc_id, memory in enumerate(memories):
+        index.add(doc_id, f"{memory['user_input']} {memory['ai_response']}")
+    build_s = time.perf_counter() - start
+
+    index_s = _time_per_query(lambda q: index.search(q, 5), queries)
+    scan_s = _time_per_query(lambda q: linear_scan(memories, q, 5), queries[:args.scan_queries])
+
+    print(json.dumps({
+        'memories': args.memories,
+        'index_build_s': round(build_s, 3),
+        'index_query_ms': round(index_s * 1000, 4),
+        'scan_query_ms': round(scan_s * 1000, 4),
+        'speedup': round(scan_s / index_s, 1) if index_s else None
+    }))
+
+
+if __name__ == "__main__":
+    main()
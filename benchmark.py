@@ -0,0 +1,263 @@
+"""
+Offline benchmark suite for the companion, driven by the deterministic fake LLM.
+
+Scenarios:
+  turns       AICompanion.generate_response over many turns
+  memory      ConversationMemory inserts and retrieval over a large long-term store
+  concurrent  AsyncAICompanion with many concurrent sessions
+  classifier  Keyword classification per input at a large trigger vocabulary,
+              against the old per-phrase substring scan
+
+Each scenario runs in its own subprocess so peak RSS is reported per scenario.
+Results are printed as one JSON object per line (and optionally written to a file):
+
+    python benchmark.py --scenario all --output bench_output.jsonl
+    python benchmark.py --scenario turns --turns 10000 --latency lognormal:0.002:0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from perf_stats import latency_summary, peak_rss_mb
+
+SCENARIOS = ('turns', 'memory', 'concurrent', 'classifier')
+PERSONALITY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personality.json")
+
+TOPIC_WORDS = [
+    'coffee', 'python', 'garden', 'birthday', 'sister', 'marathon', 'guitar', 'paris', 'allergy',
+    'vegetarian', 'project', 'deadline', 'movie', 'piano', 'hiking', 'recipe', 'holiday', 'chess',
+]
+
+
+def _make_input(rng: random.Random, turn: int) -> str:
+    words = rng.sample(TOPIC_WORDS, 3)
+    if turn % 7 == 0:
+        return f"Please remember that my favorite {words[0]} is {words[1]}"
+    return f"Tell me something about {words[0]} and {words[1]} with {words[2]}"
+
+
+def run_turns(args) -> dict:
+    from ai_companion import AICompanion
+    from fake_llm import Distribution, FakeLLMClient
+
+    client = FakeLLMClient(
+        latency=Distribution.parse(args.latency, seed=args.seed),
+        tokens_per_second=Distribution.parse(args.tokens_per_second, seed=args.seed + 1),
+        reply_words=args.reply_words
+    )
+    companion = AICompanion(PERSONALITY_FILE, client=client)
+    rng = random.Random(args.seed)
+
+    latencies = []
+    prompt_builds = []
+    prompt_tokens = cached_tokens = 0
+    start = time.perf_counter()
+    for turn in range(args.turns):
+        turn_start = time.perf_counter()
+        companion.generate_response(_make_input(rng, turn))
+        latencies.append(time.perf_counter() - turn_start)
+        metrics = companion.last_turn_metrics
+        prompt_builds.append(metrics['stages']['prompt_assembly'])
+        prompt_tokens += metrics['prompt_tokens']
+        cached_tokens += metrics['cached_prompt_tokens']
+    elapsed = time.perf_counter() - start
+    companion.memory.close()
+
+    return {
+        'turns': args.turns,
+        'elapsed_s': round(elapsed, 3),
+        'turns_per_second': round(args.turns / elapsed, 1),
+        'turn_latency': latency_summary(latencies),
+        'prompt_build': latency_summary(prompt_builds),
+        'cached_prompt_share': round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+        'long_term_memories': len(companion.memory.long_term_memory)
+    }
+
+
+def run_memory(args) -> dict:
+    from conversation_memory import ConversationMemory
+    from memory_store import open_store
+
+    memory = ConversationMemory(store=open_store(args.memory_backend, "long_term_memory.json"))
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    for i in range(args.memories):
+        words = rng.sample(TOPIC_WORDS, 4)
+        memory.add_interaction(
+            f"Please remember my {words[0]} {words[1]} note {i}",
+            f"I'll always remember your {words[2]} and {words[3]}."
+        )
+    insert_s = time.perf_counter() - start
+    memory.close()
+
+    start = time.perf_counter()
+    reloaded = ConversationMemory(store=open_store(args.memory_backend, "long_term_memory.json"))
+    load_s = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.queries):
+        query = ' '.join(rng.sample(TOPIC_WORDS, 2))
+        query_start = time.perf_counter()
+        reloaded.get_relevant_memories(query)
+        latencies.append(time.perf_counter() - query_start)
+
+    memories = len(reloaded.long_term_memory)
+    # The near-duplicate index is built in the background, so this should not pay for hashing the store
+    start = time.perf_counter()
+    reloaded.add_interaction("Please remember my new piano teacher", "I'll always remember your piano teacher.")
+    first_insert_s = time.perf_counter() - start
+
+    result = {
+        'backend': args.memory_backend,
+        'memories': memories,
+        'inserts_per_second': round(args.memories / insert_s, 1),
+        'load_s': round(load_s, 3),
+        'retrieval_latency': latency_summary(latencies),
+        'first_insert_after_reload_ms': round(first_insert_s * 1000, 3)
+    }
+    if args.memory_backend == 'tiered':
+        result['tiers'] = reloaded.store.tier_stats()
+    return result
+
+
+def run_concurrent(args) -> dict:
+    from async_companion import AsyncAICompanion
+    from fake_llm import AsyncFakeLLMClient, Distribution
+
+    client = AsyncFakeLLMClient(
+        latency=Distribution.parse(args.latency, seed=args.seed),
+        tokens_per_second=Distribution.parse(args.tokens_per_second, seed=args.seed + 1),
+        reply_words=args.reply_words
+    )
+    companion = AsyncAICompanion(PERSONALITY_FILE, client=client, max_sessions=args.max_sessions)
+    rng = random.Random(args.seed)
+    latencies = []
+
+    async def session(session_id: str):
+        for turn in range(args.session_turns):
+            turn_start = time.perf_counter()
+            await companion.agenerate_response(_make_input(rng, turn), session_id=session_id)
+            latencies.append(time.perf_counter() - turn_start)
+
+    async def run():
+        await asyncio.gather(*(session(f"user-{i}") for i in range(args.sessions)))
+        stats = companion.sessions.stats()
+        await companion.aclose()
+        return stats
+
+    start = time.perf_counter()
+    session_stats = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    total = args.sessions * args.session_turns
+
+    return {
+        'sessions': args.sessions,
+        'session_stats': session_stats,
+        'turns': total,
+        'elapsed_s': round(elapsed, 3),
+        'turns_per_second': round(total / elapsed, 1),
+        'turn_latency': latency_summary(latencies)
+    }
+
+
+def run_classifier(args) -> dict:
+    from keyword_classifier import KeywordClassifier
+
+    rng = random.Random(args.seed)
+    lexicon = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+               for _ in range(max(1000, args.vocabulary // 4))]
+    phrases = [' '.join(rng.sample(lexicon, rng.randint(1, 3))) for _ in range(args.vocabulary)]
+    groups = {'web_search': {}, 'topics': {}, 'memory': {}}
+    for i, phrase in enumerate(phrases):
+        groups[('web_search', 'topics', 'memory')[i % 3]].setdefault(f"label{i % 50}", []).append(phrase)
+
+    start = time.perf_counter()
+    classifier = KeywordClassifier(groups)
+    build_s = time.perf_counter() - start
+
+    inputs = [' '.join(rng.choice(lexicon) for _ in range(20)) for _ in range(args.queries)]
+    latencies = []
+    for text in inputs:
+        classify_start = time.perf_counter()
+        classifier.classify(text)
+        latencies.append(time.perf_counter() - classify_start)
+
+    # The previous approach: lowercase, then one substring scan per phrase
+    scan_latencies = []
+    for text in inputs[:max(1, args.queries // 10)]:
+        scan_start = time.perf_counter()
+        lowered = text.lower()
+        [phrase for phrase in phrases if phrase in lowered]
+        scan_latencies.append(time.perf_counter() - scan_start)
+
+    return {
+        'vocabulary': args.vocabulary,
+        'inputs': len(inputs),
+        'build_s': round(build_s, 3),
+        'classify_latency': latency_summary(latencies),
+        'substring_scan_latency': latency_summary(scan_latencies)
+    }
+
+
+def run_scenario(name: str, args) -> dict:
+    runner = {'turns': run_turns, 'memory': run_memory, 'concurrent': run_concurrent,
+              'classifier': run_classifier}[name]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            result = runner(args)
+        finally:
+            os.chdir(cwd)
+    result = dict({'scenario': name}, **result)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the AI companion")
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--turns', type=int, default=10000)
+    parser.add_argument('--memories', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--memory-backend', choices=('journal', 'sqlite', 'tiered'), default='journal')
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--session-turns', type=int, default=5)
+    parser.add_argument('--max-sessions', type=int, default=256, help="resident session cap")
+    parser.add_argument('--vocabulary', type=int, default=10000, help="trigger phrases for the classifier scenario")
+    parser.add_argument('--latency', default='0', help="fake LLM latency in seconds, e.g. 0.2 or lognormal:0.2:0.5")
+    parser.add_argument('--tokens-per-second', default='0', help="fake LLM token rate (0 = instant)")
+    parser.add_argument('--reply-words', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="append results to this JSON-lines file")
+    args = parser.parse_args()
+
+    if args.scenario == 'all':
+        # Fresh interpreter per scenario so peak RSS is not shared between them
+        options = {key: value for key, value in vars(args).items() if key not in ('scenario', 'output')}
+        argv = [item for key, value in options.items() for item in (f"--{key.replace('_', '-')}", str(value))]
+        lines = []
+        for name in SCENARIOS:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--scenario', name] + argv,
+                check=True, stdout=subprocess.PIPE, universal_newlines=True
+            )
+            lines.append(completed.stdout.strip().splitlines()[-1])
+    else:
+        lines = [json.dumps(run_scenario(args.scenario, args))]
+
+    for line in lines:
+        print(line)
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+
+if __name__ == "__main__":
+    main()
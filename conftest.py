@@ -0,0 +1,45 @@
+"""Shared test fixtures: companions answering with the offline fake LLM."""
+import os
+
+import pytest
+
+from ai_companion import AICompanion
+from async_companion import AsyncAICompanion
+from fake_llm import AsyncFakeLLMClient, FakeLLMClient
+
+PERSONALITY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'personality.json')
+
+
+@pytest.fixture
+def personality_file():
+    return PERSONALITY_FILE
+
+
+@pytest.fixture
+def make_companion(tmp_path, monkeypatch):
+    """
+    Factory for AICompanions working in tmp_path. Unless a ``client`` is given,
+    each answers with a FakeLLMClient built from ``latency``, ``tokens_per_second``
+    and ``reply``; other keyword arguments go to AICompanion.
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def make(client=None, latency=0, tokens_per_second=0, reply=None, **kwargs):
+        if client is None:
+            client = FakeLLMClient(latency=latency, tokens_per_second=tokens_per_second, reply=reply)
+        return AICompanion(PERSONALITY_FILE, client=client, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def make_async_companion(tmp_path, monkeypatch):
+    """make_companion for AsyncAICompanion, answering with an AsyncFakeLLMClient."""
+    monkeypatch.chdir(tmp_path)
+
+    def make(client=None, latency=0, tokens_per_second=0, reply=None, **kwargs):
+        if client is None:
+            client = AsyncFakeLLMClient(latency=latency, tokens_per_second=tokens_per_second, reply=reply)
+        return AsyncAICompanion(PERSONALITY_FILE, client=client, **kwargs)
+
+    return make
@@ -0,0 +1,342 @@
+"""
+Saved conversation files: a streaming reader and a cross-archive search index.
+
+``read_conversation_tail`` loads the header and only the last turns of a file
+written by ``ConversationMemory.save_to_file`` without parsing the rest, and
+``iter_conversation`` streams any conversation file turn by turn in bounded
+memory. ``ConversationArchive`` keeps a SQLite/FTS5 index over every saved
+``conversation_*.json`` (by term, topic and date); ``refresh`` only re-reads
+files whose mtime or size changed, so keeping the index current across
+thousands of archives costs one ``stat`` per file.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from memory_index import tokenize
+
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WS_RE = re.compile(r'\s*')
+# save_to_file writes with indent=2, so each turn of "conversations" starts on a line of its own
+_TURN_START_RE = re.compile(rb'\n    \{')
+_ARRAY_END_RE = re.compile(r'\s*\]\s*\}\s*$')
+
+
+class _JSONStream:
+    """Decodes JSON values one at a time from a file read in chunks."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        # Read at least as much as is buffered, so one huge value is not re-decoded once per chunk
+        chunk = self.f.read(max(CHUNK_SIZE, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            self.pos = _WS_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r}")
+        self.pos += 1
+
+    def skip(self, char: str) -> bool:
+        if self.peek() == char:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_conversation(path: str) -> Iterator[Tuple[str, object]]:
+    """
+    Stream a conversation file as (key, value) pairs for its top-level fields,
+    with ('conversations', None) marking the start of the turns and one
+    ('turn', record) pair per turn.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JSONStream(f)
+        stream.expect('{')
+        if stream.skip('}'):
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if key == 'conversations' and stream.peek() == '[':
+                yield key, None
+                stream.expect('[')
+                if not stream.skip(']'):
+                    while True:
+                        yield 'turn', stream.value()
+                        if not stream.skip(','):
+                            break
+                    stream.expect(']')
+            else:
+                yield key, stream.value()
+            if not stream.skip(','):
+                stream.expect('}')
+                return
+
+
+def _scan_tail(path: str, limit: int) -> Optional[List[Dict]]:
+    """
+    Decode the last ``limit`` turns by reading backwards from the end of the
+    file. Returns None if the file does not have save_to_file's layout.
+    """
+    size = os.path.getsize(path)
+    block = CHUNK_SIZE
+    with open(path, 'rb') as f:
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            data = f.read(size - start)
+            starts = [m.start() + 1 for m in _TURN_START_RE.finditer(data)]
+            if len(starts) > limit or start == 0:
+                break
+            block *= 4
+    if not starts:
+        return None
+    text = data[starts[-limit:][0]:].decode('utf-8')
+    records, pos = [], _WS_RE.match(text).end()
+    try:
+        while True:
+            record, pos = _DECODER.raw_decode(text, pos)
+            records.append(record)
+            pos = _WS_RE.match(text, pos).end()
+            if pos >= len(text) or text[pos] != ',':
+                break
+            pos = _WS_RE.match(text, pos + 1).end()
+    except json.JSONDecodeError:
+        return None
+    if len(records) != min(limit, len(starts)) or not _ARRAY_END_RE.match(text, pos):
+        return None
+    if not all(isinstance(record, dict) for record in records):
+        return None
+    return records
+
+
+def read_conversation_tail(path: str, limit: int) -> Tuple[Dict, List[Dict]]:
+    """
+    The top-level fields (summary, timestamp, ...) of a conversation file and
+    its last ``limit`` turns. Earlier turns are skipped rather than parsed when
+    the file has save_to_file's layout, and streamed past otherwise.
+    """
+    header = {}
+    for key, value in iter_conversation(path):
+        if key == 'conversations':
+            break
+        header[key] = value
+    records = _scan_tail(path, limit) if limit > 0 else []
+    if records is None:
+        tail = deque(maxlen=limit)
+        for key, value in iter_conversation(path):
+            if key == 'turn':
+                tail.append(value)
+            elif key != 'conversations':
+                header[key] = value
+        records = list(tail)
+    return header, records
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    turns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    timestamp TEXT,
+    day TEXT,
+    user_input TEXT NOT NULL,
+    ai_response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_path ON turns (path);
+CREATE INDEX IF NOT EXISTS turns_day ON turns (day);
+CREATE TABLE IF NOT EXISTS turn_topics (
+    topic TEXT NOT NULL,
+    turn_id INTEGER NOT NULL,
+    PRIMARY KEY (topic, turn_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    user_input, ai_response, content='turns', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts (rowid, user_input, ai_response) VALUES (new.id, new.user_input, new.ai_response);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts (turns_fts, rowid, user_input, ai_response)
+    VALUES ('delete', old.id, old.user_input, old.ai_response);
+    DELETE FROM turn_topics WHERE turn_id = old.id;
+END;
+"""
+
+
+class ConversationArchive:
+    """
+    Search index over saved conversation files matching ``patterns``, stored
+    in SQLite at ``index_path``. Call ``refresh`` to pick up new, changed and
+    deleted files; ``search`` then answers from the index alone.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ('conversation_*.json',),
+                 index_path: str = "conversation_index.sqlite"):
+        self.patterns = list(patterns)
+        self.index_path = index_path
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _archive_paths(self) -> List[str]:
+        paths = set()
+        for pattern in self.patterns:
+            paths.update(os.path.abspath(path) for path in glob.glob(pattern))
+        return sorted(paths)
+
+    def refresh(self) -> Dict[str, int]:
+        """Index new and modified archives and drop deleted ones. Returns counts per outcome."""
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0, 'failed': 0}
+        with self._lock:
+            known = {path: (mtime, size) for path, mtime, size in
+                     self._conn.execute("SELECT path, mtime, size FROM archives")}
+            for path in self._archive_paths():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                signature = known.pop(path, None)
+                if signature == (stat.st_mtime, stat.st_size):
+                    stats['unchanged'] += 1
+                    continue
+                try:
+                    self._index_file(path, stat)
+                    stats['indexed'] += 1
+                except Exception as e:
+                    print(f"Error indexing conversation archive {path}: {e}")
+                    stats['failed'] += 1
+            for path in known:
+                with self._conn:
+                    self._conn.execute("DELETE FROM turns WHERE path = ?", (path,))
+                    self._conn.execute("DELETE FROM archives WHERE path = ?", (path,))
+                stats['removed'] += 1
+        return stats
+
+    def _index_file(self, path: str, stat: os.stat_result):
+        saved_at = None
+        rows, topics = [], []
+        for key, value in iter_conversation(path):
+            if key == 'timestamp' and isinstance(value, str):
+                saved_at = value
+            elif key == 'turn' and isinstance(value, dict):
+                context = value.get('context') or {}
+                timestamp = value.get('timestamp') or context.get('timestamp') or saved_at
+                if not isinstance(timestamp, str):
+                    timestamp = datetime.fromtimestamp(stat.st_mtime).isoformat()
+                rows.append((len(rows), timestamp, timestamp[:10],
+                             str(value.get('user_input', '')), str(value.get('ai_response', ''))))
+                topics.append(context.get('detected_topics') or [])
+        with self._conn:
+            self._conn.execute("DELETE FROM turns WHERE path = ?", (path,))
+            for (position, timestamp, day, user_input, ai_response), turn_topics in zip(rows, topics):
+                turn_id = self._conn.execute(
+                    "INSERT INTO turns (path, position, timestamp, day, user_input, ai_response) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (path, position, timestamp, day, user_input, ai_response)
+                ).lastrowid
+                self._conn.executemany("INSERT OR IGNORE INTO turn_topics (topic, turn_id) VALUES (?, ?)",
+                                       [(str(topic), turn_id) for topic in turn_topics])
+            self._conn.execute("INSERT OR REPLACE INTO archives (path, mtime, size, turns) VALUES (?, ?, ?, ?)",
+                               (path, stat.st_mtime, stat.st_size, len(rows)))
+
+    def search(self, query: str = '', topic: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, limit: int = 10, directory: Optional[str] = None) -> List[Dict]:
+        """
+        Turns containing every query term (best BM25 match first), optionally
+        restricted to a topic, an inclusive YYYY-MM-DD date range and the files
+        under ``directory``. Without terms, the newest matching turns are returned.
+        """
+        terms = sorted(set(tokenize(query)))
+        clauses, params = [], []
+        if terms:
+            select = "SELECT t.path, t.position, t.timestamp, t.user_input, t.ai_response, bm25(turns_fts) AS score " \
+                     "FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid"
+            clauses.append("turns_fts MATCH ?")
+            params.append(' '.join(f'"{term}"' for term in terms))
+            order = "score"
+        else:
+            select = "SELECT t.path, t.position, t.timestamp, t.user_input, t.ai_response, 0 AS score FROM turns t"
+            order = "t.timestamp DESC"
+        if topic:
+            clauses.append("t.id IN (SELECT turn_id FROM turn_topics WHERE topic = ?)")
+            params.append(topic)
+        if since:
+            clauses.append("t.day >= ?")
+            params.append(since)
+        if until:
+            clauses.append("t.day <= ?")
+            params.append(until)
+        if directory:
+            # A prefix comparison rather than LIKE, whose wildcards may appear in file names
+            prefix = os.path.join(os.path.abspath(directory), '')
+            clauses.append("substr(t.path, 1, ?) = ?")
+            params.extend([len(prefix), prefix])
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"{select}{where} ORDER BY {order} LIMIT ?", params + [limit]).fetchall()
+        return [
+            {'path': path, 'position': position, 'timestamp': timestamp,
+             'user_input': user_input, 'ai_response': ai_response, 'score': -score}
+            for path, position, timestamp, user_input, ai_response, score in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            archives, turns = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(turns), 0) FROM archives").fetchone()
+        return {'archives': archives, 'turns': turns}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,42 +1,97 @@
-from typing import List, Dict, Optional
-import json
+from typing import Callable, List, Dict, Optional, Tuple
+import os
 from datetime import datetime
 from collections import deque
-import os
+import threading
+import time
+from conversation_archive import read_conversation_tail
+from interaction import Interaction
+from keyword_classifier import KeywordClassifier, default_classifier
+from memory_store import JournalMemoryStore, MemoryStore, memory_text
+from conversation_summarizer import default_worker
+from write_behind import WriteBehindWorker, atomic_write_json, default_writer
 
 class ConversationMemory:
-    def __init__(self, max_history: int = 10):
+    def __init__(self, max_history: int = 10, memory_file: str = "long_term_memory.json",
+                 vector_store=None, summarizer=None, store: Optional[MemoryStore] = None,
+                 classifier: Optional[KeywordClassifier] = None,
+                 store_factory: Optional[Callable[[], MemoryStore]] = None,
+                 dedup_threshold: Optional[float] = 0.8):
         self.max_history = max_history
         self.conversations = deque(maxlen=max_history)
-        self.long_term_memory = []
-        self.memory_file = "long_term_memory.json"
-        self._load_long_term_memory()
+        # Prompt rendering of each turn in self.conversations, kept in step with it
+        self._rendered_turns = deque(maxlen=max_history)
+        # Running summary of turns evicted from the history, updated in the background
+        self.summary = ""
+        self.summary_generation = 0
+        self._summarizer = summarizer
+        # Set with /preferences; saved and loaded with the conversation
+        self.user_preferences: Dict[str, str] = {}
+        self.memory_file = memory_file
+        # Long-term memory backend (see memory_store.py); by default an append-only
+        # journal next to the legacy JSON file. Without an explicit store it is
+        # opened on first use, so constructing a memory does no disk I/O.
+        self._store = store
+        self._store_factory = store_factory or (lambda: JournalMemoryStore(memory_file))
+        self._store_lock = threading.Lock()
+        # Optional embedding store (see vector_store.py) used for semantic retrieval
+        self.vector_store = vector_store
+        if store is not None and vector_store is not None:
+            self._rebuild_vector_index()
+        # Decides which turns are worth keeping in long-term memory (its 'memory' group)
+        self.classifier = classifier or default_classifier()
+        # Near-duplicates of a stored memory (estimated Jaccard >= dedup_threshold) are merged
+        # into it rather than stored again; None disables. The LSH index is built on a background
+        # thread (see build_consolidator); memories stored before it is ready skip the check.
+        self.dedup_threshold = dedup_threshold
+        self._consolidator = None
+        self._consolidator_lock = threading.Lock()
+        self._consolidator_thread = None
+        # (doc id, text) of memories stored while the index was being built
+        self._unindexed: List[Tuple[int, str]] = []
 
-    def add_interaction(self, user_input: str, ai_response: str, context: Optional[Dict] = None):
-        """Add a new interaction to the conversation history."""
-        interaction = {
-            'timestamp': datetime.now().isoformat(),
-            'user_input': user_input,
-            'ai_response': ai_response,
-            'context': context or {}
-        }
-        
+    def add_interaction(self, user_input: str, ai_response: str, context: Optional[Dict] = None,
+                        input_important: Optional[bool] = None):
+        """
+        Add a new interaction to the conversation history. ``input_important`` is
+        the caller's classification of ``user_input`` if it already has one, so
+        only the response needs to be checked for memory triggers.
+        """
+        interaction = Interaction.from_context(
+            user_input, ai_response, context, timestamp=time.time(), snapshots=self.preference_snapshots
+        )
+
+        if len(self.conversations) == self.conversations.maxlen:
+            self._summarize_evicted([self.conversations[0]])
         self.conversations.append(interaction)
+        self._rendered_turns.append(self._render_turn(interaction))
         
         # If this seems like an important interaction, save to long-term memory
-        if self._is_important_interaction(interaction):
+        if self._is_important_interaction(interaction, input_important):
             self._add_to_long_term_memory(interaction)
 
     def get_recent_context(self, num_messages: int = 5) -> str:
         """Get the most recent conversation context."""
-        recent = list(self.conversations)[-num_messages:]
-        context_str = ""
-        
-        for interaction in recent:
-            context_str += f"User: {interaction['user_input']}\n"
-            context_str += f"AI: {interaction['ai_response']}\n"
-        
-        return context_str
+        return ''.join(self.get_recent_turns(num_messages))
+
+    def get_recent_turns(self, num_messages: Optional[int] = None) -> List[str]:
+        """Get the rendered text of the most recent turns, oldest first (all retained turns by default)."""
+        turns = list(self._rendered_turns)
+        if num_messages is None:
+            return turns
+        return turns[-num_messages:] if num_messages > 0 else []
+
+    def _summarize_evicted(self, interactions: List[Interaction]):
+        """Hand turns that drop out of the history to the background summarizer."""
+        if not interactions:
+            return
+        if self._summarizer is None:
+            self._summarizer = default_worker()
+        self._summarizer.submit(self, interactions)
+
+    @staticmethod
+    def _render_turn(interaction: Interaction) -> str:
+        return f"User: {interaction.user_input}\nAI: {interaction.ai_response}\n"
 
     def get_conversation_summary(self) -> str:
         """Generate a summary of the current conversation."""
@@ -48,8 +103,8 @@ class ConversationMemory:
         # Add basic statistics
         summary += f"Total messages: {len(self.conversations)}\n"
         if self.conversations:
-            start_time = datetime.fromisoformat(self.conversations[0]['timestamp'])
-            end_time = datetime.fromisoformat(self.conversations[-1]['timestamp'])
+            start_time = datetime.fromtimestamp(self.conversations[0].timestamp)
+            end_time = datetime.fromtimestamp(self.conversations[-1].timestamp)
             duration = end_time - start_time
             summary += f"Duration: {duration}\n\n"
         
@@ -65,88 +120,203 @@ class ConversationMemory:
     def clear_memory(self):
         """Clear the conversation history."""
         self.conversations.clear()
+        self._rendered_turns.clear()
+        self.summary = ""
+        self.summary_generation += 1
 
     def save_to_file(self, filename: str):
-        """Save the current conversation to a file."""
+        """Save the current conversation (and its running summary) to a file."""
+        self._write_snapshot(filename, [interaction.to_dict() for interaction in self.conversations])
+
+    def save_in_background(self, filename: str, writer: Optional[WriteBehindWorker] = None):
+        """
+        Snapshot the conversation now and write it on the write-behind worker.
+        Repeated saves to the same file before the write runs collapse into one.
+        """
+        conversations = [interaction.to_dict() for interaction in self.conversations]
+        preferences = dict(self.user_preferences)
+        filename = os.path.abspath(filename)
+        writer = writer or default_writer()
+        writer.submit(('conversation', filename),
+                      lambda: self._write_snapshot(filename, conversations, preferences))
+
+    def _write_snapshot(self, filename: str, conversations: List[Dict],
+                        preferences: Optional[Dict[str, str]] = None):
+        if self._summarizer is not None:
+            self._summarizer.flush(timeout=2.0)
         data = {
             'timestamp': datetime.now().isoformat(),
-            'conversations': list(self.conversations)
+            'summary': self.summary,
+            'user_preferences': self.user_preferences if preferences is None else preferences,
+            'conversations': conversations
         }
-        
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        atomic_write_json(filename, data, indent=2)
 
     def load_from_file(self, filename: str):
-        """Load a conversation from a file."""
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            self.conversations = deque(data['conversations'], maxlen=self.max_history)
+        """
+        Load a conversation from a file. Only the last max_history turns are
+        parsed; earlier ones are covered by the saved summary (and searchable
+        through the conversation archive index).
+        """
+        writer = default_writer()
+        if writer.is_pending(('conversation', os.path.abspath(filename))):
+            writer.flush()
+        header, records = read_conversation_tail(filename, self.max_history)
+        interactions = [Interaction.from_dict(record, self.preference_snapshots) for record in records]
+        self.summary = header.get('summary', "")
+        if 'user_preferences' in header:
+            self.user_preferences = dict(header['user_preferences'] or {})
+        self.summary_generation += 1
+        self.conversations = deque(interactions, maxlen=self.max_history)
+        self._rendered_turns = deque(
+            (self._render_turn(interaction) for interaction in self.conversations),
+            maxlen=self.max_history
+        )
 
-    def _is_important_interaction(self, interaction: Dict) -> bool:
+    def _is_important_interaction(self, interaction: Interaction, input_important: Optional[bool] = None) -> bool:
         """Determine if an interaction should be saved to long-term memory."""
-        important_keywords = [
-            'remember', 'important', 'don\'t forget', 'note',
-            'preference', 'always', 'never', 'favorite'
-        ]
-        
-        text = f"{interaction['user_input']} {interaction['ai_response']}".lower()
-        return any(keyword in text for keyword in important_keywords)
+        if input_important is None:
+            return self.classifier.matches('memory', f"{interaction.user_input}\n{interaction.ai_response}")
+        return input_important or self.classifier.matches('memory', interaction.ai_response)
 
-    def _add_to_long_term_memory(self, interaction: Dict):
-        """Add an interaction to long-term memory and save to file."""
-        self.long_term_memory.append(interaction)
-        self._save_long_term_memory()
+    def _add_to_long_term_memory(self, interaction: Interaction):
+        """Add an interaction to the long-term memory store, merging it into a near-duplicate if there is one."""
+        text = memory_text(interaction)
+        if self.dedup_threshold is None:
+            doc_id = self.store.append(interaction)
+        else:
+            consolidator = self.consolidator
+            signature = consolidator.signature(text) if consolidator is not None else None
+            # Held across find and add so two near-identical turns cannot both be stored
+            with self._consolidator_lock:
+                if self._consolidator is None:
+                    doc_id = self.store.append(interaction)
+                    self._unindexed.append((doc_id, text))
+                else:
+                    consolidator = self._consolidator
+                    if signature is None:
+                        signature = consolidator.signature(text)
+                    match = consolidator.find(signature)
+                    if match is not None:
+                        self.store.merge(match[0], interaction)
+                        return
+                    doc_id = self.store.append(interaction)
+                    consolidator.add(doc_id, signature)
+        if self.vector_store is not None:
+            self.vector_store.add(doc_id, text)
 
-    def _load_long_term_memory(self):
-        """Load long-term memory from file."""
-        try:
-            if os.path.exists(self.memory_file):
-                with open(self.memory_file, 'r') as f:
-                    self.long_term_memory = json.load(f)
-        except Exception as e:
-            print(f"Error loading long-term memory: {e}")
-            self.long_term_memory = []
+    @property
+    def consolidator(self):
+        """
+        LSH index of the stored memories for near-duplicate detection, or None
+        while it is still being built (the first access starts the build).
+        """
+        if self._consolidator is None:
+            self.build_consolidator()
+        return self._consolidator
 
-    def _save_long_term_memory(self):
-        """Save long-term memory to file."""
+    def build_consolidator(self, wait: bool = False) -> Optional[threading.Thread]:
+        """
+        Build the near-duplicate index of the store's working set on a background
+        thread, so hashing a large store never delays a turn. Returns the thread,
+        or None if the index is already built.
+        """
+        with self._consolidator_lock:
+            if self._consolidator is None and self._consolidator_thread is None:
+                self._consolidator_thread = threading.Thread(target=self._build_consolidator,
+                                                             name="memory-dedup-index", daemon=True)
+                self._consolidator_thread.start()
+            thread = self._consolidator_thread
+        if wait and thread is not None:
+            thread.join()
+        return thread
+
+    def _build_consolidator(self):
+        from memory_dedup import MemoryConsolidator
+        consolidator = MemoryConsolidator(self.dedup_threshold)
         try:
-            with open(self.memory_file, 'w') as f:
-                json.dump(self.long_term_memory, f, indent=2)
+            for doc_id, memory in self.store.working_set():
+                consolidator.add(doc_id, consolidator.signature(memory_text(memory)))
         except Exception as e:
-            print(f"Error saving long-term memory: {e}")
+            print(f"Error indexing long-term memory for deduplication: {e}")
+        with self._consolidator_lock:
+            for doc_id, text in self._unindexed:
+                if doc_id not in consolidator:
+                    consolidator.add(doc_id, consolidator.signature(text))
+            self._unindexed = []
+            self._consolidator = consolidator
+            self._consolidator_thread = None
+
+    @property
+    def store(self) -> MemoryStore:
+        """The long-term memory store, opened (and indexed for vector search) on first access."""
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    store = self._store_factory()
+                    self._store = store
+                    if self.vector_store is not None:
+                        self._rebuild_vector_index()
+        return self._store
+
+    @property
+    def store_loaded(self) -> bool:
+        return self._store is not None
+
+    @property
+    def preference_snapshots(self):
+        """Turns recorded under the same user preferences share one snapshot."""
+        return self.store.snapshots
+
+    @property
+    def long_term_memory(self) -> MemoryStore:
+        """Long-term memories, readable like a list indexed by doc id."""
+        return self.store
+
+    def _rebuild_vector_index(self):
+        """Re-embed all long-term memories for semantic retrieval."""
+        doc_ids, texts = [], []
+        for doc_id, memory in self.store.items():
+            doc_ids.append(doc_id)
+            texts.append(memory_text(memory))
+        self.vector_store.clear()
+        self.vector_store.add_many(doc_ids, texts)
+        self.vector_store.save()
+
+    def resident_size(self) -> int:
+        """Long-term memories this session holds in RAM (none until its store is opened)."""
+        store = self._store
+        return store.resident_size() if store is not None else 0
+
+    def flush(self):
+        """Force pending long-term memory writes to disk."""
+        if self._store is None:
+            return
+        self.store.flush()
+        if self.vector_store is not None:
+            self.vector_store.save()
+
+    def close(self):
+        """Flush and release the long-term memory store."""
+        if self._store is None:
+            return
+        self.store.close()
+        if self.vector_store is not None:
+            self.vector_store.save()
 
     def _extract_topics(self) -> List[str]:
         """Extract main topics from the conversation."""
         # This is a simple implementation - could be enhanced with NLP
         topics = set()
         for interaction in self.conversations:
-            # Extract topics from context if available
-            if 'context' in interaction and 'detected_topics' in interaction['context']:
-                topics.update(interaction['context']['detected_topics'])
+            topics.update(interaction.topics)
         return list(topics)
 
-    def get_relevant_memories(self, query: str, limit: int = 5) -> List[Dict]:
+    def get_relevant_memories(self, query: str, limit: int = 5) -> List[Interaction]:
         """
         Retrieve relevant memories based on a query.
-        This is a simple implementation - could be enhanced with embeddings and semantic search.
+        Memories are ranked by embedding similarity when a vector store is configured,
+        and by the store's keyword search (BM25) otherwise.
         """
-        relevant = []
-        query_terms = query.lower().split()
-        
-        for memory in self.long_term_memory:
-            relevance_score = 0
-            memory_text = f"{memory['user_input']} {memory['ai_response']}".lower()
-            
-            for term in query_terms:
-                if term in memory_text:
-                    relevance_score += 1
-            
-            if relevance_score > 0:
-                relevant.append({
-                    'memory': memory,
-                    'score': relevance_score
-                })
-        
-        # Sort by relevance and return top matches
-        relevant.sort(key=lambda x: x['score'], reverse=True)
-        return [item['memory'] for item in relevant[:limit]]
+        index = self.vector_store if self.vector_store is not None else self.store
+        return self.store.get_many(doc_id for doc_id, _ in index.search(query, limit))
@@ -0,0 +1,132 @@
+"""
+Background rolling summarization of conversation turns that fall out of the
+short-term history.
+
+A single worker thread serves every ConversationMemory, so the request path
+only enqueues evicted turns and never waits for summarization.
+"""
+from typing import Callable, Dict, List, Optional
+import queue
+import re
+import threading
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    sentence = _SENTENCE_END_RE.split(text.strip(), maxsplit=1)[0]
+    sentence = ' '.join(sentence.split())
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 3].rstrip() + '...'
+
+
+def extractive_summary(summary: str, interactions: List[Dict], max_chars: int = 1500) -> str:
+    """
+    Fold turns into the running summary by keeping the first sentence of each
+    side of the exchange. The oldest lines are dropped once the summary exceeds
+    ``max_chars``. Runs locally without any API call.
+    """
+    lines = summary.splitlines() if summary else []
+    for interaction in interactions:
+        user = _first_sentence(interaction['user_input'], 120)
+        ai = _first_sentence(interaction['ai_response'], 160)
+        lines.append(f"- User: {user} / AI: {ai}")
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def llm_summary_fn(client, model: str = "gpt-3.5-turbo", max_tokens: int = 300) -> Callable[[str, List[Dict]], str]:
+    """Build a summarize function that asks the chat model to update the running summary."""
+    def summarize(summary: str, interactions: List[Dict]) -> str:
+        turns = ''.join(f"User: {i['user_input']}\nAI: {i['ai_response']}\n" for i in interactions)
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You maintain a compact running summary of a conversation. "
+                                              "Keep facts about the user, decisions and open questions."},
+                {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\n"
+                                            f"New turns:\n{turns}\nReturn the updated summary."}
+            ],
+            temperature=0.2,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content.strip()
+    return summarize
+
+
+class SummaryWorker:
+    """
+    Background thread that applies ``summarize_fn(summary, interactions)`` to
+    memories' evicted turns. Pending turns for the same memory are folded in
+    together.
+    """
+
+    def __init__(self, summarize_fn: Optional[Callable[[str, List[Dict]], str]] = None):
+        self.summarize_fn = summarize_fn or extractive_summary
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, memory, interactions: List[Dict]):
+        """Queue evicted turns of ``memory`` for summarization. Never blocks."""
+        if interactions:
+            self._queue.put((memory, memory.summary_generation, list(interactions)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued turns are summarized. Returns False on timeout."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            # Drain whatever else is pending so each memory is summarized once per batch
+            while True:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(jobs)
+
+    def _process(self, jobs: List):
+        pending = {}
+        order = []
+        markers = []
+        for job in jobs:
+            if isinstance(job, threading.Event):
+                markers.append(job)
+                continue
+            memory, generation, interactions = job
+            key = (id(memory), generation)
+            if key not in pending:
+                pending[key] = (memory, generation, [])
+                order.append(key)
+            pending[key][2].extend(interactions)
+
+        for key in order:
+            memory, generation, interactions = pending[key]
+            try:
+                summary = self.summarize_fn(memory.summary, interactions)
+            except Exception as e:
+                print(f"Error summarizing conversation: {e}")
+                continue
+            # Drop results for a memory that was cleared or reloaded in the meantime
+            if memory.summary_generation == generation:
+                memory.summary = summary
+
+        for marker in markers:
+            marker.set()
+
+
+_default_worker = None
+_default_worker_lock = threading.Lock()
+
+
+def default_worker() -> SummaryWorker:
+    """Return the process-wide summary worker, starting it on first use."""
+    global _default_worker
+    with _default_worker_lock:
+        if _default_worker is None:
+            _default_worker = SummaryWorker()
+        return _default_worker
@@ -0,0 +1,217 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+The fake clients expose the same ``client.chat.completions.create(...)`` surface
+that AICompanion uses, so conversations can be driven and benchmarked offline.
+Latency and token rate can be fixed numbers or seeded Distributions, so a
+benchmark run replays the same timings every time.
+
+Like the provider, the fakes report ``usage.prompt_tokens_details.cached_tokens``:
+the estimated tokens of the prompt prefix shared with the previous request.
+Streams end with a usage chunk when ``stream_options={"include_usage": True}``.
+"""
+from types import SimpleNamespace
+from typing import Dict, Iterator, AsyncIterator, List, Optional, Union
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+
+
+class Distribution:
+    """
+    Seeded random distribution of non-negative values.
+    ``kind`` is one of 'fixed', 'uniform' (mean +/- spread), 'normal' (spread is the
+    standard deviation) or 'lognormal' (spread is the sigma of the underlying normal).
+    """
+
+    def __init__(self, kind: str = 'fixed', mean: float = 0.0, spread: float = 0.0, seed: int = 0):
+        if kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown distribution kind: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: Union[str, float], seed: int = 0) -> 'Distribution':
+        """Parse '0.2', 'uniform:0.2:0.05', 'normal:0.2:0.05' or 'lognormal:0.2:0.5'."""
+        if isinstance(spec, (int, float)):
+            return cls('fixed', float(spec), seed=seed)
+        parts = spec.split(':')
+        if len(parts) == 1:
+            return cls('fixed', float(parts[0]), seed=seed)
+        return cls(parts[0], float(parts[1]), float(parts[2]) if len(parts) > 2 else 0.0, seed=seed)
+
+    def sample(self) -> float:
+        if self.kind == 'fixed':
+            return self.mean
+        with self._lock:
+            if self.kind == 'uniform':
+                value = self._rng.uniform(self.mean - self.spread, self.mean + self.spread)
+            elif self.kind == 'normal':
+                value = self._rng.gauss(self.mean, self.spread)
+            else:
+                # Parameterized so the median equals ``mean``
+                value = self._rng.lognormvariate(math.log(self.mean) if self.mean > 0 else 0.0, self.spread)
+        return max(0.0, value)
+
+
+def _as_distribution(value: Union[float, Distribution]) -> Distribution:
+    return value if isinstance(value, Distribution) else Distribution('fixed', float(value))
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class _FakeBackend:
+    """Shared reply generation and timing model for the sync and async fakes."""
+
+    def __init__(self, latency: Union[float, Distribution] = 0.05,
+                 tokens_per_second: Union[float, Distribution] = 200.0,
+                 reply: str = None, reply_words: Optional[int] = None):
+        self.latency = _as_distribution(latency)
+        self.tokens_per_second = _as_distribution(tokens_per_second)
+        self.reply = reply
+        self.reply_words = reply_words
+        self.calls = 0
+        # Stands in for the provider's prompt prefix cache
+        self._last_prompt = ""
+        self._prompt_lock = threading.Lock()
+
+    def make_reply(self, messages: List[Dict]) -> str:
+        if self.reply is not None:
+            return self.reply
+        user_text = messages[-1]['content'] if messages else ''
+        last_line = user_text.strip().splitlines()[-1] if user_text.strip() else ''
+        reply = f"This is a simulated reply to: {last_line[:80]}"
+        if self.reply_words:
+            words = reply.split()
+            filler = "and here is some more simulated detail".split()
+            words += [filler[i % len(filler)] for i in range(max(0, self.reply_words - len(words)))]
+            reply = ' '.join(words[:self.reply_words])
+        return reply
+
+    def chunks(self, text: str) -> List[str]:
+        words = text.split(' ')
+        return [word + (' ' if i < len(words) - 1 else '') for i, word in enumerate(words)]
+
+    def token_delay(self) -> float:
+        rate = self.tokens_per_second.sample()
+        return 1.0 / rate if rate > 0 else 0.0
+
+    def cached_tokens(self, messages: List[Dict]) -> int:
+        """Estimated tokens of the prompt prefix this request shares with the previous one."""
+        prompt = '\n'.join(m.get('content') or '' for m in messages)
+        with self._prompt_lock:
+            previous, self._last_prompt = self._last_prompt, prompt
+        return len(os.path.commonprefix([previous, prompt])) // 4
+
+    def usage(self, messages: List[Dict], reply: str) -> SimpleNamespace:
+        prompt_tokens = sum(_estimate_tokens(m.get('content') or '') for m in messages)
+        completion_tokens = _estimate_tokens(reply)
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=self.cached_tokens(messages))
+        )
+
+    @staticmethod
+    def completion(reply: str, usage: SimpleNamespace) -> SimpleNamespace:
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=reply))],
+            usage=usage
+        )
+
+    @staticmethod
+    def chunk(content: str) -> SimpleNamespace:
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    @staticmethod
+    def usage_chunk(usage: SimpleNamespace) -> SimpleNamespace:
+        """The final, choice-less chunk of a stream that asked for usage."""
+        return SimpleNamespace(choices=[], usage=usage)
+
+
+class _FakeCompletions:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    def create(self, model: str = None, messages: List[Dict] = None, stream: bool = False, **kwargs):
+        backend = self._backend
+        backend.calls += 1
+        messages = messages or []
+        reply = backend.make_reply(messages)
+        usage = backend.usage(messages, reply)
+        time.sleep(backend.latency.sample())
+        token_delay = backend.token_delay()
+        if stream:
+            include_usage = (kwargs.get('stream_options') or {}).get('include_usage')
+            return self._stream(reply, token_delay, usage if include_usage else None)
+        time.sleep(token_delay * len(backend.chunks(reply)))
+        return backend.completion(reply, usage)
+
+    def _stream(self, reply: str, token_delay: float,
+                usage: Optional[SimpleNamespace]) -> Iterator[SimpleNamespace]:
+        for piece in self._backend.chunks(reply):
+            if token_delay:
+                time.sleep(token_delay)
+            yield self._backend.chunk(piece)
+        if usage is not None:
+            yield self._backend.usage_chunk(usage)
+
+
+class _AsyncFakeCompletions:
+    def __init__(self, backend: _FakeBackend):
+        self._backend = backend
+
+    async def create(self, model: str = None, messages: List[Dict] = None, stream: bool = False, **kwargs):
+        backend = self._backend
+        backend.calls += 1
+        messages = messages or []
+        reply = backend.make_reply(messages)
+        usage = backend.usage(messages, reply)
+        await asyncio.sleep(backend.latency.sample())
+        token_delay = backend.token_delay()
+        if stream:
+            include_usage = (kwargs.get('stream_options') or {}).get('include_usage')
+            return self._stream(reply, token_delay, usage if include_usage else None)
+        await asyncio.sleep(token_delay * len(backend.chunks(reply)))
+        return backend.completion(reply, usage)
+
+    async def _stream(self, reply: str, token_delay: float,
+                      usage: Optional[SimpleNamespace]) -> AsyncIterator[SimpleNamespace]:
+        for piece in self._backend.chunks(reply):
+            await asyncio.sleep(token_delay)
+            yield self._backend.chunk(piece)
+        if usage is not None:
+            yield self._backend.usage_chunk(usage)
+
+
+class FakeLLMClient:
+    """Synchronous fake with the ``chat.completions.create`` interface of ``openai.OpenAI``."""
+
+    def __init__(self, latency: Union[float, Distribution] = 0.05,
+                 tokens_per_second: Union[float, Distribution] = 200.0,
+                 reply: str = None, reply_words: Optional[int] = None):
+        self.backend = _FakeBackend(latency, tokens_per_second, reply, reply_words)
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self.backend))
+
+
+class AsyncFakeLLMClient:
+    """Asynchronous fake with the ``chat.completions.create`` interface of ``openai.AsyncOpenAI``."""
+
+    def __init__(self, latency: Union[float, Distribution] = 0.05,
+                 tokens_per_second: Union[float, Distribution] = 200.0,
+                 reply: str = None, reply_words: Optional[int] = None):
+        self.backend = _FakeBackend(latency, tokens_per_second, reply, reply_words)
+        self.chat = SimpleNamespace(completions=_AsyncFakeCompletions(self.backend))
+
+    async def close(self):
+        pass
@@ -0,0 +1,192 @@
+"""
+Compact record for one conversation turn.
+
+Turns used to be stored as nested dicts holding an ISO timestamp string and the
+whole request context. An Interaction keeps the same information in fixed slots:
+epoch timestamps, topic names interned to small integer ids, and a reference to
+a shared preferences snapshot instead of a copy per turn. ``to_dict`` and
+``from_dict`` convert to and from the original JSON layout, and item access
+(``interaction['user_input']``, ``interaction['context']``) still works for code
+written against the dict records.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import threading
+
+
+class TopicTable:
+    """Interns topic names to small integer ids shared by every record."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        topic_id = self._ids.get(name)
+        if topic_id is None:
+            with self._lock:
+                topic_id = self._ids.get(name)
+                if topic_id is None:
+                    topic_id = self._ids[name] = len(self._names)
+                    self._names.append(name)
+        return topic_id
+
+    def ids(self, names: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self.intern(name) for name in names)
+
+    def names(self, ids: Iterable[int]) -> List[str]:
+        return [self._names[topic_id] for topic_id in ids]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+TOPICS = TopicTable()
+
+
+class PreferenceSnapshots:
+    """
+    Deduplicates user preference dicts so every turn recorded under the same
+    preferences references one shared snapshot. Snapshots are copies and must be
+    treated as read-only.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, Dict] = {}
+        self._last: Optional[Dict] = None
+
+    def intern(self, preferences: Optional[Dict]) -> Optional[Dict]:
+        if preferences is None:
+            return None
+        last = self._last
+        if last is not None and (preferences is last or preferences == last):
+            return last
+        key = json.dumps(preferences, sort_keys=True, default=str)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = self._snapshots[key] = dict(preferences)
+        self._last = snapshot
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+
+def _to_epoch(value) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _to_iso(value: Optional[float]) -> Optional[str]:
+    return None if value is None else datetime.fromtimestamp(value).isoformat()
+
+
+_FIELDS = ('timestamp', 'user_input', 'ai_response', 'context')
+
+
+class Interaction:
+    __slots__ = ('timestamp', 'user_input', 'ai_response', 'topic_ids', 'preferences', 'context_time', 'extra',
+                 'hits')
+
+    def __init__(self, user_input: str, ai_response: str, timestamp: Optional[float] = None,
+                 topic_ids: Tuple[int, ...] = (), preferences: Optional[Dict] = None,
+                 context_time: Optional[float] = None, extra: Optional[Dict] = None, hits: int = 1):
+        self.timestamp = timestamp
+        self.user_input = user_input
+        self.ai_response = ai_response
+        self.topic_ids = topic_ids
+        self.preferences = preferences
+        self.context_time = context_time
+        self.extra = extra
+        # Number of near-duplicate memories merged into this one (see memory_dedup.py)
+        self.hits = hits
+
+    @classmethod
+    def from_context(cls, user_input: str, ai_response: str, context: Optional[Dict] = None,
+                     timestamp: Optional[float] = None,
+                     snapshots: Optional[PreferenceSnapshots] = None) -> 'Interaction':
+        """Build a record from a request context dict as produced by AICompanion._build_context."""
+        extra = dict(context) if context else {}
+        preferences = extra.pop('user_preferences', None)
+        if snapshots is not None:
+            preferences = snapshots.intern(preferences)
+        elif preferences is not None:
+            preferences = dict(preferences)
+        return cls(
+            user_input, ai_response,
+            timestamp=timestamp,
+            topic_ids=TOPICS.ids(extra.pop('detected_topics', ())),
+            preferences=preferences,
+            context_time=_to_epoch(extra.pop('timestamp', None)),
+            extra=extra or None
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict, snapshots: Optional[PreferenceSnapshots] = None) -> 'Interaction':
+        """Inverse of ``to_dict``."""
+        interaction = cls.from_context(
+            data.get('user_input', ''), data.get('ai_response', ''), data.get('context'),
+            timestamp=_to_epoch(data.get('timestamp')), snapshots=snapshots
+        )
+        interaction.hits = data.get('hits', 1)
+        return interaction
+
+    @property
+    def topics(self) -> List[str]:
+        return TOPICS.names(self.topic_ids)
+
+    @property
+    def context(self) -> Dict:
+        """The request context in its original dict form."""
+        context = {}
+        if self.context_time is not None:
+            context['timestamp'] = _to_iso(self.context_time)
+        if self.preferences is not None:
+            context['user_preferences'] = self.preferences
+        if self.topic_ids or self.context_time is not None:
+            context['detected_topics'] = self.topics
+        if self.extra:
+            context.update(self.extra)
+        return context
+
+    def to_dict(self) -> Dict:
+        """Serialize to the JSON layout used by conversation files and the memory journal."""
+        data = {}
+        if self.timestamp is not None:
+            data['timestamp'] = _to_iso(self.timestamp)
+        data['user_input'] = self.user_input
+        data['ai_response'] = self.ai_response
+        data['context'] = self.context
+        if self.hits != 1:
+            data['hits'] = self.hits
+        return data
+
+    def __getitem__(self, key: str):
+        if key == 'timestamp':
+            return _to_iso(self.timestamp)
+        if key == 'context':
+            return self.context
+        if key in ('user_input', 'ai_response'):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return key in _FIELDS and (key != 'timestamp' or self.timestamp is not None)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Interaction):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Interaction(timestamp={self.timestamp!r}, user_input={self.user_input!r})"
@@ -0,0 +1,120 @@
+"""
+Keyword classification of user turns in a single pass.
+
+Routing decisions (does this turn need a web search, which topics does it
+touch, is it worth keeping in long-term memory) are all driven by trigger
+phrases. Instead of scanning the text once per phrase with ``in``, every
+vocabulary is compiled into one trie over whole words: the text is tokenized
+once and each word position walks the trie, so the cost per input depends on
+the input length, not the vocabulary size. Matching whole words means "now"
+no longer fires on "know" and "vs" no longer fires inside other words.
+
+Vocabularies are grouped (``web_search``, ``topics``, ``memory``); each group
+maps labels to lists of phrases. Groups can be extended or replaced from the
+``triggers`` section of a personality file.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+# Built-in trigger phrases; the "triggers" section of personality.json overrides them per label
+DEFAULT_TRIGGERS = {
+    'web_search': {
+        'current_events': ['news', 'current', 'latest', 'recent', 'update', 'today', 'now'],
+        'factual_queries': ['what is', 'who is', 'when did', 'where is', 'how does'],
+        'temporal': ['weather', 'price', 'stock', 'happening', 'trend'],
+        'comparative': ['versus', 'vs', 'compared to', 'difference between']
+    },
+    'memory': {
+        'important': ['remember', 'important', "don't forget", 'note',
+                      'preference', 'always', 'never', 'favorite']
+    },
+    'topics': {}
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of ``text``; apostrophes inside words are kept ("don't")."""
+    return _TOKEN_RE.findall(text.lower().replace('’', "'"))
+
+
+class KeywordClassifier:
+    """
+    Matches every trigger phrase of every group in one pass over the words of
+    the input. ``classify`` returns, for each group, the labels whose phrases
+    occur in the text, in vocabulary order.
+    """
+
+    def __init__(self, vocabularies: Dict[str, Dict[str, Iterable[str]]]):
+        self.groups = list(vocabularies)
+        # Word trie: each node is a dict of word -> child; '' holds the (group, label) pairs ending there
+        self._root: Dict = {}
+        self._order: Dict[Tuple[str, str], int] = {}
+        self.phrase_count = 0
+        for group, labels in vocabularies.items():
+            for label, phrases in labels.items():
+                self._order.setdefault((group, label), len(self._order))
+                for phrase in phrases:
+                    self._add(phrase, (group, label))
+
+    def _add(self, phrase: str, target: Tuple[str, str]):
+        words = tokenize(phrase)
+        if not words:
+            return
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        node.setdefault('', set()).add(target)
+        self.phrase_count += 1
+
+    def classify(self, text: str) -> Dict[str, List[str]]:
+        """Labels matched in ``text``, grouped by vocabulary."""
+        words = tokenize(text)
+        root = self._root
+        found = set()
+        for start in range(len(words)):
+            node = root.get(words[start])
+            position = start + 1
+            while node is not None:
+                targets = node.get('')
+                if targets:
+                    found.update(targets)
+                if position == len(words):
+                    break
+                node = node.get(words[position])
+                position += 1
+        result = {group: [] for group in self.groups}
+        for group, label in sorted(found, key=self._order.__getitem__):
+            result[group].append(label)
+        return result
+
+    def matches(self, group: str, text: str) -> bool:
+        """Whether any phrase of ``group`` occurs in ``text``."""
+        return bool(self.classify(text)[group])
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None, topics: Iterable[str] = ()) -> 'KeywordClassifier':
+        """
+        Build a classifier from the defaults, one topic label per name in
+        ``topics`` (matched by its own name, underscores as spaces), and the
+        ``triggers`` section of ``config`` (a personality dict), whose labels
+        replace the defaults of the same name.
+        """
+        vocabularies = {group: dict(labels) for group, labels in DEFAULT_TRIGGERS.items()}
+        for topic in topics:
+            vocabularies['topics'][topic] = [topic.replace('_', ' ')]
+        for group, labels in ((config or {}).get('triggers') or {}).items():
+            vocabularies.setdefault(group, {}).update(labels)
+        return cls(vocabularies)
+
+
+_default_classifier = None
+
+
+def default_classifier() -> KeywordClassifier:
+    """Classifier with the built-in vocabularies, shared by memories created without one."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = KeywordClassifier.from_config()
+    return _default_classifier
@@ -0,0 +1,405 @@
+"""
+Scheduling for chat completion requests.
+
+A scheduler sits in front of an OpenAI-style client and exposes the same
+``chat.completions.create(...)`` surface. It limits requests and tokens per
+minute with token buckets, caps the number of requests in flight, retries rate
+limits and transient failures with jittered exponential backoff (honouring
+Retry-After), and lets identical concurrent non-streaming requests share one
+upstream call. Queue depth, queue wait, retries and outcomes are recorded in a
+MetricsRegistry. The client itself can be supplied as a factory, in which
+case it is only built when the first request is made.
+"""
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+import inspect
+import json
+import random
+import threading
+import time
+from metrics import MetricsRegistry
+
+RETRYABLE_STATUS = frozenset([408, 409, 429, 500, 502, 503, 504])
+
+
+class TokenBucket:
+    """
+    Refills ``per_minute`` units per minute up to ``burst``. ``reserve`` takes
+    the units immediately (the balance may go negative) and returns how long the
+    caller must wait before using them, so waiters are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        """Return (or, if negative, charge) units once the real cost is known."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def estimate_tokens(kwargs: Dict) -> int:
+    """Rough prompt plus completion token count for rate limiting."""
+    prompt = sum(len(m.get('content') or '') for m in kwargs.get('messages') or []) // 4
+    return prompt + (kwargs.get('max_tokens') or 256)
+
+
+def retry_delay(error: Exception, attempt: int, base_delay: float, max_delay: float) -> Optional[float]:
+    """Seconds to wait before retrying ``error``, or None if it is not retryable."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        if status not in RETRYABLE_STATUS:
+            return None
+    elif type(error).__name__ not in ('APIConnectionError', 'APITimeoutError', 'ConnectionError', 'TimeoutError'):
+        return None
+    # Full jitter keeps retrying clients from synchronizing into a thundering herd
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+    try:
+        if retry_after is not None:
+            delay = max(delay, min(max_delay, float(retry_after)))
+    except ValueError:
+        pass
+    return delay
+
+
+def _retry_reason(error: Exception) -> str:
+    status = getattr(error, 'status_code', None)
+    return str(status) if status is not None else 'connection'
+
+
+class _ReleasingStream:
+    """
+    Wraps a (sync or async) response stream and gives its concurrency slot back
+    once the stream is exhausted, closed or garbage collected. Closing also
+    closes the wrapped stream, so an abandoned response frees its connection.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        self._iterator = iter(self._stream)
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def __aiter__(self):
+        self._iterator = self._stream.__aiter__()
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            # An async stream's close is a coroutine; it is left to aclose (or the stream's own finalizer)
+            close = getattr(self._stream, 'close', None)
+            if close is not None and not inspect.iscoroutinefunction(close):
+                close()
+        finally:
+            self._release()
+
+    async def aclose(self):
+        if self._released:
+            return
+        self._released = True
+        try:
+            close = getattr(self._stream, 'aclose', None) or getattr(self._stream, 'close', None)
+            if close is not None:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+        finally:
+            self._release()
+
+    def __del__(self):
+        self.close()
+
+
+class _SchedulerBase:
+    def __init__(self, client, max_concurrency: int, requests_per_minute: Optional[float],
+                 tokens_per_minute: Optional[float], max_retries: int, base_delay: float,
+                 max_delay: float, coalesce: bool, metrics: Optional[MetricsRegistry],
+                 client_factory: Optional[Callable[[], object]] = None):
+        if client is None and client_factory is None:
+            raise ValueError("Either client or client_factory is required")
+        self._client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.coalesce = coalesce
+        self.metrics = metrics if metrics is not None else MetricsRegistry(enabled=False)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.coalesced = 0
+        self.retries = 0
+        self._counter_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The wrapped client, built by ``client_factory`` on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    @property
+    def client_ready(self) -> bool:
+        return self._client is not None
+
+    @staticmethod
+    def _coalesce_key(kwargs: Dict) -> Optional[str]:
+        if kwargs.get('stream'):
+            return None
+        try:
+            return json.dumps(kwargs, sort_keys=True)
+        except TypeError:
+            return None
+
+    def _rate_delay(self, kwargs: Dict) -> float:
+        delay = 0.0
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket is not None:
+            delay = max(delay, self.token_bucket.reserve(estimate_tokens(kwargs)))
+        return delay
+
+    def _settle_tokens(self, kwargs: Dict, response):
+        usage = getattr(response, 'usage', None)
+        if self.token_bucket is not None and usage is not None:
+            self.token_bucket.refund(estimate_tokens(kwargs) - getattr(usage, 'total_tokens', 0))
+
+    def _enqueued(self):
+        with self._counter_lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            depth = self.waiting
+        self.metrics.observe('llm_queue_depth', depth)
+
+    def _started(self, queued_at: float):
+        with self._counter_lock:
+            self.waiting -= 1
+            self.in_flight += 1
+        self.metrics.observe('llm_queue_wait_seconds', time.perf_counter() - queued_at)
+
+    def _finished(self):
+        with self._counter_lock:
+            self.in_flight -= 1
+
+    def _retrying(self, error: Exception):
+        with self._counter_lock:
+            self.retries += 1
+        self.metrics.increment('llm_retries', reason=_retry_reason(error))
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {'in_flight': self.in_flight, 'waiting': self.waiting, 'max_waiting': self.max_waiting,
+                    'coalesced': self.coalesced, 'retries': self.retries}
+
+
+class RequestScheduler(_SchedulerBase):
+    """Scheduler for a synchronous client; safe to share between threads."""
+
+    def __init__(self, client, max_concurrency: int = 8, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 20.0, coalesce: bool = True, metrics: Optional[MetricsRegistry] = None,
+                 client_factory: Optional[Callable[[], object]] = None):
+        super().__init__(client, max_concurrency, requests_per_minute, tokens_per_minute, max_retries,
+                         base_delay, max_delay, coalesce, metrics, client_factory)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def create(self, **kwargs):
+        """Drop-in replacement for ``client.chat.completions.create``."""
+        key = self._coalesce_key(kwargs) if self.coalesce else None
+        if key is None:
+            return self._call(kwargs)
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            with self._counter_lock:
+                self.coalesced += 1
+            self.metrics.increment('llm_requests', result='coalesced')
+            return future.result()
+
+        try:
+            response = self._call(kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _call(self, kwargs: Dict):
+        queued_at = time.perf_counter()
+        self._enqueued()
+        self._slots.acquire()
+        self._started(queued_at)
+        release = True
+        try:
+            attempt = 0
+            while True:
+                delay = self._rate_delay(kwargs)
+                if delay:
+                    time.sleep(delay)
+                try:
+                    response = self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    delay = retry_delay(e, attempt, self.base_delay, self.max_delay)
+                    if delay is None or attempt >= self.max_retries:
+                        self.metrics.increment('llm_requests', result='error')
+                        raise
+                    self._retrying(e)
+                    attempt += 1
+                    time.sleep(delay)
+                    continue
+                self.metrics.increment('llm_requests', result='ok')
+                if kwargs.get('stream'):
+                    # The slot stays taken until the stream is consumed or closed
+                    release = False
+                    return _ReleasingStream(response, self._release)
+                self._settle_tokens(kwargs, response)
+                return response
+        finally:
+            if release:
+                self._release()
+
+    def _release(self):
+        self._finished()
+        self._slots.release()
+
+
+class AsyncRequestScheduler(_SchedulerBase):
+    """Scheduler for an asynchronous client; use it from one event loop."""
+    # asyncio is imported inside the coroutines: it is only needed once an event loop
+    # is running, and importing it at module level slows down CLI startup
+
+    def __init__(self, client, max_concurrency: int = 64, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 20.0, coalesce: bool = True, metrics: Optional[MetricsRegistry] = None,
+                 client_factory: Optional[Callable[[], object]] = None):
+        super().__init__(client, max_concurrency, requests_per_minute, tokens_per_minute, max_retries,
+                         base_delay, max_delay, coalesce, metrics, client_factory)
+        self._slots = None
+        self._inflight: Dict[str, 'asyncio.Future'] = {}
+
+    async def create(self, **kwargs):
+        """Drop-in replacement for ``await client.chat.completions.create``."""
+        import asyncio
+        key = self._coalesce_key(kwargs) if self.coalesce else None
+        if key is None:
+            return await self._call(kwargs)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            with self._counter_lock:
+                self.coalesced += 1
+            self.metrics.increment('llm_requests', result='coalesced')
+            return await asyncio.shield(future)
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._call(kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; mark it retrieved so a lone leader does not log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _call(self, kwargs: Dict):
+        import asyncio
+        if self._slots is None:
+            # Created lazily so the semaphore binds to the running loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        queued_at = time.perf_counter()
+        self._enqueued()
+        await self._slots.acquire()
+        self._started(queued_at)
+        release = True
+        try:
+            attempt = 0
+            while True:
+                delay = self._rate_delay(kwargs)
+                if delay:
+                    await asyncio.sleep(delay)
+                try:
+                    response = await self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    delay = retry_delay(e, attempt, self.base_delay, self.max_delay)
+                    if delay is None or attempt >= self.max_retries:
+                        self.metrics.increment('llm_requests', result='error')
+                        raise
+                    self._retrying(e)
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                self.metrics.increment('llm_requests', result='ok')
+                if kwargs.get('stream'):
+                    release = False
+                    return _ReleasingStream(response, self._release)
+                self._settle_tokens(kwargs, response)
+                return response
+        finally:
+            if release:
+                self._release()
+
+    def _release(self):
+        self._finished()
+        self._slots.release()
+
+    async def close(self):
+        if not self.client_ready:
+            return
+        close = getattr(self.client, 'close', None)
+        if close is not None:
+            await close()
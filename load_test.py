@@ -0,0 +1,140 @@
+"""
+Load test for the HTTP/WebSocket server.
+
+Starts ``server.py``'s app in-process on a free port with the offline fake LLM
+(or targets a running server with ``--url``), then drives it with concurrent
+clients. Each client is one session sending ``--turns`` messages one after
+another, over ``POST /chat`` or a WebSocket. Prints one JSON line with
+throughput, latency percentiles (time to the full reply; for WebSockets also
+to the first chunk) and error counts:
+
+    python load_test.py --clients 200 --turns 5 --latency lognormal:0.2:0.5
+    python load_test.py --mode ws --tokens-per-second 50
+    python load_test.py --url http://127.0.0.1:8080 --clients 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+import aiohttp
+from aiohttp import web
+from benchmark import TOPIC_WORDS
+from perf_stats import latency_summary, peak_rss_mb
+
+
+async def _http_client(session: aiohttp.ClientSession, url: str, session_id: str, args, stats: dict):
+    rng = random.Random(f"{args.seed}:{session_id}")
+    for _ in range(args.turns):
+        message = f"Tell me about {' and '.join(rng.sample(TOPIC_WORDS, 2))}"
+        start = time.perf_counter()
+        try:
+            async with session.post(f"{url}/chat", json={'message': message, 'session_id': session_id}) as response:
+                await response.json()
+                ok = response.status == 200
+        except aiohttp.ClientError:
+            ok = False
+        if ok:
+            stats['latencies'].append(time.perf_counter() - start)
+        else:
+            stats['errors'] += 1
+
+
+async def _ws_client(session: aiohttp.ClientSession, url: str, session_id: str, args, stats: dict):
+    rng = random.Random(f"{args.seed}:{session_id}")
+    try:
+        async with session.ws_connect(f"{url}/ws", params={'session_id': session_id}) as ws:
+            await ws.receive_json()
+            for _ in range(args.turns):
+                message = f"Tell me about {' and '.join(rng.sample(TOPIC_WORDS, 2))}"
+                start = time.perf_counter()
+                first_chunk = None
+                await ws.send_json({'message': message})
+                while True:
+                    frame = await ws.receive_json()
+                    if frame['type'] == 'chunk' and first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+                    elif frame['type'] in ('done', 'error'):
+                        break
+                if frame['type'] == 'error':
+                    stats['errors'] += 1
+                    continue
+                stats['latencies'].append(time.perf_counter() - start)
+                stats['first_chunk'].append(first_chunk or 0.0)
+    except (aiohttp.ClientError, TypeError, ValueError):
+        stats['errors'] += 1
+
+
+async def run_load(args) -> dict:
+    runner = None
+    url = args.url
+    if url is None:
+        from server import CompanionServer, build_companion
+        args.fake_llm = True
+        companion = build_companion(args)
+        runner = web.AppRunner(CompanionServer(companion, workers=args.workers, save_dir=args.save_dir).create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    stats = {'latencies': [], 'first_chunk': [], 'errors': 0}
+    client = _ws_client if args.mode == 'ws' else _http_client
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session, url, f"load-{i}", args, stats) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    if runner is not None:
+        # Graceful shutdown, including the memory flush
+        await runner.cleanup()
+
+    result = {
+        'mode': args.mode,
+        'clients': args.clients,
+        'turns': len(stats['latencies']),
+        'errors': stats['errors'],
+        'elapsed_s': round(elapsed, 3),
+        'turns_per_second': round(len(stats['latencies']) / elapsed, 1),
+        'latency': latency_summary(stats['latencies'])
+    }
+    if stats['first_chunk']:
+        result['first_chunk_latency'] = latency_summary(stats['first_chunk'])
+    if runner is not None:
+        result['workers'] = args.workers
+        result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the companion server")
+    parser.add_argument('--url', help="target a running server instead of starting one in-process")
+    parser.add_argument('--mode', choices=('http', 'ws'), default='http')
+    parser.add_argument('--clients', type=int, default=100, help="concurrent sessions")
+    parser.add_argument('--turns', type=int, default=5, help="messages per session")
+    parser.add_argument('--workers', type=int, default=64, help="server worker concurrency (in-process server)")
+    parser.add_argument('--max-connections', type=int, default=100)
+    parser.add_argument('--max-sessions', type=int, default=256)
+    parser.add_argument('--latency', default='0.05', help="fake LLM latency in seconds, e.g. 0.2 or lognormal:0.2:0.5")
+    parser.add_argument('--tokens-per-second', default='0', help="fake LLM token rate (0 = instant)")
+    parser.add_argument('--reply-words', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="append the result to this JSON-lines file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The in-process server keeps its sessions and saves out of the working tree
+        args.session_dir = f"{workdir}/sessions"
+        args.save_dir = f"{workdir}/conversations"
+        args.personality = "personality.json"
+        line = json.dumps(asyncio.run(run_load(args)))
+    print(line)
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
-from ai_companion import AICompanion
+from ai_companion import AICompanion, load_environment
 import os
-from dotenv import load_dotenv
 
 def main():
     # Load environment variables
-    load_dotenv()
+    load_environment()
     
     # Check for OpenAI API key
     api_key = os.getenv('OPENAI_API_KEY')
@@ -23,6 +22,9 @@ def main():
         print("Type 'exit' to end the conversation.")
         print("Type 'clear' to clear conversation history.")
         print("-" * 50)
+        
+        # The client, memory store and web searcher are built lazily; get them ready while the user types
+        companion.warm_up()
 
         while True:
             try:
@@ -44,9 +46,11 @@ def main():
                 if not user_input:
                     continue
                 
-                # Generate and print AI response
-                response = companion.generate_response(user_input)
-                print(f"\n{companion.personality['name']}: {response}")
+                # Stream the AI response as it is generated
+                print(f"\n{companion.personality['name']}: ", end="", flush=True)
+                for chunk in companion.generate_response_stream(user_input):
+                    print(chunk, end="", flush=True)
+                print()
                 
             except EOFError:
                 print("\nDetected EOF error. Press Ctrl+C to exit.")
@@ -0,0 +1,189 @@
+"""
+Near-duplicate consolidation for long-term memory.
+
+Many turns trip the memory triggers with nearly the same text, which would
+fill the store with copies that slow down every retrieval and save.
+``MemoryConsolidator`` detects them with MinHash signatures over word
+shingles and an LSH band index, so checking a new memory costs a few dict
+lookups instead of a comparison against every stored one. ConversationMemory
+uses it at insert time: a near-duplicate is merged into the memory it repeats
+(``MemoryStore.merge`` adds to its hit count and keeps the latest timestamp)
+instead of being stored.
+
+``consolidate_store`` does the same for an existing store, and running this
+module compacts a memory file offline and reports the gain:
+
+    python memory_dedup.py --memory-file long_term_memory.json
+    python memory_dedup.py --backend sqlite --threshold 0.7 --dry-run
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import json
+import os
+import threading
+import time
+import zlib
+import numpy as np
+from memory_index import tokenize
+from memory_store import BACKENDS, MemoryStore, SQLiteMemoryStore, TieredMemoryStore, memory_text, open_store
+
+# A prime just above 2**32: (a * x + b) % _PRIME for 32-bit a, b and x never overflows uint64
+_PRIME = np.uint64(4294967311)
+
+
+class MinHasher:
+    """MinHash signatures of the word ``shingle_size``-grams of a text."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, text: str) -> List[str]:
+        tokens = tokenize(text)
+        k = self.shingle_size
+        if len(tokens) <= k:
+            return [' '.join(tokens)] if tokens else []
+        return [' '.join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)]
+
+    def signature(self, text: str) -> np.ndarray:
+        # crc32 is stable across processes, so signatures do not depend on hash randomization
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in set(self.shingles(text))),
+                             dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1)
+
+
+class MemoryConsolidator:
+    """
+    LSH index over MinHash signatures of memories. Memories whose estimated
+    Jaccard similarity (share of equal signature slots) reaches ``threshold``
+    count as duplicates. With the default 16 bands of 4 rows, a pair at 0.8
+    similarity becomes a candidate with probability above 0.999.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, seed=seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Signatures are rows of one matrix so candidates are compared in a single vector operation
+        self._matrix = np.empty((64, num_perm), dtype=np.uint64)
+        self._rows: Dict[int, int] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._rows
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.hasher.signature(text)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        """The most similar indexed memory at or above the threshold, as (doc_id, similarity)."""
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                return None
+            doc_ids = list(candidates)
+            similarities = (self._matrix[[self._rows[doc_id] for doc_id in doc_ids]] == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                return None
+            return doc_ids[best], float(similarities[best])
+
+    def add(self, doc_id: int, signature: np.ndarray):
+        with self._lock:
+            row = len(self._rows)
+            if row == len(self._matrix):
+                self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+            self._matrix[row] = signature
+            self._rows[doc_id] = row
+            for band, key in self._band_keys(signature):
+                self._buckets[band].setdefault(key, []).append(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._buckets = [{} for _ in range(self.bands)]
+
+
+def consolidate_store(store: MemoryStore, consolidator: MemoryConsolidator, dry_run: bool = False) -> Dict:
+    """
+    Merge the near-duplicates already in ``store`` into their earliest copy and
+    remove the rest. Returns the number of memories before and after.
+    """
+    consolidator.clear()
+    duplicates = []
+    before = 0
+    for doc_id, memory in store.items():
+        before += 1
+        signature = consolidator.signature(memory_text(memory))
+        match = consolidator.find(signature)
+        if match is None:
+            consolidator.add(doc_id, signature)
+        else:
+            duplicates.append((match[0], doc_id, memory))
+    if not dry_run and duplicates:
+        for target, _, memory in duplicates:
+            store.merge(target, memory)
+        store.remove(doc_id for _, doc_id, _ in duplicates)
+        store.compact()
+    return {'memories_before': before, 'memories_after': before - len(duplicates), 'merged': len(duplicates)}
+
+
+def _store_bytes(store: MemoryStore) -> int:
+    if isinstance(store, TieredMemoryStore):
+        store = store.cold
+    path = store.path if isinstance(store, SQLiteMemoryStore) else store.journal.path
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+def _retrieval_ms(store: MemoryStore, queries: List[str], repeat: int = 3) -> float:
+    """Mean time of a keyword retrieval (search plus fetching the hits), in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            store.get_many(doc_id for doc_id, _ in store.search(query, 5))
+    return round((time.perf_counter() - start) / (repeat * max(1, len(queries))) * 1000, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge near-duplicate long-term memories")
+    parser.add_argument('--memory-file', default="long_term_memory.json",
+                        help="legacy JSON file name the store is derived from")
+    parser.add_argument('--backend', choices=BACKENDS, default=os.getenv('AI_COMPANION_MEMORY_BACKEND', 'journal'))
+    parser.add_argument('--session', default='default', help="session to compact (sqlite backend)")
+    parser.add_argument('--threshold', type=float, default=0.8, help="estimated Jaccard similarity to merge at")
+    parser.add_argument('--queries', type=int, default=50, help="sample queries for the retrieval timing")
+    parser.add_argument('--dry-run', action='store_true', help="report what would be merged without writing")
+    args = parser.parse_args()
+
+    store = open_store(args.backend, args.memory_file, session_id=args.session)
+    queries = [memory.user_input for _, memory in zip(range(args.queries), store)]
+    report = {'backend': args.backend, 'bytes_before': _store_bytes(store),
+              'retrieval_ms_before': _retrieval_ms(store, queries)}
+    report.update(consolidate_store(store, MemoryConsolidator(args.threshold), dry_run=args.dry_run))
+    if not args.dry_run:
+        report['bytes_after'] = _store_bytes(store)
+        report['retrieval_ms_after'] = _retrieval_ms(store, queries)
+    store.close()
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Incrementally maintained inverted index with BM25 scoring for long-term memory retrieval.
+"""
+from typing import Dict, List, Tuple
+import heapq
+import math
+import re
+
+_TOKEN_RE = re.compile(r"\w+")
+
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'do', 'for', 'from', 'has',
+    'have', 'i', 'if', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that',
+    'the', 'this', 'to', 'was', 'we', 'what', 'with', 'you', 'your'
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, dropping stopwords."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    Maps each term to the documents containing it so a query only touches the
+    postings of its own terms instead of scanning every document.
+    Documents are identified by integer ids assigned by the caller.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, min_idf: float = 0.05):
+        self.k1 = k1
+        self.b = b
+        # Terms whose idf falls below this contribute almost nothing and are skipped
+        self.min_idf = min_idf
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        # doc id -> its distinct terms, so removal only touches its own postings
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: int, text: str):
+        """Index a document."""
+        tokens = tokenize(text)
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        term_counts: Dict[str, int] = {}
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        self.doc_terms[doc_id] = tuple(term_counts)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: int):
+        """Remove a document from the index."""
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.doc_terms.clear()
+        self.total_length = 0
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """Return up to ``limit`` (doc_id, score) pairs ranked by BM25 score."""
+        num_docs = len(self.doc_lengths)
+        if not num_docs or limit <= 0:
+            return []
+        avg_length = self.total_length / num_docs or 1.0
+
+        k1 = self.k1
+        base = k1 * (1 - self.b)
+        scale = k1 * self.b / avg_length
+        doc_lengths = self.doc_lengths
+        scores: Dict[int, float] = {}
+        get_score = scores.get
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            if idf < self.min_idf:
+                continue
+            weight = idf * (k1 + 1)
+            for doc_id, tf in posting.items():
+                scores[doc_id] = get_score(doc_id, 0.0) + weight * tf / (tf + base + scale * doc_lengths[doc_id])
+
+        # Ties go to the older document, matching the previous stable sort
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
@@ -0,0 +1,121 @@
+"""
+Append-only JSON-lines journal used to persist long-term memory.
+
+Each line is one JSON record. Appends are flushed to the OS immediately and
+fsync'd in batches, so a write costs O(record) instead of O(whole store). A
+crash can at worst leave a truncated final line, which replay skips.
+"""
+from typing import Dict, Iterable, Iterator
+import atexit
+import json
+import os
+import time
+import weakref
+
+_open_journals = weakref.WeakSet()
+
+
+@atexit.register
+def _sync_open_journals():
+    for journal in list(_open_journals):
+        journal.close()
+
+
+class MemoryJournal:
+    def __init__(self, path: str, fsync_every: int = 16, fsync_interval: float = 1.0,
+                 compact_ratio: float = 2.0, compact_min_lines: int = 1000):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+
+        # Number of lines in the journal file, used to decide when to compact
+        self.line_count = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def replay(self) -> Iterator[Dict]:
+        """Stream records from the journal, skipping corrupt or truncated lines."""
+        self.line_count = 0
+        if not self.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self.line_count += 1
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def append(self, record: Dict):
+        """Append one record, fsync'ing once per batch."""
+        f = self._open()
+        f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        f.flush()
+        self.line_count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """Force buffered appends to disk."""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def needs_compaction(self, live_records: int) -> bool:
+        """Whether the journal holds enough dead lines to be worth rewriting."""
+        return self.line_count > max(self.compact_min_lines, live_records * self.compact_ratio)
+
+    def compact(self, records: Iterable[Dict]):
+        """Atomically replace the journal with one line per live record."""
+        self.close()
+        tmp_path = f"{self.path}.tmp"
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.line_count = count
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            _open_journals.discard(self)
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a+', encoding='utf-8')
+            self._repair_tail()
+            _open_journals.add(self)
+        return self._file
+
+    def _repair_tail(self):
+        """Terminate a truncated final line so new records start on a fresh line."""
+        f = self._file
+        if f.tell() == 0:
+            return
+        with open(self.path, 'rb') as raw:
+            raw.seek(-1, os.SEEK_END)
+            last_byte = raw.read(1)
+        if last_byte != b'\n':
+            f.write('\n')
+            f.flush()
@@ -0,0 +1,762 @@
+"""
+Pluggable persistence for long-term memory.
+
+A store owns the long-term memories of one ConversationMemory and answers
+keyword queries over them. Stores behave like a read-only sequence indexed by
+doc id (``len(store)``, ``store[doc_id]``, iteration), so code written against
+the old ``long_term_memory`` list keeps working.
+
+JournalMemoryStore keeps every memory in RAM with a BM25 index and persists
+them to the append-only journal (the default). SQLiteMemoryStore keeps them on
+disk and runs every lookup as a query, so startup cost and resident memory do
+not grow with the size of the history. TieredMemoryStore puts a bounded,
+importance-ranked hot tier in RAM in front of a SQLite cold tier.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime
+from interaction import Interaction, PreferenceSnapshots
+from memory_index import InvertedIndex, tokenize
+from memory_journal import MemoryJournal
+from write_behind import WriteBehindWorker, default_writer
+
+BACKENDS = ('journal', 'sqlite', 'tiered')
+
+_open_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_stores():
+    for store in list(_open_stores):
+        store.close()
+
+
+class MemoryStore:
+    """Interface shared by the long-term memory backends."""
+
+    def __init__(self):
+        # Memories loaded from this store share preference snapshots
+        self.snapshots = PreferenceSnapshots()
+
+    def append(self, interaction: Interaction) -> int:
+        """Persist a memory and return its doc id."""
+        raise NotImplementedError
+
+    def get(self, doc_id: int) -> Interaction:
+        raise NotImplementedError
+
+    def get_many(self, doc_ids: Iterable[int]) -> List[Interaction]:
+        return [self.get(doc_id) for doc_id in doc_ids]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """Return up to ``limit`` (doc_id, score) pairs, best match first."""
+        raise NotImplementedError
+
+    def merge(self, doc_id: int, duplicate: Interaction):
+        """Fold a near-duplicate into memory ``doc_id``: add its hits and keep the later timestamp."""
+        raise NotImplementedError
+
+    def remove(self, doc_ids: Iterable[int]):
+        """Delete memories (used by offline consolidation)."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def resident_size(self) -> int:
+        """Number of memories held in RAM (all of them by default)."""
+        return len(self)
+
+    def items(self) -> Iterator[Tuple[int, Interaction]]:
+        """Yield (doc_id, memory) pairs in insertion order."""
+        raise NotImplementedError
+
+    def working_set(self) -> Iterator[Tuple[int, Interaction]]:
+        """The memories new ones are checked against for near-duplicates (all of them by default)."""
+        return self.items()
+
+    def __iter__(self) -> Iterator[Interaction]:
+        return (memory for _, memory in self.items())
+
+    def __getitem__(self, doc_id: int) -> Interaction:
+        return self.get(doc_id)
+
+    def flush(self):
+        """Force pending writes to disk."""
+
+    def compact(self):
+        """Reclaim the disk space of removed and merged memories."""
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JournalMemoryStore(MemoryStore):
+    """
+    All memories in RAM, indexed with BM25 and persisted to an append-only
+    journal next to ``memory_file``. A legacy ``memory_file`` JSON list is
+    migrated into the journal on first load. New memories are written to the
+    journal by the write-behind worker, so appends do no disk I/O.
+    """
+
+    def __init__(self, memory_file: str = "long_term_memory.json", writer: Optional[WriteBehindWorker] = None):
+        super().__init__()
+        self.memory_file = memory_file
+        # Absolute, since the write-behind worker may write after the working directory changed
+        self.journal = MemoryJournal(os.path.abspath(os.path.splitext(memory_file)[0] + '.jsonl'))
+        self.memory_index = InvertedIndex()
+        self.records: List[Interaction] = []
+        self.writer = writer or default_writer()
+        # Records not yet in the journal; guarded with records by _pending_lock
+        self._unwritten: List[Dict] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._write_key = ('journal', self.journal.path)
+        self._load()
+
+    def _load(self):
+        if self.writer.is_pending(self._write_key):
+            # Another store for the same file still has records on their way to disk
+            self.writer.flush()
+        try:
+            if self.journal.exists():
+                self.records = []
+                for record in self.journal.replay():
+                    if 'merge' in record:
+                        self._apply_merge(record)
+                    else:
+                        self.records.append(Interaction.from_dict(record, self.snapshots))
+            elif os.path.exists(self.memory_file):
+                with open(self.memory_file, 'r') as f:
+                    records = json.load(f)
+                self.records = [Interaction.from_dict(r, self.snapshots) for r in records]
+                # Migrate the legacy file into the journal; the original is left untouched
+                self.compact()
+        except Exception as e:
+            print(f"Error loading long-term memory: {e}")
+            self.records = []
+        for doc_id, memory in enumerate(self.records):
+            self.memory_index.add(doc_id, memory_text(memory))
+
+    def append(self, interaction: Interaction) -> int:
+        with self._pending_lock:
+            self.records.append(interaction)
+            self._unwritten.append(interaction.to_dict())
+            doc_id = len(self.records) - 1
+        self.memory_index.add(doc_id, memory_text(interaction))
+        self.writer.submit(self._write_key, self._write_unwritten)
+        return doc_id
+
+    def _apply_merge(self, record: Dict):
+        doc_id = record['merge']
+        if 0 <= doc_id < len(self.records):
+            memory = self.records[doc_id]
+            memory.hits = record['hits']
+            if record.get('timestamp'):
+                memory.timestamp = datetime.fromisoformat(record['timestamp']).timestamp()
+
+    def merge(self, doc_id: int, duplicate: Interaction):
+        with self._pending_lock:
+            memory = self.records[doc_id]
+            memory.hits += duplicate.hits
+            if duplicate.timestamp is not None and (memory.timestamp is None or duplicate.timestamp > memory.timestamp):
+                memory.timestamp = duplicate.timestamp
+            # Journal lines are appends only: a merge is recorded as the memory's new hits and timestamp
+            self._unwritten.append({'merge': doc_id, 'hits': memory.hits, 'timestamp': memory['timestamp']})
+        self.writer.submit(self._write_key, self._write_unwritten)
+
+    def remove(self, doc_ids: Iterable[int]):
+        """Delete memories and rewrite the journal. Later memories get new (lower) doc ids."""
+        removed = set(doc_ids)
+        self._write_unwritten()
+        with self._pending_lock:
+            self.records = [memory for doc_id, memory in enumerate(self.records) if doc_id not in removed]
+        self.memory_index.clear()
+        for doc_id, memory in enumerate(self.records):
+            self.memory_index.add(doc_id, memory_text(memory))
+        self.compact()
+
+    def _write_unwritten(self):
+        """Append queued records to the journal with one fsync, compacting if it has grown too much."""
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._unwritten = self._unwritten, []
+            try:
+                for record in batch:
+                    self.journal.append(record)
+                self.journal.sync()
+                if self.journal.needs_compaction(len(self.records)):
+                    self._compact_written()
+            except Exception as e:
+                print(f"Error saving long-term memory: {e}")
+
+    def _compact_written(self):
+        with self._pending_lock:
+            # Records still queued are appended after the compacted file, not written twice;
+            # queued merges are re-applied on replay, which is harmless
+            unwritten = sum(1 for record in self._unwritten if 'merge' not in record)
+            written = self.records[:len(self.records) - unwritten]
+        self.journal.compact(memory.to_dict() for memory in written)
+
+    def compact(self):
+        """Rewrite the journal down to the current memories."""
+        with self._write_lock:
+            try:
+                self._compact_written()
+            except Exception as e:
+                print(f"Error saving long-term memory: {e}")
+
+    def get(self, doc_id: int) -> Interaction:
+        return self.records[doc_id]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        return self.memory_index.search(query, limit)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def items(self) -> Iterator[Tuple[int, Interaction]]:
+        return enumerate(self.records)
+
+    def __iter__(self) -> Iterator[Interaction]:
+        return iter(self.records)
+
+    def flush(self):
+        self._write_unwritten()
+
+    def close(self):
+        self._write_unwritten()
+        self.journal.close()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    timestamp REAL,
+    user_input TEXT NOT NULL,
+    ai_response TEXT NOT NULL,
+    context TEXT NOT NULL DEFAULT '{}',
+    hits INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS memory_ids (next_id INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS memories_session_timestamp ON memories (session, timestamp);
+CREATE INDEX IF NOT EXISTS memories_timestamp ON memories (timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+    user_input, ai_response, content='memories', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+    INSERT INTO memories_fts (rowid, user_input, ai_response) VALUES (new.id, new.user_input, new.ai_response);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+    INSERT INTO memories_fts (memories_fts, rowid, user_input, ai_response)
+    VALUES ('delete', old.id, old.user_input, old.ai_response);
+END;
+"""
+
+# Row ids are reserved from the database in blocks (see SQLiteMemoryStore._reserve_ids), so
+# processes sharing a file never hand out the same id. Each process keeps its current block per
+# database file, shared by every store (session) on that file, as [next id, end of block].
+_ID_BLOCK = 256
+_id_blocks: Dict[str, List[int]] = {}
+_id_blocks_lock = threading.Lock()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """
+    Memories in a SQLite database (WAL mode) with an FTS5 index for keyword
+    retrieval. Several sessions can share one database file; each store only
+    sees the rows of its own ``session_id``. Appends are buffered and written by
+    the write-behind worker in batches of ``batch_size`` rows (or after
+    ``flush_interval`` seconds). Reads go through a second connection and
+    overlay the rows and merges not yet committed, so a store always sees its
+    own writes without writing them on the caller's thread.
+    """
+
+    def __init__(self, path: str = "long_term_memory.sqlite", session_id: str = 'default',
+                 batch_size: int = 64, flush_interval: float = 1.0, writer: Optional[WriteBehindWorker] = None):
+        super().__init__()
+        self.path = path
+        self.session_id = session_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = writer or default_writer()
+        # Near-duplicate checks only look at this many of the newest memories, bounding their RAM
+        self.working_set_size = 10000
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # _lock serializes the write connection; _pending_lock guards the buffers and the read connection
+        self._lock = threading.RLock()
+        self._pending: List[Tuple] = []
+        self._pending_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(memories)")}
+        if 'hits' not in columns:
+            # Databases created before near-duplicate consolidation
+            self._conn.execute("ALTER TABLE memories ADD COLUMN hits INTEGER NOT NULL DEFAULT 1")
+        # Merges waiting for the next flush, as (hits to add, timestamp, doc id)
+        self._pending_merges: List[Tuple] = []
+        # The batch being written; reads still overlay it until its transaction commits
+        self._inflight: Tuple[List[Tuple], List[Tuple]] = ([], [])
+        # Keyword index of the buffered and in-flight rows, searched alongside FTS5
+        self._pending_index = InvertedIndex()
+        self._read_conn = sqlite3.connect(path, check_same_thread=False)
+
+        self._ids_key = os.path.abspath(path)
+        _open_stores.add(self)
+
+    def _next_id(self) -> int:
+        with _id_blocks_lock:
+            block = _id_blocks.get(self._ids_key)
+            if block is None or block[0] >= block[1]:
+                start = self._reserve_ids(_ID_BLOCK)
+                block = _id_blocks[self._ids_key] = [start, start + _ID_BLOCK]
+            doc_id = block[0]
+            block[0] += 1
+        return doc_id
+
+    def _reserve_ids(self, count: int) -> int:
+        """Claim ``count`` consecutive row ids for this process and return the first."""
+        with self._lock:
+            conn = self._conn
+            # IMMEDIATE takes the write lock up front, so two processes cannot read the same counter
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = conn.execute("SELECT next_id FROM memory_ids").fetchone()
+                # MAX(id) covers rows written before the counter existed
+                start = max(stored[0] if stored else 0,
+                            conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM memories").fetchone()[0])
+                if stored:
+                    conn.execute("UPDATE memory_ids SET next_id = ?", (start + count,))
+                else:
+                    conn.execute("INSERT INTO memory_ids (next_id) VALUES (?)", (start + count,))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return start
+
+    def append(self, interaction: Interaction) -> int:
+        doc_id = self._next_id()
+        context = json.dumps(interaction.context, separators=(',', ':'))
+        with self._pending_lock:
+            self._pending.append((doc_id, self.session_id, interaction.timestamp,
+                                  interaction.user_input, interaction.ai_response, context, interaction.hits))
+            self._pending_index.add(doc_id, memory_text(interaction))
+            full = len(self._pending) >= self.batch_size
+        self.writer.submit(('sqlite', id(self)), self.flush, delay=0 if full else self.flush_interval)
+        return doc_id
+
+    def flush(self):
+        """Write buffered appends in one transaction."""
+        with self._lock:
+            if self._conn is None:
+                return
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+                merges, self._pending_merges = self._pending_merges, []
+                self._inflight = (rows, merges)
+            if not rows and not merges:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT INTO memories (id, session, timestamp, user_input, ai_response, context, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._conn.executemany(
+                    "UPDATE memories SET hits = hits + ?, timestamp = MAX(COALESCE(timestamp, 0), ?) "
+                    "WHERE id = ?", merges
+                )
+                # Committed under the read lock, so a read sees the batch either buffered or stored, never both
+                with self._pending_lock:
+                    self._conn.commit()
+                    self._inflight = ([], [])
+                    for row in rows:
+                        self._pending_index.remove(row[0])
+            except Exception as e:
+                self._conn.rollback()
+                print(f"Error saving long-term memory: {e}")
+                # Keep the batch ahead of newer writes and try again later
+                with self._pending_lock:
+                    self._pending[:0] = rows
+                    self._pending_merges[:0] = merges
+                    self._inflight = ([], [])
+                self.writer.submit(('sqlite', id(self)), self.flush, delay=self.flush_interval)
+
+    def merge(self, doc_id: int, duplicate: Interaction):
+        with self._pending_lock:
+            self._pending_merges.append((duplicate.hits, duplicate.timestamp or 0, doc_id))
+            full = len(self._pending) + len(self._pending_merges) >= self.batch_size
+        self.writer.submit(('sqlite', id(self)), self.flush, delay=0 if full else self.flush_interval)
+
+    def remove(self, doc_ids: Iterable[int]):
+        doc_ids = [(doc_id, self.session_id) for doc_id in doc_ids]
+        with self._lock:
+            self.flush()
+            with self._conn:
+                self._conn.executemany("DELETE FROM memories WHERE id = ? AND session = ?", doc_ids)
+
+    def compact(self):
+        """Rebuild the database file (VACUUM) so removed rows stop taking space."""
+        with self._lock:
+            self.flush()
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Rows of a query over what is committed; buffered writes are not included."""
+        with self._pending_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def _query_with_pending(self, sql: str, params: Tuple = (), include=None) -> Dict[int, List]:
+        """
+        Rows of a query selecting (id, timestamp, user_input, ai_response, context, hits), by id,
+        plus the buffered rows ``include(row)`` accepts, with buffered merges applied to all of them.
+        """
+        with self._pending_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+            pending = self._inflight[0] + self._pending
+            merges = self._inflight[1] + self._pending_merges
+        by_id = {row[0]: list(row) for row in rows}
+        if include is not None:
+            for row in pending:
+                if row[0] not in by_id and include(row):
+                    by_id[row[0]] = [row[0]] + list(row[2:])
+        for hits, timestamp, doc_id in merges:
+            row = by_id.get(doc_id)
+            if row is not None:
+                row[5] += hits
+                row[1] = max(row[1] or 0, timestamp)
+        return by_id
+
+    def _row_to_interaction(self, row: Tuple) -> Interaction:
+        timestamp, user_input, ai_response, context, hits = row
+        interaction = Interaction.from_context(user_input, ai_response, json.loads(context),
+                                               timestamp=timestamp, snapshots=self.snapshots)
+        interaction.hits = hits
+        return interaction
+
+    def get(self, doc_id: int) -> Interaction:
+        rows = self._query_with_pending(
+            "SELECT id, timestamp, user_input, ai_response, context, hits FROM memories WHERE id = ? AND session = ?",
+            (doc_id, self.session_id), include=lambda row: row[0] == doc_id
+        )
+        if doc_id not in rows:
+            raise IndexError(doc_id)
+        return self._row_to_interaction(rows[doc_id][1:])
+
+    def get_many(self, doc_ids: Iterable[int]) -> List[Interaction]:
+        doc_ids = list(doc_ids)
+        by_id = self._fetch(doc_ids)
+        return [by_id[doc_id] for doc_id in doc_ids if doc_id in by_id]
+
+    def _fetch(self, doc_ids: List[int]) -> Dict[int, Interaction]:
+        if not doc_ids:
+            return {}
+        wanted = set(doc_ids)
+        rows = self._query_with_pending(
+            f"SELECT id, timestamp, user_input, ai_response, context, hits FROM memories "
+            f"WHERE id IN ({','.join('?' * len(doc_ids))})", tuple(doc_ids), include=lambda row: row[0] in wanted
+        )
+        return {doc_id: self._row_to_interaction(row[1:]) for doc_id, row in rows.items()}
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """Rank this session's memories with FTS5's BM25 over the query terms."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        match = ' OR '.join(f'"{term}"' for term in sorted(terms))
+        with self._pending_lock:
+            rows = self._read_conn.execute(
+                "SELECT m.id, bm25(memories_fts) AS score FROM memories_fts "
+                "JOIN memories m ON m.id = memories_fts.rowid "
+                "WHERE memories_fts MATCH ? AND m.session = ? ORDER BY score LIMIT ?",
+                (match, self.session_id, limit)
+            ).fetchall()
+            # Buffered rows are ranked by their own small BM25 index, which only approximates
+            # FTS5's scores; they reach the database within flush_interval seconds
+            buffered = self._pending_index.search(query, limit) if len(self._pending_index) else []
+        # FTS5 reports BM25 as a negative number where lower is better
+        results = [(doc_id, -score) for doc_id, score in rows]
+        if buffered:
+            seen = {doc_id for doc_id, _ in results}
+            results += [(doc_id, score) for doc_id, score in buffered if doc_id not in seen]
+            results = sorted(results, key=lambda result: -result[1])[:limit]
+        return results
+
+    def recent(self, limit: int = 10) -> List[Interaction]:
+        """The newest memories of this session, newest first."""
+        rows = self._query_with_pending(
+            "SELECT id, timestamp, user_input, ai_response, context, hits FROM memories "
+            "WHERE session = ? ORDER BY timestamp DESC LIMIT ?", (self.session_id, limit), include=lambda row: True
+        )
+        newest = sorted(rows.values(), key=lambda row: row[1] or 0, reverse=True)[:limit]
+        return [self._row_to_interaction(row[1:]) for row in newest]
+
+    def working_set(self) -> Iterator[Tuple[int, Interaction]]:
+        """The newest ``working_set_size`` memories of this session, oldest first."""
+        rows = self._query_with_pending(
+            "SELECT id, timestamp, user_input, ai_response, context, hits FROM memories "
+            "WHERE session = ? ORDER BY id DESC LIMIT ?", (self.session_id, self.working_set_size),
+            include=lambda row: True
+        )
+        newest = sorted(rows.values(), key=lambda row: row[0])[-self.working_set_size:]
+        return ((row[0], self._row_to_interaction(row[1:])) for row in newest)
+
+    def resident_size(self) -> int:
+        """Only writes not yet committed are held in RAM."""
+        with self._pending_lock:
+            return len(self._pending) + len(self._inflight[0])
+
+    def __len__(self) -> int:
+        with self._pending_lock:
+            stored = self._read_conn.execute(
+                "SELECT COUNT(*) FROM memories WHERE session = ?", (self.session_id,)
+            ).fetchone()[0]
+            return stored + len(self._inflight[0]) + len(self._pending)
+
+    def items(self) -> Iterator[Tuple[int, Interaction]]:
+        """Stream this session's memories in insertion order without loading them all."""
+        self.flush()
+        last_id = -1
+        while True:
+            rows = self._query(
+                "SELECT id, timestamp, user_input, ai_response, context, hits FROM memories "
+                "WHERE session = ? AND id > ? ORDER BY id LIMIT 500", (self.session_id, last_id)
+            )
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], self._row_to_interaction(row[1:])
+            last_id = rows[-1][0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self.flush()
+            self._conn.close()
+            self._conn = None
+        with self._pending_lock:
+            self._read_conn.close()
+        _open_stores.discard(self)
+
+
+class TieredMemoryStore(MemoryStore):
+    """
+    A bounded hot tier in RAM over a cold SQLiteMemoryStore that holds every
+    memory. The hot tier keeps the ``hot_capacity`` memories that rank highest
+    by importance (hits from merged duplicates plus retrievals) decayed by age
+    (halved every ``half_life`` seconds since the memory was last stored or
+    retrieved), with a BM25 index over them. Searches are answered from the
+    hot tier and only reach the cold tier when it returns fewer than ``limit``
+    matches. Cold matches are promoted and the lowest-ranked hot memories
+    demoted on the write-behind worker, so neither costs the caller.
+    Retrieval counts live in RAM only; after a restart the hot tier is
+    reseeded from the cold tier by hits and recency.
+    """
+
+    def __init__(self, cold: SQLiteMemoryStore, hot_capacity: int = 500, half_life: float = 30 * 86400.0,
+                 writer: Optional[WriteBehindWorker] = None):
+        super().__init__()
+        self.cold = cold
+        self.snapshots = cold.snapshots
+        self.hot_capacity = hot_capacity
+        self.half_life = half_life
+        self.writer = writer or default_writer()
+        self._lock = threading.RLock()
+        self.hot: Dict[int, Interaction] = {}
+        # doc id -> [retrievals, time of the last store or retrieval]
+        self._usage: Dict[int, List[float]] = {}
+        self.hot_index = InvertedIndex()
+        self._promotions: List[Tuple[int, Interaction]] = []
+        self.counters = {'hot_searches': 0, 'cold_searches': 0, 'promoted': 0, 'demoted': 0}
+        self._load_hot()
+        self.counters['demoted'] = 0
+
+    def _load_hot(self):
+        """Seed the hot tier with the most recent and most repeated memories."""
+        rows = self.cold._query(
+            "SELECT id, timestamp, user_input, ai_response, context, hits FROM memories WHERE id IN ("
+            "SELECT id FROM (SELECT id FROM memories WHERE session = ? ORDER BY timestamp DESC LIMIT ?) "
+            "UNION SELECT id FROM (SELECT id FROM memories WHERE session = ? AND hits > 1 "
+            "ORDER BY hits DESC LIMIT ?))",
+            (self.cold.session_id, self.hot_capacity, self.cold.session_id, self.hot_capacity)
+        )
+        with self._lock:
+            for row in rows:
+                self._add_hot(row[0], self.cold._row_to_interaction(row[1:]))
+            self._demote()
+
+    def score(self, doc_id: int, now: Optional[float] = None) -> float:
+        """Importance decayed by the time since the memory was last stored or retrieved."""
+        memory = self.hot[doc_id]
+        retrievals, last_used = self._usage[doc_id]
+        age = max(0.0, (now or time.time()) - max(last_used, memory.timestamp or 0.0))
+        return (memory.hits + retrievals) * 0.5 ** (age / self.half_life)
+
+    def _add_hot(self, doc_id: int, memory: Interaction, retrievals: float = 0.0, last_used: float = 0.0):
+        if doc_id not in self.hot:
+            self.hot_index.add(doc_id, memory_text(memory))
+        self.hot[doc_id] = memory
+        self._usage[doc_id] = [retrievals, last_used]
+
+    def _demote(self):
+        """Drop the lowest-ranked memories from RAM; the cold tier still has them."""
+        excess = len(self.hot) - self.hot_capacity
+        if excess <= 0:
+            return
+        now = time.time()
+        for doc_id in sorted(self.hot, key=lambda doc_id: self.score(doc_id, now))[:excess]:
+            del self.hot[doc_id]
+            del self._usage[doc_id]
+            self.hot_index.remove(doc_id)
+        self.counters['demoted'] += excess
+
+    def _rebalance(self):
+        with self._lock:
+            promotions, self._promotions = self._promotions, []
+            for doc_id, memory in promotions:
+                if doc_id not in self.hot:
+                    self._add_hot(doc_id, memory, retrievals=1.0, last_used=time.time())
+                    self.counters['promoted'] += 1
+            self._demote()
+
+    def _schedule_rebalance(self):
+        self.writer.submit(('tiers', id(self)), self._rebalance, delay=0)
+
+    def append(self, interaction: Interaction) -> int:
+        doc_id = self.cold.append(interaction)
+        with self._lock:
+            self._add_hot(doc_id, interaction)
+            over = len(self.hot) > self.hot_capacity
+        if over:
+            self._schedule_rebalance()
+        return doc_id
+
+    def merge(self, doc_id: int, duplicate: Interaction):
+        self.cold.merge(doc_id, duplicate)
+        with self._lock:
+            memory = self.hot.get(doc_id)
+            if memory is not None:
+                memory.hits += duplicate.hits
+                if duplicate.timestamp is not None and (memory.timestamp is None or duplicate.timestamp > memory.timestamp):
+                    memory.timestamp = duplicate.timestamp
+
+    def remove(self, doc_ids: Iterable[int]):
+        doc_ids = list(doc_ids)
+        self.cold.remove(doc_ids)
+        with self._lock:
+            for doc_id in doc_ids:
+                if self.hot.pop(doc_id, None) is not None:
+                    del self._usage[doc_id]
+                    self.hot_index.remove(doc_id)
+
+    def get(self, doc_id: int) -> Interaction:
+        with self._lock:
+            memory = self.hot.get(doc_id)
+        return memory if memory is not None else self.cold.get(doc_id)
+
+    def get_many(self, doc_ids: Iterable[int]) -> List[Interaction]:
+        doc_ids = list(doc_ids)
+        with self._lock:
+            found = {doc_id: self.hot[doc_id] for doc_id in doc_ids if doc_id in self.hot}
+        found.update(self.cold._fetch([doc_id for doc_id in doc_ids if doc_id not in found]))
+        return [found[doc_id] for doc_id in doc_ids if doc_id in found]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        now = time.time()
+        with self._lock:
+            results = self.hot_index.search(query, limit)
+            for doc_id, _ in results:
+                usage = self._usage[doc_id]
+                usage[0] += 1
+                usage[1] = now
+            self.counters['hot_searches'] += 1
+        if len(results) >= limit:
+            return results
+        self.counters['cold_searches'] += 1
+        seen = {doc_id for doc_id, _ in results}
+        cold_query = self._cold_query(query)
+        cold = [(doc_id, score) for doc_id, score in self.cold.search(cold_query, limit + len(seen))
+                if doc_id not in seen]
+        cold = cold[:limit - len(results)]
+        if cold:
+            promotions = self.cold._fetch([doc_id for doc_id, _ in cold])
+            with self._lock:
+                self._promotions.extend(promotions.items())
+            self._schedule_rebalance()
+        # Cold matches rank after hot ones: the two tiers' BM25 scores are not comparable
+        return results + cold
+
+    def _cold_query(self, query: str) -> str:
+        """
+        Drop query terms found in most hot memories. They barely affect BM25
+        ranking, but FTS5 has to score every row that contains them.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            common = len(self.hot) // 2
+            rare = [term for term in terms if len(self.hot_index.postings.get(term, ())) <= common]
+        return ' '.join(rare or terms)
+
+    def tier_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hot': len(self.hot), 'hot_capacity': self.hot_capacity, **self.counters}
+
+    def working_set(self) -> Iterator[Tuple[int, Interaction]]:
+        """The hot tier, so near-duplicate checks do not load the whole history."""
+        with self._lock:
+            return iter(list(self.hot.items()))
+
+    def resident_size(self) -> int:
+        with self._lock:
+            return len(self.hot) + self.cold.resident_size()
+
+    def __len__(self) -> int:
+        return len(self.cold)
+
+    def items(self) -> Iterator[Tuple[int, Interaction]]:
+        return self.cold.items()
+
+    def flush(self):
+        self.cold.flush()
+
+    def compact(self):
+        self.cold.compact()
+
+    def close(self):
+        self.cold.close()
+
+
+def memory_text(memory: Interaction) -> str:
+    """Text of a memory as indexed for retrieval."""
+    return f"{memory.user_input} {memory.ai_response}"
+
+
+def open_store(backend: str, memory_file: str, session_id: str = 'default') -> MemoryStore:
+    """
+    Create the long-term memory store for ``backend`` ('journal', 'sqlite' or
+    'tiered'). ``memory_file`` names the legacy JSON file; the SQLite database
+    lives next to it with a .sqlite extension.
+    """
+    if backend == 'journal':
+        return JournalMemoryStore(memory_file)
+    if backend == 'sqlite':
+        return SQLiteMemoryStore(os.path.splitext(memory_file)[0] + '.sqlite', session_id=session_id)
+    if backend == 'tiered':
+        cold = SQLiteMemoryStore(os.path.splitext(memory_file)[0] + '.sqlite', session_id=session_id)
+        return TieredMemoryStore(cold, hot_capacity=int(os.getenv('AI_COMPANION_HOT_MEMORIES', 500)))
+    raise ValueError(f"Unknown memory backend: {backend} (expected one of {', '.join(BACKENDS)})")
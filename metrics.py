@@ -0,0 +1,180 @@
+"""
+Lightweight in-process metrics for the request path.
+
+Histograms keep a sliding window of recent samples for p50/p95/p99 plus
+all-time count and sum; counters are plain integers. Snapshots can be rendered
+as Prometheus text or JSON lines. A disabled registry turns every call into a
+single attribute check.
+"""
+from collections import deque
+from typing import Dict, Optional, Tuple
+import json
+import math
+import os
+import threading
+import time
+
+_PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, window: int = 2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentiles(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {f"p{int(p * 100)}": 0.0 for p in _PERCENTILES}
+        # Nearest-rank percentiles
+        n = len(ordered)
+        return {f"p{int(p * 100)}": ordered[max(0, math.ceil(p * n) - 1)] for p in _PERCENTILES}
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry, name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: Optional[bool] = None, prefix: str = "ai_companion", window: int = 2048):
+        if enabled is None:
+            enabled = os.getenv('AI_COMPANION_METRICS', '1') not in ('0', 'false', 'no')
+        self.enabled = enabled
+        self.prefix = prefix
+        self.window = window
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        """Record a sample in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.window)
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def timer(self, name: str, **labels):
+        """Context manager that observes the elapsed seconds of its block."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict:
+        """Return counters and histogram summaries as plain data."""
+        with self._lock:
+            histograms = [
+                dict(name=name, labels=dict(labels), count=h.count, sum=h.total, **h.percentiles())
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {'timestamp': time.time(), 'histograms': histograms, 'counters': counters}
+
+    def to_json_line(self) -> str:
+        return json.dumps(self.snapshot(), separators=(',', ':'))
+
+    def export_json_line(self, path: str):
+        """Append the current snapshot to a JSON-lines file."""
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(self.to_json_line() + '\n')
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for h in snapshot['histograms']:
+            name = f"{self.prefix}_{h['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for p in _PERCENTILES:
+                labels = dict(h['labels'], quantile=str(p))
+                lines.append(f"{name}{_format_labels(labels)} {h[f'p{int(p * 100)}']}")
+            lines.append(f"{name}_sum{_format_labels(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{_format_labels(h['labels'])} {h['count']}")
+        for c in snapshot['counters']:
+            name = f"{self.prefix}_{c['name']}_total"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(c['labels'])} {c['value']}")
+        return '\n'.join(lines) + '\n'
+
+    def format_summary(self) -> str:
+        """Human-readable table for the /stats command."""
+        snapshot = self.snapshot()
+        if not snapshot['histograms'] and not snapshot['counters']:
+            return "No metrics recorded yet." if self.enabled else "Metrics are disabled."
+        lines = ["Latency and size statistics (p50 / p95 / p99):"]
+        for h in snapshot['histograms']:
+            label = ','.join(f"{k}={v}" for k, v in h['labels'].items())
+            name = f"{h['name']}[{label}]" if label else h['name']
+            lines.append(f"- {name}: {h['p50']:.4g} / {h['p95']:.4g} / {h['p99']:.4g} (n={h['count']})")
+        if snapshot['counters']:
+            lines.append("Counters:")
+            for c in snapshot['counters']:
+                label = ','.join(f"{k}={v}" for k, v in c['labels'].items())
+                lines.append(f"- {c['name']}{f'[{label}]' if label else ''}: {c['value']:g}")
+        return '\n'.join(lines)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
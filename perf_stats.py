@@ -0,0 +1,33 @@
+"""
+Latency and memory figures shared by the benchmark, load test and batch reports.
+"""
+import math
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as None
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def latency_summary(samples) -> dict:
+    """Nearest-rank percentiles in milliseconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    n = len(ordered)
+
+    def pick(p):
+        return round(ordered[max(0, math.ceil(p * n) - 1)] * 1000, 4)
+
+    return {'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': round(ordered[-1] * 1000, 4)}
@@ -0,0 +1,110 @@
+"""
+Token-budgeted prompt assembly.
+
+Prompt sections are filled in priority order until the token budget is used
+up, so long histories or large preference dicts can no longer grow every
+request without bound.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import re
+import threading
+
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_UNLOADED = object()
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken when it is installed and falls back to a local
+    word/punctuation approximation otherwise. Counts are memoized per text, so
+    unchanged turns are not re-tokenized on every request.
+    """
+
+    def __init__(self, model: str = "gpt-3.5-turbo", cache_size: int = 4096):
+        self.model = model
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # One counter is shared by batch workers and executor threads
+        self._lock = threading.Lock()
+        # Loaded on the first count, so constructing a counter stays cheap
+        self._encoding = _UNLOADED
+
+    def _load_encoding(self):
+        try:
+            import tiktoken
+            return tiktoken.encoding_for_model(self.model)
+        except Exception:
+            # tiktoken is optional (and may need a network fetch for its tables)
+            return None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+            if self._encoding is _UNLOADED:
+                self._encoding = self._load_encoding()
+        # Tokenize outside the lock so threads don't wait on each other's encodes
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text))
+        else:
+            tokens = len(_APPROX_TOKEN_RE.findall(text))
+        with self._lock:
+            self._cache[text] = tokens
+            self._cache.move_to_end(text)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+class PromptSection:
+    """
+    A named group of prompt items. Required sections are always kept. Items of
+    optional sections are taken in order until the next one would exceed the
+    budget, so callers should order items by importance (e.g. newest turn first).
+    """
+
+    def __init__(self, name: str, items: List[str], required: bool = False):
+        self.name = name
+        self.items = [item for item in items if item]
+        self.required = required
+
+
+class PromptBuilder:
+    def __init__(self, token_budget: int = 3000, counter: Optional[TokenCounter] = None):
+        self.token_budget = token_budget
+        self.counter = counter or TokenCounter()
+
+    def assemble(self, sections: List[PromptSection]) -> Dict:
+        """
+        Fit sections into the budget in the given priority order.
+        Returns a dict with the kept items per section name, the total token
+        count and the number of dropped items.
+        """
+        kept = {}
+        used = 0
+        dropped = 0
+
+        for section in sections:
+            if section.required:
+                kept[section.name] = list(section.items)
+                used += sum(self.counter.count(item) for item in section.items)
+
+        for section in sections:
+            if section.required:
+                continue
+            items = []
+            for position, item in enumerate(section.items):
+                tokens = self.counter.count(item)
+                if used + tokens > self.token_budget:
+                    dropped += len(section.items) - position
+                    break
+                items.append(item)
+                used += tokens
+            kept[section.name] = items
+
+        return {'sections': kept, 'tokens': used, 'dropped': dropped}
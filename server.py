@@ -0,0 +1,348 @@
+"""
+HTTP and WebSocket server for the companion.
+
+Endpoints (JSON bodies; the session id may also be passed as ``X-Session-Id``):
+  POST /chat                                {"message", "session_id"?} -> {"session_id", "response"}
+  GET  /ws?session_id=...                   WebSocket; send {"message"} (or plain text),
+                                            receive {"type": "chunk"} frames then {"type": "done"}
+  POST /sessions/{session_id}/commands/{name}   {"args": [...]}? -> {"response"}  (/save, /summary, ...)
+  GET  /health                              liveness plus session and queue counters
+  GET  /metrics                             Prometheus text format
+
+Requests without a session id get a new one, returned in the response. Turns
+for one session run one at a time; at most ``workers`` turns run at once and
+the rest wait. On SIGINT/SIGTERM the server stops accepting connections, lets
+in-flight turns finish, closes WebSockets and flushes every session's memory.
+
+    python server.py --port 8080 --workers 64
+    python server.py --fake-llm --latency 0.2     # no API key needed
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import re
+import uuid
+import weakref
+from datetime import datetime
+from aiohttp import WSMsgType, web
+from async_companion import AsyncAICompanion
+from session_manager import safe_session_name
+from write_behind import default_writer
+
+MAX_SESSION_ID_LENGTH = 128
+# /exit means nothing remotely; /save and /load only see file names in the session's save directory
+BLOCKED_COMMANDS = frozenset(['exit'])
+FILE_COMMANDS = frozenset(['save', 'load'])
+# Set by the companion for every turn; a client's 'context' may not replace them
+RESERVED_CONTEXT_KEYS = frozenset(['timestamp', 'user_preferences', 'detected_topics'])
+_FILENAME_RE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')
+
+
+class CompanionServer:
+    """Serves an AsyncAICompanion over HTTP and WebSockets."""
+
+    def __init__(self, companion: AsyncAICompanion, workers: int = 64,
+                 save_dir: str = os.path.join("data", "conversations")):
+        self.companion = companion
+        self.workers = workers
+        self.save_dir = os.path.abspath(save_dir)
+        # /search covers the files /save and /load can reach, not the server's working directory;
+        # run_command limits each session to its own directory
+        companion.archive_patterns = [os.path.join(self.save_dir, 'session_*', '*.json')]
+        companion.archive_index_path = os.path.join(self.save_dir, 'conversation_index.sqlite')
+        self._slots: Optional[asyncio.Semaphore] = None
+        # session id -> [lock serializing its turns, number of requests holding or waiting for it]
+        self._session_locks: Dict[str, List] = {}
+        self._websockets = weakref.WeakSet()
+        self.active = 0
+        self.waiting = 0
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post('/chat', self.handle_chat),
+            web.get('/ws', self.handle_websocket),
+            web.post('/sessions/{session_id}/commands/{command}', self.handle_command),
+            web.get('/health', self.handle_health),
+            web.get('/metrics', self.handle_metrics),
+        ])
+        app.on_shutdown.append(self._close_websockets)
+        app.on_cleanup.append(self._flush_memory)
+        return app
+
+    # Request plumbing
+
+    @staticmethod
+    def _session_id(request: web.Request, body: Dict) -> str:
+        session_id = body.get('session_id') or request.headers.get('X-Session-Id') or request.query.get('session_id')
+        if not session_id:
+            return uuid.uuid4().hex
+        if not isinstance(session_id, str) or len(session_id) > MAX_SESSION_ID_LENGTH:
+            raise web.HTTPBadRequest(text=json.dumps({'error': 'invalid session_id'}),
+                                     content_type='application/json')
+        return session_id
+
+    @staticmethod
+    def _memory_id(session_id: str) -> str:
+        # Kept apart from the companion's own sessions, e.g. the CLI's pinned 'default'
+        return f"http:{session_id}"
+
+    @staticmethod
+    async def _json_body(request: web.Request) -> Dict:
+        if not request.can_read_body:
+            return {}
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text=json.dumps({'error': 'body must be JSON'}), content_type='application/json')
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text=json.dumps({'error': 'body must be a JSON object'}),
+                                     content_type='application/json')
+        return body
+
+    async def _acquire(self, session_id: str):
+        """Wait for the session's previous turn to finish, then for a worker slot."""
+        if self._slots is None:
+            # Created lazily so the semaphore binds to the server's event loop
+            self._slots = asyncio.Semaphore(self.workers)
+        entry = self._session_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        self.waiting += 1
+        try:
+            await entry[0].acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                entry[0].release()
+                raise
+        except BaseException:
+            self._forget(session_id, entry)
+            raise
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def _release(self, session_id: str):
+        entry = self._session_locks[session_id]
+        self.active -= 1
+        self._slots.release()
+        entry[0].release()
+        self._forget(session_id, entry)
+
+    def _forget(self, session_id: str, entry: List):
+        # Drop the session's lock once nobody holds or waits for it
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._session_locks[session_id]
+
+    def _session_dir(self, session_id: str) -> str:
+        # Prefixed so that ids like '..' stay a plain directory name
+        return os.path.join(self.save_dir, f"session_{safe_session_name(session_id)}")
+
+    def _command_args(self, session_id: str, name: str, args: List[str]) -> List[str]:
+        """Confine /save and /load to bare file names in the session's own directory under save_dir."""
+        if name not in FILE_COMMANDS:
+            return args
+        if args and not _FILENAME_RE.match(args[0]):
+            raise ValueError("file name must not contain a path")
+        session_dir = self._session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        if args:
+            return [os.path.join(session_dir, args[0])] + args[1:]
+        if name == 'save':
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            return [os.path.join(session_dir, f"conversation_{stamp}.json")]
+        return args
+
+    def _client_text(self, session_id: str, response: str) -> str:
+        # /save reports the full server path; only the file name means anything to a client
+        return response.replace(self._session_dir(session_id) + os.sep, '')
+
+    def run_command(self, session_id: str, name: str, args: List[str]) -> str:
+        name = name.lower()
+        if name in BLOCKED_COMMANDS or name not in self.companion.commands:
+            raise KeyError(name)
+        if name == 'stats' and args and args[0].lower() == 'export':
+            raise ValueError("/stats export is not available over HTTP; use GET /metrics")
+        args = self._command_args(session_id, name, args)
+        if name == 'search':
+            # The index covers every session's saves; each session only sees its own
+            return self.companion.search_conversations(args, directory=self._session_dir(session_id))
+        with self.companion.sessions.use(self._memory_id(session_id)) as memory:
+            return self.companion.commands[name](args, memory)
+
+    async def arun_command(self, session_id: str, name: str, args: List[str]) -> str:
+        """run_command on an executor thread: /search re-indexes files, /save and /load touch disk."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.run_command, session_id, name, args)
+
+    async def _run_inline_command(self, session_id: str, message: str) -> str:
+        parts = message[1:].split()
+        if not parts:
+            return "Unknown command. Type /help for available commands."
+        try:
+            response = await self.arun_command(session_id, parts[0], parts[1:])
+        except KeyError:
+            return f"Unknown command: {parts[0]}. Type /help for available commands."
+        except ValueError as e:
+            return f"Error: {e}"
+        return self._client_text(session_id, response)
+
+    # Handlers
+
+    async def handle_chat(self, request: web.Request) -> web.Response:
+        body = await self._json_body(request)
+        message = body.get('message')
+        if not isinstance(message, str) or not message.strip():
+            return web.json_response({'error': 'message is required'}, status=400)
+        context = body.get('context')
+        if context is not None and not isinstance(context, dict):
+            return web.json_response({'error': "'context' must be an object"}, status=400)
+        reserved = sorted(RESERVED_CONTEXT_KEYS.intersection(context or {}))
+        if reserved:
+            return web.json_response({'error': f"'context' may not set {', '.join(reserved)}"}, status=400)
+        session_id = self._session_id(request, body)
+
+        await self._acquire(session_id)
+        try:
+            if message.startswith('/'):
+                response = await self._run_inline_command(session_id, message)
+            else:
+                response = await self.companion.agenerate_response(
+                    message, session_id=self._memory_id(session_id), additional_context=context
+                )
+        finally:
+            self._release(session_id)
+        return web.json_response({'session_id': session_id, 'response': response})
+
+    async def handle_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        session_id = self._session_id(request, {})
+        ws = web.WebSocketResponse(heartbeat=30.0)
+        await ws.prepare(request)
+        self._websockets.add(ws)
+        await ws.send_json({'type': 'session', 'session_id': session_id})
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                if msg.type == WSMsgType.ERROR:
+                    print(f"Error on websocket for session {session_id}: {ws.exception()}")
+                continue
+            message = msg.data
+            if message.startswith('{'):
+                try:
+                    message = json.loads(message).get('message', '')
+                except (ValueError, AttributeError):
+                    await ws.send_json({'type': 'error', 'error': 'invalid JSON'})
+                    continue
+            if not isinstance(message, str) or not message.strip():
+                await ws.send_json({'type': 'error', 'error': 'message is required'})
+                continue
+
+            await self._acquire(session_id)
+            try:
+                if message.startswith('/'):
+                    await ws.send_json({'type': 'chunk', 'content': await self._run_inline_command(session_id, message)})
+                else:
+                    async for chunk in self.companion.agenerate_response_stream(
+                            message, session_id=self._memory_id(session_id)):
+                        await ws.send_json({'type': 'chunk', 'content': chunk})
+                await ws.send_json({'type': 'done'})
+            except ConnectionResetError:
+                break
+            finally:
+                self._release(session_id)
+        return ws
+
+    async def handle_command(self, request: web.Request) -> web.Response:
+        session_id = request.match_info['session_id']
+        if len(session_id) > MAX_SESSION_ID_LENGTH:
+            return web.json_response({'error': 'invalid session_id'}, status=400)
+        body = await self._json_body(request)
+        args = body.get('args') or []
+        if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+            return web.json_response({'error': 'args must be a list of strings'}, status=400)
+        name = request.match_info['command']
+
+        await self._acquire(session_id)
+        try:
+            response = await self.arun_command(session_id, name, args)
+        except KeyError:
+            return web.json_response({'error': f"unknown command: {name}"}, status=404)
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
+        finally:
+            self._release(session_id)
+        return web.json_response({'session_id': session_id, 'response': self._client_text(session_id, response)})
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok',
+            'active': self.active,
+            'waiting': self.waiting,
+            'workers': self.workers,
+            'sessions': self.companion.sessions.stats(),
+            'llm': self.companion.llm.stats()
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.companion.metrics.to_prometheus(), content_type='text/plain')
+
+    # Shutdown
+
+    async def _close_websockets(self, app: web.Application):
+        for ws in list(self._websockets):
+            await ws.close(code=1001, message=b'server shutdown')
+
+    async def _flush_memory(self, app: web.Application):
+        """Persist every session, the default memory and any queued background writes."""
+        await self.companion.aclose()
+        self.companion.memory.close()
+        default_writer().flush(timeout=10.0)
+        if self.companion.archive_loaded:
+            self.companion.archive.close()
+
+
+def build_companion(args) -> AsyncAICompanion:
+    client = None
+    if args.fake_llm:
+        from fake_llm import AsyncFakeLLMClient, Distribution
+        client = AsyncFakeLLMClient(
+            latency=Distribution.parse(args.latency, seed=args.seed),
+            tokens_per_second=Distribution.parse(args.tokens_per_second, seed=args.seed + 1),
+            reply_words=args.reply_words
+        )
+    return AsyncAICompanion(args.personality, client=client, max_connections=args.max_connections,
+                            session_dir=args.session_dir, max_sessions=args.max_sessions,
+                            max_session_memories=args.max_session_memories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AI companion over HTTP and WebSockets")
+    parser.add_argument('--host', default=os.getenv('AI_COMPANION_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('AI_COMPANION_PORT', 8080)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('AI_COMPANION_WORKERS', 64)),
+                        help="turns processed concurrently; further requests wait")
+    parser.add_argument('--max-connections', type=int, default=100, help="LLM connection pool size")
+    parser.add_argument('--max-sessions', type=int, default=256, help="resident session cap")
+    parser.add_argument('--max-session-memories', type=int,
+                        help="cap on long-term memories held in RAM across resident sessions")
+    parser.add_argument('--session-dir', default=os.path.join("data", "sessions"))
+    parser.add_argument('--save-dir', default=os.path.join("data", "conversations"))
+    parser.add_argument('--personality', default="personality.json")
+    parser.add_argument('--shutdown-timeout', type=float, default=30.0,
+                        help="seconds to let in-flight requests finish on shutdown")
+    parser.add_argument('--fake-llm', action='store_true', help="answer with the offline fake LLM")
+    parser.add_argument('--latency', default='0', help="fake LLM latency in seconds, e.g. 0.2 or lognormal:0.2:0.5")
+    parser.add_argument('--tokens-per-second', default='0', help="fake LLM token rate (0 = instant)")
+    parser.add_argument('--reply-words', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server = CompanionServer(build_companion(args), workers=args.workers, save_dir=args.save_dir)
+    web.run_app(server.create_app(), host=args.host, port=args.port, shutdown_timeout=args.shutdown_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Per-session conversation memories with a bounded resident set.
+
+Each session (user) id maps to its own ConversationMemory and long-term store.
+Only the ``max_resident`` most recently used sessions stay in RAM, and with
+``max_resident_memories`` set, least recently used sessions are also evicted
+while the long-term memories they hold in RAM exceed that total. Evicting a
+session hands the save of its short-term history and summary (and the close of
+its store) to the write-behind worker, and the next message for it loads them
+back from disk once that write has landed.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import hashlib
+import os
+import re
+import threading
+from conversation_memory import ConversationMemory
+from keyword_classifier import KeywordClassifier
+from memory_store import open_store
+from write_behind import WriteBehindWorker, default_writer
+
+_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def safe_session_name(session_id: str) -> str:
+    """File-name-safe form of a session id; ids that had to be rewritten get a hash suffix."""
+    name = _UNSAFE_RE.sub('_', session_id)
+    if name != session_id or not name:
+        name = f"{name}-{hashlib.sha1(session_id.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+class SessionManager:
+    """
+    LRU map from session id to ConversationMemory. ``max_resident`` caps the
+    number of sessions; ``max_resident_memories`` (None = no cap) caps the
+    long-term memories they hold in RAM, which is what a journal-backed session
+    costs. Sessions in use (see ``use``) or added with ``pinned=True`` are never
+    evicted, so the resident set can briefly exceed either cap while many
+    requests are in flight.
+    """
+
+    def __init__(self, session_dir: str = os.path.join("data", "sessions"), max_resident: int = 256,
+                 memory_backend: str = 'journal', max_history: int = 10,
+                 on_evict: Optional[Callable[[str], None]] = None, writer: Optional[WriteBehindWorker] = None,
+                 classifier: Optional[KeywordClassifier] = None, max_resident_memories: Optional[int] = None):
+        # Absolute, since evicted sessions are saved later on the write-behind worker
+        self.session_dir = os.path.abspath(session_dir)
+        self.max_resident = max_resident
+        self.max_resident_memories = max_resident_memories
+        self.memory_backend = memory_backend
+        self.max_history = max_history
+        self.on_evict = on_evict
+        self.writer = writer or default_writer()
+        self.classifier = classifier
+
+        self._resident: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._pinned = set()
+        # session id -> event set once the thread loading it from disk is done
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, session_id: str = 'default') -> ConversationMemory:
+        """
+        Return the memory for a session, loading it from disk if it is not resident.
+        The load runs outside the manager's lock, so other sessions are not held up
+        by it; concurrent callers for the same session wait for the one load.
+        """
+        while True:
+            with self._lock:
+                memory = self._resident.get(session_id)
+                if memory is not None:
+                    self._resident.move_to_end(session_id)
+                    self.hits += 1
+                    return memory
+                loading = self._loading.get(session_id)
+                if loading is None:
+                    loading = self._loading[session_id] = threading.Event()
+                    break
+            loading.wait()
+        try:
+            memory = self._load(session_id)
+        except BaseException:
+            with self._lock:
+                del self._loading[session_id]
+            loading.set()
+            raise
+        with self._lock:
+            del self._loading[session_id]
+            self.loads += 1
+            self._resident[session_id] = memory
+            self._evict_over_limit()
+        loading.set()
+        return memory
+
+    @contextmanager
+    def use(self, session_id: str = 'default') -> Iterator[ConversationMemory]:
+        """Hold a session's memory for the duration of a request, protecting it from eviction."""
+        with self._lock:
+            self._in_use[session_id] = self._in_use.get(session_id, 0) + 1
+        try:
+            memory = self.get(session_id)
+        except BaseException:
+            with self._lock:
+                self._release(session_id)
+            raise
+        try:
+            yield memory
+        finally:
+            with self._lock:
+                self._release(session_id)
+                self._evict_over_limit()
+
+    def _release(self, session_id: str):
+        count = self._in_use.get(session_id, 0) - 1
+        if count > 0:
+            self._in_use[session_id] = count
+        else:
+            self._in_use.pop(session_id, None)
+
+    def add(self, session_id: str, memory: ConversationMemory, pinned: bool = False):
+        """Register an existing memory, e.g. the CLI's default session."""
+        with self._lock:
+            self._resident[session_id] = memory
+            if pinned:
+                self._pinned.add(session_id)
+            self._evict_over_limit()
+
+    def evict(self, session_id: str) -> bool:
+        """Persist and drop a resident session. Returns False if it is not resident or in use."""
+        with self._lock:
+            if session_id not in self._resident or session_id in self._in_use:
+                return False
+            memory = self._resident.pop(session_id)
+            self._pinned.discard(session_id)
+            self.evictions += 1
+        self.writer.submit(self._write_key(session_id), lambda: self._persist(session_id, memory), delay=0)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+        return True
+
+    def _evict_over_limit(self):
+        candidates = [
+            session_id for session_id in self._resident
+            if session_id not in self._in_use and session_id not in self._pinned
+        ]
+        excess = len(self._resident) - self.max_resident
+        victims, candidates = candidates[:max(excess, 0)], candidates[max(excess, 0):]
+        if self.max_resident_memories is not None:
+            sizes = {session_id: memory.resident_size() for session_id, memory in self._resident.items()}
+            held = sum(sizes.values()) - sum(sizes[session_id] for session_id in victims)
+            for session_id in candidates:
+                if held <= self.max_resident_memories:
+                    break
+                victims.append(session_id)
+                held -= sizes[session_id]
+        for session_id in victims:
+            self.evict(session_id)
+
+    def conversation_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{safe_session_name(session_id)}_conversation.json")
+
+    def _write_key(self, session_id: str):
+        return ('session', self.conversation_path(session_id))
+
+    def _load(self, session_id: str) -> ConversationMemory:
+        if self.writer.is_pending(self._write_key(session_id)):
+            # Recently evicted: wait for its save so nothing is read back stale
+            self.writer.flush()
+        os.makedirs(self.session_dir, exist_ok=True)
+        if self.memory_backend in ('sqlite', 'tiered'):
+            # All sessions share one database, partitioned by session id
+            store = open_store(self.memory_backend, os.path.join(self.session_dir, "long_term_memory.json"),
+                               session_id=session_id)
+        else:
+            memory_file = os.path.join(self.session_dir, f"{safe_session_name(session_id)}_long_term_memory.json")
+            store = open_store(self.memory_backend, memory_file)
+        memory = ConversationMemory(max_history=self.max_history, store=store, classifier=self.classifier)
+        path = self.conversation_path(session_id)
+        if os.path.exists(path):
+            try:
+                memory.load_from_file(path)
+            except Exception as e:
+                print(f"Error loading session {session_id}: {e}")
+        return memory
+
+    def _persist(self, session_id: str, memory: ConversationMemory):
+        try:
+            if memory.conversations or memory.summary or memory.user_preferences or os.path.exists(self.conversation_path(session_id)):
+                os.makedirs(self.session_dir, exist_ok=True)
+                memory.save_to_file(self.conversation_path(session_id))
+        except Exception as e:
+            print(f"Error saving session {session_id}: {e}")
+        memory.close()
+
+    def resident_ids(self) -> List[str]:
+        """Resident session ids, least recently used first."""
+        with self._lock:
+            return list(self._resident)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._resident
+
+    def __len__(self) -> int:
+        return len(self._resident)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'resident': len(self._resident), 'in_use': len(self._in_use),
+                    'hits': self.hits, 'loads': self.loads, 'evictions': self.evictions}
+
+    def flush(self):
+        """Force pending long-term memory writes of every resident session to disk."""
+        for memory in list(self._resident.values()):
+            memory.flush()
+
+    def close(self):
+        """Persist every session that was loaded by this manager and close their stores."""
+        with self._lock:
+            sessions = [(sid, m) for sid, m in self._resident.items() if sid not in self._pinned]
+            for session_id, _ in sessions:
+                del self._resident[session_id]
+        for session_id, memory in sessions:
+            self._persist(session_id, memory)
+        # Evictions still queued on the worker
+        self.writer.flush()
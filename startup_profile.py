@@ -0,0 +1,166 @@
+"""
+Startup profile for the companion CLI.
+
+Reports where the time to the first prompt goes:
+  imports   cumulative import time of each first-party module and of the
+            heaviest third-party packages (from ``python -X importtime``)
+  init      AICompanion construction, then each lazily created component
+            (LLM client, long-term memory store, web searcher, tokenizer)
+            the first time it is used
+  prompt    wall time from launching ``main.py`` until it prints its prompt
+
+Nothing here touches the network. Run it from the project directory:
+
+    python startup_profile.py
+    python startup_profile.py --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+READY_MARKER = "is ready to chat"
+# main.py refuses to start without a key; no request is made, so any value will do
+PLACEHOLDER_KEY = 'sk-startup-profile'
+
+
+def _first_party_modules():
+    return {name[:-3] for name in os.listdir(ROOT) if name.endswith('.py') and not name.startswith('.')}
+
+
+def profile_imports(module: str = 'main', top: int = 8) -> dict:
+    """Cumulative import times in milliseconds, parsed from ``-X importtime``."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    first_party = _first_party_modules()
+    ours, packages, total = {}, {}, 0.0
+    # Children are printed before their parent; walk backwards so parents come first
+    stack = []
+    for line in reversed(completed.stderr.splitlines()):
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        indent = len(name) - len(name.lstrip())
+        name = name.strip()
+        ms = int(cumulative) / 1000
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        under_ours = any(parent in first_party for _, parent in stack)
+        stack.append((indent, name))
+        if name == module:
+            total = ms
+        if name in first_party:
+            ours[name] = round(ms, 1)
+        elif under_ours and '.' not in name:
+            # Packages pulled in by our modules, not by interpreter startup
+            packages[name] = max(packages.get(name, 0.0), round(ms, 1))
+    heaviest = dict(sorted(packages.items(), key=lambda item: -item[1])[:top])
+    return {'total_ms': round(total, 1), 'first_party_ms': ours, 'heaviest_packages_ms': heaviest}
+
+
+def profile_init() -> dict:
+    """Construction time of AICompanion and first-use time of each lazy component, in milliseconds."""
+    os.environ.setdefault('OPENAI_API_KEY', PLACEHOLDER_KEY)
+    timings = {}
+    start = time.perf_counter()
+    from ai_companion import AICompanion
+    timings['import_ai_companion'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    companion = AICompanion(os.path.join(ROOT, "personality.json"))
+    timings['construct'] = time.perf_counter() - start
+
+    components = {
+        'llm_client': lambda: companion.client,
+        'memory_store': lambda: companion.memory.store,
+        'web_searcher': lambda: companion.web_searcher,
+        'tokenizer': lambda: companion.prompt_builder.counter.count("warm up"),
+    }
+    errors = {}
+    for name, create in components.items():
+        start = time.perf_counter()
+        try:
+            create()
+        except Exception as e:
+            errors[name] = str(e)
+        timings[name] = time.perf_counter() - start
+    companion.memory.close()
+    result = {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+    if errors:
+        result['errors'] = errors
+    return result
+
+
+def _bare_interpreter_ms(runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        samples.append(time.perf_counter() - start)
+    return round(min(samples) * 1000, 1)
+
+
+def time_to_prompt(runs: int = 3) -> dict:
+    """
+    Best and median wall time (ms) from launching main.py to its prompt, and
+    the best time of a bare ``python -c pass`` for comparison.
+    """
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_KEY', PLACEHOLDER_KEY)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, universal_newlines=True)
+        for line in process.stdout:
+            if READY_MARKER in line:
+                samples.append(time.perf_counter() - start)
+                break
+        process.stdin.close()
+        process.stdout.read()
+        process.wait()
+    samples.sort()
+    if not samples:
+        return {}
+    return {'best_ms': round(samples[0] * 1000, 1), 'median_ms': round(samples[len(samples) // 2] * 1000, 1),
+            'bare_interpreter_ms': _bare_interpreter_ms(runs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the companion's startup")
+    parser.add_argument('--runs', type=int, default=3, help="main.py launches for the time-to-prompt figure")
+    parser.add_argument('--json', action='store_true', help="print one JSON object instead of a report")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    report = {'imports': profile_imports(), 'init': profile_init(), 'time_to_prompt': time_to_prompt(args.runs)}
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    imports = report['imports']
+    print(f"Imports (import main): {imports['total_ms']} ms")
+    for name, ms in sorted(imports['first_party_ms'].items(), key=lambda item: -item[1]):
+        print(f"  {name:<24}{ms:>8.1f} ms")
+    print("  heaviest packages:")
+    for name, ms in imports['heaviest_packages_ms'].items():
+        print(f"    {name:<22}{ms:>8.1f} ms")
+    print("Init:")
+    for name, value in report['init'].items():
+        if name != 'errors':
+            print(f"  {name:<24}{value:>8.1f} ms")
+    for name, error in report['init'].get('errors', {}).items():
+        print(f"  ({name} failed: {error})")
+    prompt = report['time_to_prompt']
+    if prompt:
+        print(f"Time to prompt (python main.py): best {prompt['best_ms']} ms, median {prompt['median_ms']} ms "
+              f"(bare interpreter: {prompt['bare_interpreter_ms']} ms)")
+
+
+if __name__ == "__main__":
+    main()
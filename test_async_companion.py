@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+def test_sessions_are_isolated(make_async_companion):
+    companion = make_async_companion()
+
+    async def run():
+        await asyncio.gather(
+            companion.agenerate_response("Hello from alice", session_id="alice"),
+            companion.agenerate_response("Hello from bob", session_id="bob"),
+        )
+
+    asyncio.run(run())
+
+    assert [i['user_input'] for i in companion.get_memory("alice").conversations] == ["Hello from alice"]
+    assert [i['user_input'] for i in companion.get_memory("bob").conversations] == ["Hello from bob"]
+    assert "bob" in companion.session_metrics
+
+
+def test_concurrent_sessions_overlap_llm_latency(make_async_companion):
+    companion = make_async_companion(latency=0.1)
+    client = companion.llm.client
+
+    async def run():
+        await asyncio.gather(*(
+            companion.agenerate_response("Hi", session_id=f"user-{i}") for i in range(50)
+        ))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert client.backend.calls == 50
+    assert elapsed < 2.5
+
+
+def test_stream_and_commands_use_session_memory(make_async_companion):
+    companion = make_async_companion(reply="one two")
+
+    async def run():
+        chunks = [c async for c in companion.agenerate_response_stream("Hi", session_id="carol")]
+        cleared = await companion.agenerate_response("/clear", session_id="carol")
+        return chunks, cleared
+
+    chunks, cleared = asyncio.run(run())
+
+    assert ''.join(chunks) == "one two"
+    assert cleared == "Conversation history cleared!"
+    assert len(companion.get_memory("carol").conversations) == 0
+
+
+def test_sync_entry_points_point_to_the_async_ones(make_async_companion):
+    companion = make_async_companion()
+
+    with pytest.raises(TypeError, match="agenerate_response"):
+        companion.generate_response("Hi")
+    with pytest.raises(TypeError, match="agenerate_response_stream"):
+        companion.generate_response_stream("Hi")
+
+
+def test_session_loads_and_memory_writes_run_off_the_loop(tmp_path, make_async_companion):
+    companion = make_async_companion(session_dir=str(tmp_path / "sessions"))
+    threads = {}
+    load = companion.sessions._load
+
+    def record_load(session_id):
+        threads['load'] = threading.get_ident()
+        memory = load(session_id)
+        add_interaction = memory.add_interaction
+
+        def record_write(**kwargs):
+            threads['write'] = threading.get_ident()
+            add_interaction(**kwargs)
+
+        memory.add_interaction = record_write
+        return memory
+
+    companion.sessions._load = record_load
+
+    async def run():
+        await companion.agenerate_response("Hello", session_id="dave")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+
+    assert threads['load'] != loop_thread and threads['write'] != loop_thread
+    assert companion.get_memory("dave").conversations[0].user_input == "Hello"
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from batch import BatchRunner, read_checkpoint
+
+
+@pytest.fixture
+def companion_in(make_companion):
+    """A companion whose session memories live under the given directory."""
+    return lambda directory: make_companion(latency=0.001, session_dir=str(directory / "sessions"))
+
+
+def _write_input(path, sessions=5, turns=4):
+    with open(path, 'w', encoding='utf-8') as f:
+        for turn in range(turns):
+            for session in range(sessions):
+                f.write(json.dumps({'id': f"{session}-{turn}", 'session_id': f"s{session}",
+                                    'message': f"session {session} turn {turn}"}) + '\n')
+        f.write('{"no message": true}\n')
+
+
+def test_runs_sessions_in_order_and_reports(tmp_path, companion_in):
+    _write_input(tmp_path / "in.jsonl")
+    companion = companion_in(tmp_path)
+    report = BatchRunner(companion, workers=4, max_pending=3).run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+
+    assert (report['lines'], report['completed'], report['errors']) == (21, 20, 1)
+    assert report['turns_per_second'] > 0 and report['latency']['p50_ms'] > 0
+    records = [json.loads(line) for line in open(tmp_path / "out.jsonl")]
+    assert len(records) == 21 and sum('error' in r for r in records) == 1
+    history = [i.user_input for i in companion.get_memory('batch:s3').conversations]
+    assert history == [f"session 3 turn {turn}" for turn in range(4)]
+
+
+def test_resumes_from_checkpoint_and_replays_history(tmp_path, companion_in):
+    _write_input(tmp_path / "in.jsonl")
+    output = tmp_path / "out.jsonl"
+    BatchRunner(companion_in(tmp_path / "first"), workers=4).run(str(tmp_path / "in.jsonl"), str(output))
+    # Simulate a crash: keep half of the results and a torn final line
+    lines = open(output).read().splitlines()
+    done = [line for line in lines if '"error"' not in line][:10]
+    with open(output, 'w') as f:
+        f.write('\n'.join(done) + '\n' + done[-1][:20])
+
+    assert len(read_checkpoint(str(output))) == 10
+    companion = companion_in(tmp_path / "second")
+    report = BatchRunner(companion, workers=4).run(str(tmp_path / "in.jsonl"), str(output))
+
+    assert (report['resumed'], report['completed']) == (10, 10)
+    records = [json.loads(line) for line in open(output)]
+    assert sorted(r['line'] for r in records if 'error' not in r) == list(range(1, 21))
+    assert len(records) == 21
+    history = [i.user_input for i in companion.get_memory('batch:s0').conversations]
+    assert history == [f"session 0 turn {turn}" for turn in range(4)]
+
+
+def test_resume_replaces_error_records_of_retried_lines(tmp_path, companion_in):
+    with open(tmp_path / "in.jsonl", 'w', encoding='utf-8') as f:
+        for i in range(3):
+            f.write(json.dumps({'message': f"question {i}"}) + '\n')
+    output = tmp_path / "out.jsonl"
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'message': "question 0", 'line': 1, 'response': "ok", 'latency_s': 0.1}) + '\n')
+        f.write(json.dumps({'message': "question 1", 'line': 2, 'response': None, 'error': "timeout"}) + '\n')
+
+    report = BatchRunner(companion_in(tmp_path), workers=2).run(str(tmp_path / "in.jsonl"), str(output))
+
+    assert (report['resumed'], report['completed'], report['errors']) == (1, 2, 0)
+    records = [json.loads(line) for line in open(output)]
+    assert sorted(r['line'] for r in records) == [1, 2, 3]
+    assert not any('error' in r for r in records)
+
+
+def test_input_session_ids_cannot_reach_the_default_memory(tmp_path, companion_in):
+    with open(tmp_path / "in.jsonl", 'w') as f:
+        f.write(json.dumps({'session_id': 'default', 'message': "please remember that my PIN is 1234"}) + '\n')
+    companion = companion_in(tmp_path)
+    report = BatchRunner(companion, workers=2).run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    companion.sessions.close()
+
+    assert report['completed'] == 1
+    assert not companion.memory.conversations and not companion.memory.store_loaded
+    assert not any(name.startswith('long_term_memory') for name in os.listdir(tmp_path))
@@ -0,0 +1,32 @@
+import argparse
+
+import benchmark
+from fake_llm import Distribution
+
+
+def _args(**overrides):
+    options = dict(turns=20, memories=50, queries=10, memory_backend='journal', sessions=3, session_turns=2, max_sessions=2, vocabulary=200, latency='0',
+                   tokens_per_second='0', reply_words=20, seed=1)
+    options.update(overrides)
+    return argparse.Namespace(**options)
+
+
+def test_distribution_is_seeded_and_non_negative():
+    first = Distribution.parse('lognormal:0.2:0.5', seed=7)
+    second = Distribution.parse('lognormal:0.2:0.5', seed=7)
+    samples = [first.sample() for _ in range(50)]
+
+    assert samples == [second.sample() for _ in range(50)]
+    assert all(value >= 0 for value in samples)
+    assert Distribution.parse('0.3').sample() == 0.3
+
+
+def test_scenarios_report_throughput_percentiles_and_rss():
+    for name in benchmark.SCENARIOS:
+        result = benchmark.run_scenario(name, _args())
+        assert result['scenario'] == name
+        assert result['peak_rss_mb'] > 0
+        latency = result.get('turn_latency') or result.get('retrieval_latency') or result['classify_latency']
+        assert latency['p50_ms'] <= latency['p95_ms'] <= latency['p99_ms'] <= latency['max_ms']
+
+    assert benchmark.run_scenario('memory', _args())['memories'] == 50
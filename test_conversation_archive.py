@@ -0,0 +1,85 @@
+import json
+import os
+
+import conversation_archive
+from conversation_archive import ConversationArchive, iter_conversation, read_conversation_tail
+from conversation_memory import ConversationMemory
+
+
+def _write(path, turns, day='2024-05-01', topics=('technology',), indent=2):
+    data = {
+        'timestamp': f"{day}T18:00:00",
+        'summary': f"summary of {os.path.basename(path)}",
+        'conversations': [
+            {'timestamp': f"{day}T12:00:{i % 60:02d}", 'user_input': f"question {i} about {word}",
+             'ai_response': f"answer {i}", 'context': {'detected_topics': list(topics)}}
+            for i, word in enumerate(turns)
+        ]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    return data
+
+
+def test_tail_reads_only_the_end_of_large_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation_archive, 'CHUNK_SIZE', 256)
+    path = str(tmp_path / "conversation_big.json")
+    data = _write(path, [f'word{i}' for i in range(2000)])
+
+    assert conversation_archive._scan_tail(path, 3) == data['conversations'][-3:]
+    header, records = read_conversation_tail(path, 3)
+    assert header == {'timestamp': data['timestamp'], 'summary': data['summary']}
+    assert records == data['conversations'][-3:]
+
+    # Compact JSON has no per-turn lines to scan for; the streaming fallback gives the same result
+    compact = str(tmp_path / "conversation_compact.json")
+    _write(compact, [f'word{i}' for i in range(50)], indent=None)
+    assert conversation_archive._scan_tail(compact, 3) is None
+    assert read_conversation_tail(compact, 3)[1] == json.load(open(compact))['conversations'][-3:]
+    turns = [value for key, value in iter_conversation(compact) if key == 'turn']
+    assert len(turns) == 50
+
+
+def test_memory_loads_the_tail_and_summary(tmp_path):
+    path = str(tmp_path / "conversation_long.json")
+    data = _write(path, [f'word{i}' for i in range(30)])
+    memory = ConversationMemory(max_history=4, memory_file=str(tmp_path / "ltm.json"))
+    memory.load_from_file(path)
+
+    assert [i.to_dict() for i in memory.conversations] == data['conversations'][-4:]
+    assert memory.summary == data['summary']
+
+
+def test_refresh_skips_unchanged_files_and_search_filters(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write("conversation_a.json", ['python', 'painting'], day='2024-05-01')
+    _write("conversation_b.json", ['python', 'history'], day='2024-06-01', topics=('history',))
+    archive = ConversationArchive(index_path=str(tmp_path / "index.sqlite"))
+
+    assert archive.refresh() == {'indexed': 2, 'unchanged': 0, 'removed': 0, 'failed': 0}
+    assert archive.refresh()['unchanged'] == 2
+    assert archive.stats() == {'archives': 2, 'turns': 4}
+
+    assert len(archive.search("python")) == 2
+    assert [r['user_input'] for r in archive.search("python", topic='history')] == ["question 0 about python"]
+    assert [os.path.basename(r['path']) for r in archive.search("python", since='2024-05-15')] == ["conversation_b.json"]
+    assert archive.search("python", until='2024-04-30') == []
+
+    _write("conversation_a.json", ['sculpture', 'painting', 'opera'], day='2024-05-01')
+    os.remove("conversation_b.json")
+    stats = archive.refresh()
+    assert (stats['indexed'], stats['removed']) == (1, 1)
+    assert archive.search("python") == []
+    assert len(archive.search("opera")) == 1
+    archive.close()
+
+
+def test_search_command(tmp_path, make_companion):
+    companion = make_companion(session_dir=str(tmp_path / "sessions"))
+    _write("conversation_a.json", ['python', 'painting'])
+    companion.archive_index_path = str(tmp_path / "index.sqlite")
+
+    assert "question 1 about painting" in companion._handle_command("search painting")
+    assert companion._handle_command("search painting since:2025-01-01") == "No matching conversations found."
+    assert companion._handle_command("search").startswith("Usage")
+    companion.archive.close()
@@ -0,0 +1,64 @@
+import json
+import threading
+
+from conversation_memory import ConversationMemory
+from conversation_summarizer import SummaryWorker, extractive_summary
+
+
+def test_extractive_summary_keeps_first_sentences_and_bounds_size():
+    interactions = [{'user_input': f"Question {i}. More detail.", 'ai_response': f"Answer {i}. Extra."} for i in range(50)]
+
+    summary = extractive_summary("", interactions, max_chars=200)
+
+    assert len(summary) <= 200
+    assert "Question 49." in summary
+    assert "More detail" not in summary
+
+
+def test_evicted_turns_are_summarized_in_background(tmp_path):
+    worker = SummaryWorker()
+    memory = ConversationMemory(max_history=2, memory_file=str(tmp_path / "ltm.json"), summarizer=worker)
+    for i in range(4):
+        memory.add_interaction(f"question {i}", f"answer {i}")
+
+    assert worker.flush(timeout=5)
+    assert "question 0" in memory.summary and "question 1" in memory.summary
+    assert "question 3" not in memory.summary
+
+
+def test_request_path_does_not_wait_for_summarizer(tmp_path):
+    release = threading.Event()
+
+    def slow_summary(summary, interactions):
+        release.wait(5)
+        return "slow summary"
+
+    worker = SummaryWorker(slow_summary)
+    memory = ConversationMemory(max_history=1, memory_file=str(tmp_path / "ltm.json"), summarizer=worker)
+    memory.add_interaction("first", "one")
+    memory.add_interaction("second", "two")
+
+    assert memory.summary == ""
+    release.set()
+    assert worker.flush(timeout=5)
+    assert memory.summary == "slow summary"
+
+
+def test_summary_is_saved_and_loaded(tmp_path):
+    worker = SummaryWorker()
+    memory = ConversationMemory(max_history=1, memory_file=str(tmp_path / "ltm.json"), summarizer=worker)
+    memory.add_interaction("first question", "first answer")
+    memory.add_interaction("second question", "second answer")
+    filename = str(tmp_path / "conversation.json")
+    memory.save_to_file(filename)
+
+    assert "first question" in json.load(open(filename))['summary']
+
+    restored = ConversationMemory(max_history=1, memory_file=str(tmp_path / "ltm.json"), summarizer=worker)
+    restored.load_from_file(filename)
+    assert "first question" in restored.summary
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,62 @@
+import json
+from datetime import datetime
+
+from conversation_memory import ConversationMemory
+from interaction import TOPICS, Interaction, PreferenceSnapshots
+
+
+def _record(i, preferences):
+    return {
+        'timestamp': datetime(2024, 5, 1, 12, 0, i % 60, 123456).isoformat(),
+        'user_input': f"question {i}",
+        'ai_response': f"answer {i}",
+        'context': {
+            'timestamp': datetime(2024, 5, 1, 12, 0, i % 60).isoformat(),
+            'user_preferences': preferences,
+            'detected_topics': ['technology', 'science']
+        }
+    }
+
+
+def test_round_trips_the_json_format():
+    record = _record(3, {'tone': 'casual'})
+    interaction = Interaction.from_dict(record)
+
+    assert interaction.to_dict() == record
+    assert json.loads(json.dumps(interaction.to_dict())) == record
+    assert interaction['context']['detected_topics'] == ['technology', 'science']
+    assert interaction.topic_ids == (TOPICS.intern('technology'), TOPICS.intern('science'))
+
+    legacy = {'user_input': 'remember my cat', 'ai_response': 'ok', 'context': {}}
+    assert Interaction.from_dict(legacy).to_dict() == legacy
+
+
+def test_preferences_are_stored_once_per_snapshot():
+    snapshots = PreferenceSnapshots()
+    preferences = {'tone': 'casual'}
+    first = Interaction.from_dict(_record(1, preferences), snapshots)
+    second = Interaction.from_dict(_record(2, dict(preferences)), snapshots)
+    preferences['tone'] = 'formal'
+    third = Interaction.from_dict(_record(3, preferences), snapshots)
+
+    assert first.preferences is second.preferences
+    assert third.preferences == {'tone': 'formal'} and first.preferences == {'tone': 'casual'}
+    assert len(snapshots) == 2
+
+
+def test_memory_saves_and_loads_interactions(tmp_path):
+    memory = ConversationMemory(memory_file=str(tmp_path / "ltm.json"))
+    context = {'timestamp': datetime.now().isoformat(), 'user_preferences': {}, 'detected_topics': ['arts']}
+    memory.add_interaction("Remember that I paint", "Noted!", context)
+    memory.add_interaction("What about music?", "Sure.", context)
+    filename = str(tmp_path / "conversation.json")
+    memory.save_to_file(filename)
+
+    saved = json.load(open(filename))['conversations']
+    assert saved[0]['context']['detected_topics'] == ['arts'] and 'timestamp' in saved[0]
+
+    restored = ConversationMemory(memory_file=str(tmp_path / "ltm.json"))
+    restored.load_from_file(filename)
+    assert [i.to_dict() for i in restored.conversations] == saved
+    assert restored.long_term_memory[0].user_input == "Remember that I paint"
+    assert "arts" in restored.get_conversation_summary()
@@ -0,0 +1,44 @@
+from keyword_classifier import KeywordClassifier
+from conversation_memory import ConversationMemory
+
+
+def test_matches_whole_words_only():
+    classifier = KeywordClassifier.from_config()
+
+    assert classifier.classify("I know canvas painting")['web_search'] == []
+    assert classifier.classify("What's happening now?")['web_search'] == ['current_events', 'temporal']
+    assert classifier.classify("Python VS Rust")['web_search'] == ['comparative']
+    assert classifier.matches('memory', "Please don’t forget my birthday")
+    assert not classifier.matches('memory', "Those notes were footnotes")
+
+
+def test_overlapping_phrases_all_match():
+    classifier = KeywordClassifier({
+        'g': {'short': ['new york'], 'long': ['new york times'], 'inner': ['york times', 'times']}
+    })
+
+    assert classifier.classify("read the New York Times")['g'] == ['short', 'long', 'inner']
+    assert classifier.classify("new yorkshire")['g'] == []
+
+
+def test_config_triggers_extend_and_replace_defaults():
+    config = {'triggers': {
+        'topics': {'music': ['guitar', 'jazz']},
+        'web_search': {'temporal': ['forecast']}
+    }}
+    classifier = KeywordClassifier.from_config(config, topics=['current_events', 'technology'])
+
+    result = classifier.classify("Any jazz or technology forecast?")
+    assert result['topics'] == ['technology', 'music']
+    assert result['web_search'] == ['temporal']
+    assert not classifier.matches('web_search', "the weather")
+
+
+def test_memory_uses_classifier_and_caller_hint(tmp_path):
+    memory = ConversationMemory(memory_file=str(tmp_path / "ltm.json"))
+    memory.add_interaction("I'm noteworthy", "Sure")
+    memory.add_interaction("Hello", "I will remember that")
+    memory.add_interaction("Hello again", "Hi", input_important=True)
+    memory.add_interaction("Remember this", "Ok", input_important=False)
+
+    assert [m.user_input for m in memory.long_term_memory] == ["Hello", "Hello again"]
@@ -0,0 +1,179 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from openai import BadRequestError, OpenAI
+
+from fake_llm import AsyncFakeLLMClient, FakeLLMClient
+from llm_scheduler import AsyncRequestScheduler, RequestScheduler, TokenBucket
+from metrics import MetricsRegistry
+
+MESSAGES = [{'role': 'user', 'content': 'Hello'}]
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Mock of POST /v1/chat/completions: answers with the queued status codes, then 200."""
+    statuses = []
+    hits = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        type(self).hits += 1
+        status = type(self).statuses.pop(0) if type(self).statuses else 200
+        if status == 200:
+            body = {
+                'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-3.5-turbo',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': 'Hi there'}}],
+                'usage': {'prompt_tokens': 5, 'completion_tokens': 2, 'total_tokens': 7}
+            }
+        else:
+            body = {'error': {'message': 'slow down', 'type': 'rate_limit', 'code': None}}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def llm_server():
+    _ChatHandler.statuses = []
+    _ChatHandler.hits = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _ChatHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield OpenAI(api_key="test", base_url=f"http://127.0.0.1:{httpd.server_address[1]}/v1", max_retries=0)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_retries_rate_limits_against_mock_server(llm_server):
+    _ChatHandler.statuses = [429, 503]
+    metrics = MetricsRegistry(enabled=True)
+    scheduler = RequestScheduler(llm_server, base_delay=0.01, metrics=metrics)
+
+    response = scheduler.chat.completions.create(model="gpt-3.5-turbo", messages=MESSAGES)
+
+    assert response.choices[0].message.content == "Hi there"
+    assert _ChatHandler.hits == 3 and scheduler.stats()['retries'] == 2
+    reasons = {c['labels']['reason'] for c in metrics.snapshot()['counters'] if c['name'] == 'llm_retries'}
+    assert reasons == {'429', '503'}
+
+
+def test_production_clients_leave_retries_to_the_scheduler(monkeypatch):
+    from ai_companion import AICompanion
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+
+    assert AICompanion._create_client().max_retries == 0
+
+
+def test_production_async_client_leaves_retries_to_the_scheduler(monkeypatch):
+    pytest.importorskip('httpx')
+    from async_companion import AsyncAICompanion
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+
+    assert AsyncAICompanion._create_async_client(4, 2).max_retries == 0
+
+
+def test_client_errors_are_not_retried(llm_server):
+    _ChatHandler.statuses = [400]
+    scheduler = RequestScheduler(llm_server, base_delay=0.01)
+
+    with pytest.raises(BadRequestError):
+        scheduler.chat.completions.create(model="gpt-3.5-turbo", messages=MESSAGES)
+    assert _ChatHandler.hits == 1
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    client = FakeLLMClient(latency=0.2, tokens_per_second=0)
+    scheduler = RequestScheduler(client)
+
+    with ThreadPoolExecutor(5) as pool:
+        replies = list(pool.map(lambda _: scheduler.chat.completions.create(model="m", messages=MESSAGES), range(5)))
+
+    assert client.backend.calls == 1
+    assert len({r.choices[0].message.content for r in replies}) == 1
+    assert scheduler.stats()['coalesced'] == 4
+
+
+def test_concurrency_is_bounded_and_queue_depth_reported():
+    metrics = MetricsRegistry(enabled=True)
+    scheduler = RequestScheduler(FakeLLMClient(latency=0.05, tokens_per_second=0), max_concurrency=2, metrics=metrics)
+    peak = []
+
+    def call(i):
+        response = scheduler.chat.completions.create(model="m", messages=[{'role': 'user', 'content': str(i)}])
+        peak.append(scheduler.stats()['in_flight'])
+        return response
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(call, range(6)))
+
+    assert max(peak) <= 2
+    assert scheduler.stats()['max_waiting'] >= 1
+    assert any(h['name'] == 'llm_queue_depth' for h in metrics.snapshot()['histograms'])
+
+
+def test_stream_releases_its_slot_when_consumed():
+    scheduler = RequestScheduler(FakeLLMClient(latency=0, tokens_per_second=0, reply="one two"), max_concurrency=1)
+
+    for _ in range(2):
+        chunks = scheduler.chat.completions.create(model="m", messages=MESSAGES, stream=True)
+        assert ''.join(c.choices[0].delta.content for c in chunks) == "one two"
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_abandoned_streams_are_closed():
+    scheduler = RequestScheduler(FakeLLMClient(latency=0, tokens_per_second=0, reply="one two"), max_concurrency=1)
+    stream = scheduler.chat.completions.create(model="m", messages=MESSAGES, stream=True)
+    next(iter(stream))
+    stream.close()
+
+    assert stream._stream.gi_frame is None and scheduler.stats()['in_flight'] == 0
+
+    async def run():
+        scheduler = AsyncRequestScheduler(AsyncFakeLLMClient(latency=0, tokens_per_second=0, reply="one two"),
+                                          max_concurrency=1)
+        stream = await scheduler.chat.completions.create(model="m", messages=MESSAGES, stream=True)
+        await stream.__aiter__().__anext__()
+        await stream.aclose()
+        return stream._stream.ag_frame is None and scheduler.stats()['in_flight'] == 0
+
+    assert asyncio.run(run())
+
+
+def test_token_bucket_spaces_requests():
+    bucket = TokenBucket(per_minute=60, burst=1)
+
+    assert bucket.reserve() == 0
+    assert 0.9 < bucket.reserve() <= 1.0
+
+
+def test_async_scheduler_coalesces_and_limits():
+    client = AsyncFakeLLMClient(latency=0.05, tokens_per_second=0)
+    scheduler = AsyncRequestScheduler(client, max_concurrency=2, requests_per_minute=6000)
+
+    async def run():
+        same = [scheduler.chat.completions.create(model="m", messages=MESSAGES) for _ in range(3)]
+        other = [scheduler.chat.completions.create(model="m", messages=[{'role': 'user', 'content': str(i)}])
+                 for i in range(4)]
+        start = time.perf_counter()
+        await asyncio.gather(*same, *other)
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+
+    assert client.backend.calls == 5
+    assert elapsed >= 0.14
+    assert scheduler.stats()['in_flight'] == 0
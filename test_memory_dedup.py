@@ -0,0 +1,107 @@
+import json
+import sys
+import threading
+
+import pytest
+
+from conversation_memory import ConversationMemory
+from interaction import Interaction
+import memory_dedup
+from memory_dedup import MemoryConsolidator, consolidate_store
+from memory_store import JournalMemoryStore, SQLiteMemoryStore, open_store
+
+REPLY = "I will always remember that you prefer tea over coffee in the morning and like it with honey"
+
+
+def _store(kind, tmp_path):
+    if kind == 'journal':
+        return JournalMemoryStore(str(tmp_path / "ltm.json"))
+    return SQLiteMemoryStore(str(tmp_path / "ltm.sqlite"))
+
+
+def test_consolidator_matches_near_duplicates_only():
+    consolidator = MemoryConsolidator(threshold=0.7)
+    consolidator.add(0, consolidator.signature(f"note that {REPLY}"))
+    consolidator.add(1, consolidator.signature("please never call me before nine on weekdays"))
+
+    match = consolidator.find(consolidator.signature(f"note that {REPLY}!"))
+    assert match[0] == 0 and match[1] == 1.0
+    assert consolidator.find(consolidator.signature(f"note that {REPLY} very much")) is not None
+    assert consolidator.find(consolidator.signature("remember my sister lives in Lisbon")) is None
+
+
+@pytest.mark.parametrize('kind', ['journal', 'sqlite'])
+def test_insert_merges_duplicates_with_hits_and_latest_timestamp(tmp_path, kind):
+    memory = ConversationMemory(memory_file=str(tmp_path / "ltm.json"), store=_store(kind, tmp_path))
+    memory.build_consolidator(wait=True)
+    for i in range(5):
+        memory._add_to_long_term_memory(Interaction("note this", REPLY, timestamp=1000.0 + i))
+    memory._add_to_long_term_memory(Interaction("never forget", "my sister lives in Lisbon", timestamp=2000.0))
+    memory.close()
+
+    reopened = _store(kind, tmp_path)
+    memories = list(reopened)
+    assert len(memories) == 2
+    assert (memories[0].hits, memories[0].timestamp) == (5, 1004.0)
+    assert memories[1].hits == 1
+    reopened.close()
+
+
+def test_index_is_built_in_the_background_and_catches_up(tmp_path, monkeypatch):
+    store = SQLiteMemoryStore(str(tmp_path / "ltm.sqlite"))
+    store.append(Interaction("note this", REPLY, timestamp=1.0))
+    store.working_set_size = 1
+    store.append(Interaction("note this", "an older memory outside the working set", timestamp=0.5))
+    memory = ConversationMemory(memory_file=str(tmp_path / "ltm.json"), store=store)
+    gate = threading.Event()
+    working_set = store.working_set
+    monkeypatch.setattr(store, 'working_set', lambda: (gate.wait(5), working_set())[1])
+
+    # The first insert neither waits for the index nor checks for duplicates
+    memory._add_to_long_term_memory(Interaction("never forget", "my sister lives in Lisbon", timestamp=2.0))
+    memory._add_to_long_term_memory(Interaction("note this", REPLY, timestamp=3.0))
+    assert memory._consolidator is None and len(store) == 4
+    gate.set()
+    memory.build_consolidator(wait=True)
+
+    # Memories stored during the build were indexed once it finished; older ones beyond the
+    # working set (here only the newest row) are not checked
+    memory._add_to_long_term_memory(Interaction("never forget", "my sister lives in Lisbon", timestamp=4.0))
+    memory._add_to_long_term_memory(Interaction("note this", "an older memory outside the working set"))
+    assert [memory.hits for memory in store] == [1, 1, 2, 1, 1]
+    memory.close()
+
+
+@pytest.mark.parametrize('kind', ['journal', 'sqlite'])
+def test_offline_consolidation_compacts_existing_store(tmp_path, kind):
+    store = _store(kind, tmp_path)
+    for i in range(20):
+        store.append(Interaction("note this", REPLY, timestamp=float(i)))
+        store.append(Interaction("note this", f"fact number {i} is that the sky has {i} colours today", timestamp=float(i)))
+    store.flush()
+
+    report = consolidate_store(store, MemoryConsolidator())
+    assert report == {'memories_before': 40, 'memories_after': 21, 'merged': 19}
+    store.close()
+
+    reopened = _store(kind, tmp_path)
+    memories = list(reopened)
+    assert len(memories) == 21
+    assert (memories[0].hits, memories[0].timestamp) == (20, 19.0)
+    assert reopened.search("honey")[0][0] == next(doc_id for doc_id, _ in reopened.items())
+    reopened.close()
+
+
+@pytest.mark.parametrize('backend', ['journal', 'sqlite', 'tiered'])
+def test_cli_compacts_each_backend(tmp_path, monkeypatch, capsys, backend):
+    memory_file = str(tmp_path / "ltm.json")
+    store = open_store(backend, memory_file)
+    for i in range(4):
+        store.append(Interaction("note this", REPLY, timestamp=float(i)))
+    store.close()
+
+    monkeypatch.setattr(sys, 'argv', ['memory_dedup.py', '--memory-file', memory_file, '--backend', backend])
+    memory_dedup.main()
+    report = json.loads(capsys.readouterr().out)
+    assert (report['memories_before'], report['memories_after']) == (4, 1)
+    assert report['bytes_before'] > 0 and report['bytes_after'] > 0
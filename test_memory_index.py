@@ -0,0 +1,47 @@
+from conversation_memory import ConversationMemory
+from memory_index import InvertedIndex
+
+
+def test_bm25_ranks_rarer_and_repeated_terms_higher():
+    index = InvertedIndex()
+    index.add(0, "I like coffee in the morning")
+    index.add(1, "my cat likes coffee too, coffee every day")
+    index.add(2, "the weather is nice")
+
+    results = index.search("coffee cat", limit=5)
+
+    assert [doc_id for doc_id, _ in results] == [1, 0]
+
+
+def test_remove_and_limit():
+    index = InvertedIndex()
+    for i in range(10):
+        index.add(i, f"note number {i} about tea")
+    index.remove(3)
+
+    results = index.search("tea", limit=4)
+
+    assert len(results) == 4
+    assert 3 not in [doc_id for doc_id, _ in results]
+    assert index.search("unknown", limit=4) == []
+    # Only the removed document's own postings were touched
+    assert "3" not in index.postings and 3 not in index.doc_terms
+    assert len(index.postings["tea"]) == 9
+
+
+def test_memory_index_is_maintained_and_rebuilt(tmp_path):
+    memory_file = str(tmp_path / "long_term_memory.json")
+    memory = ConversationMemory(memory_file=memory_file)
+    memory.add_interaction("Remember my favorite color is green", "I'll remember that!")
+    memory.add_interaction("Note: my sister lives in Paris", "Got it.")
+    memory.close()
+
+    assert memory.get_relevant_memories("paris")[0]['user_input'] == "Note: my sister lives in Paris"
+
+    reloaded = ConversationMemory(memory_file=memory_file)
+    assert reloaded.get_relevant_memories("green color")[0]['user_input'] == "Remember my favorite color is green"
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,56 @@
+import json
+
+from conversation_memory import ConversationMemory
+from memory_journal import MemoryJournal
+
+
+def test_append_and_replay(tmp_path):
+    journal = MemoryJournal(str(tmp_path / "memory.jsonl"), fsync_every=2)
+    for i in range(5):
+        journal.append({'user_input': f"note {i}"})
+    journal.close()
+
+    records = list(MemoryJournal(str(tmp_path / "memory.jsonl")).replay())
+
+    assert [r['user_input'] for r in records] == [f"note {i}" for i in range(5)]
+
+
+def test_truncated_tail_is_skipped_and_repaired(tmp_path):
+    path = tmp_path / "memory.jsonl"
+    path.write_text('{"user_input": "ok"}\n{"user_input": "tru')
+
+    journal = MemoryJournal(str(path))
+    assert [r['user_input'] for r in journal.replay()] == ["ok"]
+
+    journal.append({'user_input': "after crash"})
+    journal.close()
+    assert [r['user_input'] for r in MemoryJournal(str(path)).replay()] == ["ok", "after crash"]
+
+
+def test_compact_rewrites_live_records(tmp_path):
+    journal = MemoryJournal(str(tmp_path / "memory.jsonl"))
+    for i in range(10):
+        journal.append({'n': i})
+
+    journal.compact([{'n': 9}])
+
+    assert list(journal.replay()) == [{'n': 9}]
+    assert journal.line_count == 1
+
+
+def test_memory_migrates_legacy_file_and_appends(tmp_path):
+    legacy = tmp_path / "long_term_memory.json"
+    legacy.write_text(json.dumps([{'user_input': 'remember my cat', 'ai_response': 'ok', 'context': {}}]))
+
+    memory = ConversationMemory(memory_file=str(legacy))
+    memory.add_interaction("Please remember I like tea", "Noted!")
+    memory.close()
+
+    reloaded = ConversationMemory(memory_file=str(legacy))
+    assert [m['user_input'] for m in reloaded.long_term_memory] == ['remember my cat', 'Please remember I like tea']
+    assert json.loads(legacy.read_text())[0]['user_input'] == 'remember my cat'
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import memory_store
+from conversation_memory import ConversationMemory
+from interaction import Interaction
+from memory_store import JournalMemoryStore, SQLiteMemoryStore, TieredMemoryStore, open_store
+
+
+def _interaction(text, reply="ok", timestamp=1.0):
+    return Interaction(text, reply, timestamp=timestamp)
+
+
+def test_sqlite_store_batches_writes_and_searches_with_fts(tmp_path):
+    path = str(tmp_path / "memories.sqlite")
+    store = SQLiteMemoryStore(path, batch_size=3, flush_interval=60)
+    ids = [store.append(_interaction(f"note {i} about cats", timestamp=i)) for i in range(2)]
+    other = sqlite3.connect(path)
+
+    assert other.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 0
+    store.append(_interaction("my sister lives in Paris", timestamp=5))
+    assert store.writer.flush(timeout=5)
+    assert other.execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 3
+    assert other.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    assert ids == [0, 1]
+    assert store.get_many(doc_id for doc_id, _ in store.search("paris"))[0].user_input == "my sister lives in Paris"
+    assert store.search("the") == []
+    assert [m.user_input for m in store.recent(1)] == ["my sister lives in Paris"]
+    with pytest.raises(IndexError):
+        store[99]
+    store.close()
+
+
+def test_sqlite_sessions_share_a_file_but_not_memories(tmp_path):
+    path = str(tmp_path / "memories.sqlite")
+    alice = SQLiteMemoryStore(path, session_id="alice")
+    bob = SQLiteMemoryStore(path, session_id="bob")
+    alice.append(_interaction("remember my cat Tom"))
+    bob.append(_interaction("remember my dog Rex"))
+
+    assert [m.user_input for m in alice] == ["remember my cat Tom"]
+    assert len(bob) == 1 and bob.search("cat") == []
+    alice.close()
+    bob.close()
+
+
+def test_sqlite_ids_are_unique_across_processes(tmp_path, monkeypatch):
+    path = str(tmp_path / "memories.sqlite")
+    first = SQLiteMemoryStore(path, flush_interval=60)
+    first_ids = [first.append(_interaction(f"first {i}")) for i in range(3)]
+    # A second process has its own id blocks but the same database
+    monkeypatch.setattr(memory_store, '_id_blocks', {})
+    second = SQLiteMemoryStore(path, session_id="other", flush_interval=60)
+    second_ids = [second.append(_interaction(f"second {i}")) for i in range(3)]
+    first.close()
+    second.close()
+
+    assert not set(first_ids) & set(second_ids)
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM memories").fetchone()[0] == 6
+
+
+def test_sqlite_failed_write_is_retried_not_dropped(tmp_path):
+    path = str(tmp_path / "memories.sqlite")
+    store = SQLiteMemoryStore(path, flush_interval=60)
+    store._conn.execute("PRAGMA busy_timeout = 10")
+    store.append(_interaction("remember my cat Tom"))
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+
+    store.flush()
+    assert len(store._pending) == 1
+    blocker.execute("ROLLBACK")
+    store.flush()
+    assert blocker.execute("SELECT user_input FROM memories").fetchall() == [("remember my cat Tom",)]
+    store.close()
+
+
+def test_sqlite_reads_see_buffered_writes_without_writing_them(tmp_path):
+    path = str(tmp_path / "memories.sqlite")
+    store = SQLiteMemoryStore(path, flush_interval=60)
+    stored = store.append(_interaction("my dog Rex likes the beach", timestamp=1))
+    store.flush()
+    buffered = store.append(_interaction("my sister lives in Paris", timestamp=2))
+    store.merge(stored, _interaction("my dog Rex likes the beach", timestamp=3))
+    other = sqlite3.connect(path)
+
+    # Reads do not take the write lock, so a write in progress cannot stall them
+    with store._lock:
+        result = threading.Thread(target=lambda: store.search("paris beach"))
+        result.start()
+        result.join(timeout=2)
+        assert not result.is_alive()
+    assert {doc_id for doc_id, _ in store.search("paris beach")} == {stored, buffered}
+    assert store.get(buffered).user_input == "my sister lives in Paris"
+    assert (store.get(stored).hits, store.get(stored).timestamp) == (2, 3)
+    assert len(store) == 2 and store.recent(1)[0].timestamp == 3
+    assert other.execute("SELECT COUNT(*), SUM(hits) FROM memories").fetchone() == (1, 1)
+
+    store.flush()
+    assert other.execute("SELECT COUNT(*), SUM(hits) FROM memories").fetchone() == (2, 3)
+    assert len(store) == 2
+    store.close()
+
+
+def test_memory_queries_sqlite_store_lazily(tmp_path):
+    path = str(tmp_path / "ltm.sqlite")
+    memory = ConversationMemory(store=SQLiteMemoryStore(path))
+    memory.add_interaction("Remember my favorite color is green", "I'll remember that!")
+    memory.add_interaction("Note: my sister lives in Paris", "Got it.")
+    memory.close()
+
+    reloaded = ConversationMemory(store=open_store('sqlite', str(tmp_path / "ltm.json")))
+    assert reloaded.get_relevant_memories("green color")[0].user_input == "Remember my favorite color is green"
+    assert len(reloaded.long_term_memory) == 2
+    assert reloaded.long_term_memory[1].user_input == "Note: my sister lives in Paris"
+    reloaded.close()
+
+
+def test_tiered_store_caps_hot_tier_and_falls_back_to_cold(tmp_path):
+    path = str(tmp_path / "ltm.sqlite")
+    store = TieredMemoryStore(SQLiteMemoryStore(path), hot_capacity=3, half_life=100.0)
+    now = time.time()
+    store.append(_interaction("my sister lives in Paris", timestamp=now - 1000))
+    for i in range(5):
+        store.append(_interaction(f"note {i} about cats", timestamp=now - i))
+    assert store.writer.flush(timeout=5)
+
+    # The oldest memories were demoted but are still stored
+    assert len(store.hot) == 3 and len(store) == 6
+    assert sorted(m.user_input for m in store.hot.values()) == [f"note {i} about cats" for i in range(3)]
+
+    results = store.search("paris")
+    assert store.get_many(doc_id for doc_id, _ in results)[0].user_input == "my sister lives in Paris"
+    assert store.tier_stats()['cold_searches'] == 1
+    # The cold match is promoted in the background, displacing the lowest-ranked hot memory
+    assert store.writer.flush(timeout=5)
+    assert 0 in store.hot and len(store.hot) == 3
+    store.search("paris", limit=1)
+    assert store.tier_stats()['cold_searches'] == 1
+    store.close()
+
+    reopened = open_store('tiered', str(tmp_path / "ltm.json"))
+    assert len(reopened) == 6 and len(reopened.hot) == 6
+    reopened.close()
+
+
+def test_open_store_selects_backend(tmp_path):
+    assert isinstance(open_store('journal', str(tmp_path / "ltm.json")), JournalMemoryStore)
+    with pytest.raises(ValueError):
+        open_store('csv', str(tmp_path / "ltm.json"))
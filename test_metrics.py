@@ -0,0 +1,63 @@
+import json
+
+from metrics import MetricsRegistry
+
+
+def test_histogram_percentiles_and_counters():
+    registry = MetricsRegistry(enabled=True)
+    for value in range(1, 101):
+        registry.observe('latency', value / 100, stage='llm')
+    registry.increment('turns', 3)
+
+    snapshot = registry.snapshot()
+    histogram = snapshot['histograms'][0]
+
+    assert histogram['count'] == 100
+    assert abs(histogram['p50'] - 0.5) <= 0.01
+    assert abs(histogram['p99'] - 0.99) <= 0.01
+    assert snapshot['counters'][0]['value'] == 3
+
+
+def test_prometheus_and_json_exports(tmp_path):
+    registry = MetricsRegistry(enabled=True)
+    registry.observe('stage_seconds', 0.25, stage='llm')
+    registry.increment('response_cache_lookups', result='hit')
+
+    text = registry.to_prometheus()
+    assert '# TYPE ai_companion_stage_seconds summary' in text
+    assert 'ai_companion_stage_seconds{stage="llm",quantile="0.5"} 0.25' in text
+    assert 'ai_companion_response_cache_lookups_total{result="hit"} 1' in text
+
+    path = str(tmp_path / "metrics.jsonl")
+    registry.export_json_line(path)
+    registry.export_json_line(path)
+    lines = open(path).read().splitlines()
+    assert len(lines) == 2 and json.loads(lines[0])['histograms'][0]['name'] == 'stage_seconds'
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    with registry.timer('stage_seconds', stage='llm'):
+        pass
+    registry.increment('turns')
+
+    assert registry.snapshot()['histograms'] == []
+    assert registry.format_summary() == "Metrics are disabled."
+
+
+def test_companion_records_stages_and_serves_stats(make_companion):
+    companion = make_companion()
+    companion.metrics = MetricsRegistry(enabled=True)
+
+    companion.generate_response("Hello there")
+    stats = companion.generate_response("/stats")
+
+    assert "stage_seconds[stage=llm]" in stats
+    assert "stage_seconds[stage=memory_write]" in stats
+    assert "prompt_tokens" in stats
+    assert "ai_companion_turn_seconds_count 1" in companion.generate_response("/stats prometheus")
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,111 @@
+import json
+import threading
+
+from ai_companion import AICompanion
+from conversation_memory import ConversationMemory
+from fake_llm import FakeLLMClient
+from prompt_builder import PromptBuilder, PromptSection, TokenCounter
+
+
+def test_fallback_counter_counts_words_and_punctuation():
+    counter = TokenCounter()
+    counter._encoding = None
+    counter._cache.clear()
+
+    assert counter.count("Hello, world!") == 4
+    assert counter.count("") == 0
+
+
+def test_counter_cache_is_guarded_by_a_lock():
+    counter = TokenCounter(cache_size=8)
+    counter._encoding = None
+    results = []
+
+    with counter._lock:
+        thread = threading.Thread(target=lambda: results.append(counter.count("shared text")))
+        thread.start()
+        thread.join(timeout=0.2)
+        # The cache lookup waits for the lock other threads hold
+        assert thread.is_alive() and results == []
+    thread.join(timeout=5)
+
+    assert results == [2] and list(counter._cache) == ["shared text"]
+
+
+def test_sections_fill_budget_by_priority():
+    builder = PromptBuilder(token_budget=10)
+    builder.counter._encoding = None
+
+    result = builder.assemble([
+        PromptSection('persona', ["one two three"], required=True),
+        PromptSection('preferences', ["four five"]),
+        PromptSection('turns', ["newest turn here", "older turn that will not fit"]),
+    ])
+
+    assert result['sections']['persona'] == ["one two three"]
+    assert result['sections']['preferences'] == ["four five"]
+    assert result['sections']['turns'] == ["newest turn here"]
+    assert result['dropped'] == 1
+    assert result['tokens'] <= 10
+
+
+def test_rendered_turns_track_conversation(tmp_path):
+    memory = ConversationMemory(max_history=2, memory_file=str(tmp_path / "ltm.json"))
+    for i in range(3):
+        memory.add_interaction(f"question {i}", f"answer {i}")
+
+    assert memory.get_recent_turns() == ["User: question 1\nAI: answer 1\n", "User: question 2\nAI: answer 2\n"]
+    assert memory.get_recent_context(1) == "User: question 2\nAI: answer 2\n"
+
+
+def test_prompt_stays_within_budget_as_history_grows(make_companion):
+    companion = make_companion(reply="word " * 400)
+    companion.prompt_builder.token_budget = 800
+
+    for i in range(8):
+        companion.generate_response(f"Tell me a long story number {i}")
+
+    assert companion.last_turn_metrics['prompt_tokens'] <= 800
+
+
+def test_system_prompt_keeps_a_stable_persona_prefix(make_companion):
+    companion = make_companion()
+    companion.memory.user_preferences = {'tone': 'casual'}
+    prompts = []
+    for i in range(3):
+        request = companion._prepare_request(f"question {i}", None, companion.memory)
+        prompts.append(request['messages'][0]['content'])
+        companion.generate_response(f"question {i}")
+
+    persona = companion._persona()
+    assert all(prompt.startswith(persona + '\nUser preferences:\n{"tone": "casual"}\n') for prompt in prompts)
+    assert all(prompt.index('"timestamp"') > prompt.index('"detected_topics"') for prompt in prompts)
+    compiles = [c['value'] for c in companion.metrics.snapshot()['counters'] if c['name'] == 'persona_compiles']
+    assert compiles == [1]
+    assert 0 < companion.last_turn_metrics['cached_prompt_tokens'] <= companion.last_turn_metrics['prompt_tokens']
+
+    list(companion.generate_response_stream("one more"))
+    assert companion.last_turn_metrics['cached_prompt_tokens'] > 0
+
+
+def test_persona_is_recompiled_when_the_personality_changes(tmp_path):
+    personality_file = tmp_path / "personality.json"
+    personality_file.write_text(json.dumps({'name': 'Ada', 'traits': ['curious'], 'speaking_style': 'brisk'}))
+    companion = AICompanion(str(personality_file), client=FakeLLMClient(latency=0, tokens_per_second=0))
+    assert companion._persona().startswith("You are Ada, an AI companion with the following traits: curious.")
+
+    companion.modify_personality(new_style='gentle')
+    assert "You speak in a gentle manner." in companion._persona()
+
+    personality_file.write_text(json.dumps({'name': 'Grace', 'traits': ['patient'], 'speaking_style': 'calm'}))
+    companion.personality_check_interval = 0
+    assert companion._persona().startswith("You are Grace")
+
+    # A half-written file keeps the current personality
+    personality_file.write_text('{"name": ')
+    assert companion._persona().startswith("You are Grace")
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
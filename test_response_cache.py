@@ -0,0 +1,76 @@
+import time
+
+from fake_llm import FakeLLMClient
+from response_cache import ResponseCache
+from web_searcher import WebSearcher
+
+
+def test_lru_eviction_and_counters():
+    cache = ResponseCache(max_entries=2)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('c') == 'C'
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=0.01)
+    cache.set('k', 'v')
+    time.sleep(0.02)
+
+    assert cache.get('k') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(disk_path=path)
+    cache.set('k', 'v')
+    cache.close()
+
+    reopened = ResponseCache(disk_path=path)
+    assert reopened.get('k') == 'v'
+    assert reopened.stats()['disk_hits'] == 1
+
+
+def test_key_normalizes_case_and_whitespace():
+    assert ResponseCache.make_key('m', 's', '', 'Hello   World') == ResponseCache.make_key('m', 's', '', 'hello world')
+
+
+def test_companion_serves_repeated_prompt_from_cache(make_companion):
+    client = FakeLLMClient(latency=0, tokens_per_second=0)
+    cache = ResponseCache()
+
+    first = make_companion(client=client, response_cache=cache)
+    second = make_companion(client=client, response_cache=cache)
+    answer = first.generate_response("How do I reset my password?")
+    repeated = second.generate_response("how do I reset my  password?")
+
+    assert repeated == answer
+    assert client.backend.calls == 1
+    assert second.last_turn_metrics['cache_hit'] is True
+
+
+def test_time_sensitive_queries_can_bypass_cache(make_companion):
+    client = FakeLLMClient(latency=0, tokens_per_second=0)
+    companion = make_companion(client=client, response_cache=ResponseCache())
+    companion.time_sensitive_cache_ttl = 0
+    companion.web_searcher = WebSearcher(search_fn=lambda query, max_results: [])
+
+    companion.memory.clear_memory()
+    companion.generate_response("latest news")
+    companion.memory.clear_memory()
+    companion.generate_response("latest news")
+
+    assert client.backend.calls == 2
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
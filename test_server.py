@@ -0,0 +1,175 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from server import CompanionServer
+from write_behind import default_writer
+
+
+@pytest.fixture
+def serve(tmp_path, make_async_companion):
+    """Runs ``scenario(client, server)`` against a fresh server and returns (its result, the companion)."""
+    def run_scenario(scenario, latency=0, workers=8):
+        companion = make_async_companion(latency=latency, session_dir=str(tmp_path / "sessions"))
+        server = CompanionServer(companion, workers=workers, save_dir=str(tmp_path / "saved"))
+
+        async def run():
+            async with TestClient(TestServer(server.create_app())) as client:
+                return await scenario(client, server)
+
+        return asyncio.run(run()), companion
+
+    return run_scenario
+
+
+def test_chat_assigns_and_keeps_session_ids(tmp_path, serve):
+    async def scenario(client, server):
+        first = await (await client.post('/chat', json={'message': 'Hello there'})).json()
+        second = await (await client.post('/chat', json={'message': 'Again', 'session_id': first['session_id']})).json()
+        bad = await client.post('/chat', json={'session_id': 'x'})
+        bad_context = await client.post('/chat', json={'message': 'Hi', 'context': [1, 2]})
+        reserved = [
+            (await client.post('/chat', json={'message': 'Hi', 'context': context})).status
+            for context in ({'timestamp': 'garbage'}, {'user_preferences': 'x'}, {'detected_topics': None})
+        ]
+        return first, second, bad.status, bad_context.status, reserved
+
+    (first, second, bad_status, bad_context_status, reserved), companion = serve(scenario)
+
+    assert first['session_id'] == second['session_id'] and second['response']
+    assert bad_status == 400 and bad_context_status == 400
+    assert reserved == [400, 400, 400]
+    # Shutdown persisted the session
+    assert os.listdir(tmp_path / "sessions")
+    assert companion.get_memory(f"http:{first['session_id']}").conversations[-1].user_input == "Again"
+
+
+def test_websocket_streams_chunks(serve):
+    async def scenario(client, server):
+        frames = []
+        async with client.ws_connect('/ws?session_id=alice') as ws:
+            await ws.send_json({'message': 'Tell me a story'})
+            async for msg in ws:
+                frames.append(msg.json())
+                if frames[-1]['type'] == 'done':
+                    break
+        return frames
+
+    frames, companion = serve(scenario)
+
+    assert frames[0] == {'type': 'session', 'session_id': 'alice'}
+    assert [f['type'] for f in frames[1:]].count('chunk') > 1 and frames[-1]['type'] == 'done'
+    assert companion.get_memory('http:alice').conversations[0].user_input == 'Tell me a story'
+
+
+def test_http_sessions_cannot_reach_the_default_memory(serve):
+    async def scenario(client, server):
+        server.companion.memory.user_preferences['owner'] = 'operator'
+        await client.post('/chat', json={'message': 'Hello', 'session_id': 'default'})
+        return await (await client.post('/sessions/default/commands/preferences')).json()
+
+    prefs, companion = serve(scenario)
+
+    assert prefs['session_id'] == 'default' and prefs['response'] == "Current preferences: {}"
+    assert not companion.memory.conversations
+    assert companion.get_memory('http:default').conversations[0].user_input == 'Hello'
+
+
+def test_command_endpoints_are_confined_to_save_dir(tmp_path, serve):
+    async def scenario(client, server):
+        await client.post('/chat', json={'message': 'Hello', 'session_id': 'bob'})
+        save = await (await client.post('/sessions/bob/commands/save', json={'args': ['bob.json']})).json()
+        summary = await client.post('/sessions/bob/commands/summary')
+        escape = await client.post('/sessions/bob/commands/save', json={'args': ['../escape.json']})
+        inline = await (await client.post('/chat', json={'message': '/load ../../etc/passwd', 'session_id': 'bob'})).json()
+        unknown = await client.post('/sessions/bob/commands/exit')
+        return save, summary.status, escape.status, inline, unknown.status
+
+    (save, summary_status, escape_status, inline, unknown_status), _ = serve(scenario)
+
+    assert save['response'] == "Conversation saved to bob.json"
+    assert (tmp_path / "saved" / "session_bob" / "bob.json").exists()
+    assert summary_status == 200 and escape_status == 400 and unknown_status == 404
+    assert inline['response'].startswith("Error:")
+
+
+def test_sessions_do_not_share_preferences_or_files(serve):
+    async def scenario(client, server):
+        await client.post('/sessions/alice/commands/preferences', json={'args': ['tone=formal']})
+        await client.post('/chat', json={'message': 'Hello', 'session_id': 'alice'})
+        await client.post('/sessions/alice/commands/save', json={'args': ['notes.json']})
+        bob_prefs = await (await client.post('/sessions/bob/commands/preferences')).json()
+        bob_load = await (await client.post('/sessions/bob/commands/load', json={'args': ['notes.json']})).json()
+        alice_load = await (await client.post('/sessions/alice/commands/load', json={'args': ['notes.json']})).json()
+        return bob_prefs, bob_load, alice_load
+
+    (bob_prefs, bob_load, alice_load), companion = serve(scenario)
+
+    assert bob_prefs['response'] == "Current preferences: {}"
+    bob_prompt = companion._prepare_request("Hi", None, companion.get_memory('http:bob'))['messages'][0]['content']
+    alice_prompt = companion._prepare_request("Hi", None, companion.get_memory('http:alice'))['messages'][0]['content']
+    assert 'formal' not in bob_prompt and '"tone": "formal"' in alice_prompt
+    assert bob_load['response'].startswith("Error loading conversation")
+    assert alice_load['response'] == "Conversation loaded from notes.json"
+    assert not companion.get_memory('http:bob').conversations
+
+
+def test_search_only_sees_the_sessions_own_saves(serve):
+    async def scenario(client, server):
+        await client.post('/chat', json={'message': 'Tell me about quantum gardening', 'session_id': 'alice'})
+        await client.post('/sessions/alice/commands/save', json={'args': ['garden.json']})
+        await client.post('/chat', json={'message': 'Hello', 'session_id': 'bob'})
+        await client.post('/sessions/bob/commands/save')
+        assert default_writer().flush(timeout=5)
+        bob = await (await client.post('/chat', json={'message': '/search quantum', 'session_id': 'bob'})).json()
+        alice = await (await client.post('/sessions/alice/commands/search', json={'args': ['quantum']})).json()
+        return bob, alice
+
+    (bob, alice), companion = serve(scenario)
+    companion.archive.close()
+
+    assert bob['response'] == "No matching conversations found."
+    assert alice['response'].startswith("garden.json")
+    assert "quantum gardening" in alice['response']
+
+
+def test_commands_run_off_the_event_loop(serve):
+    threads = []
+
+    async def scenario(client, server):
+        server.companion.commands['summary'] = lambda args, memory: threads.append(threading.get_ident()) or "ok"
+        await client.post('/sessions/bob/commands/summary')
+        await client.post('/chat', json={'message': '/summary', 'session_id': 'bob'})
+        return threading.get_ident()
+
+    loop_thread, _ = serve(scenario)
+
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+def test_workers_bound_concurrency(serve):
+    async def scenario(client, server):
+        samples = []
+
+        async def sample():
+            while True:
+                samples.append(server.active)
+                await asyncio.sleep(0.005)
+
+        sampler = asyncio.ensure_future(sample())
+        await asyncio.gather(*(client.post('/chat', json={'message': 'hi', 'session_id': f"user-{i}"})
+                               for i in range(6)),
+                             *(client.post('/chat', json={'message': f"turn {i}", 'session_id': 'same'})
+                               for i in range(3)))
+        sampler.cancel()
+        health = await (await client.get('/health')).json()
+        return max(samples), health
+
+    (peak, health), companion = serve(scenario, latency=0.05, workers=2)
+
+    assert peak == 2
+    assert health['status'] == 'ok' and health['active'] == 0 and health['waiting'] == 0
+    assert sorted(i.user_input for i in companion.get_memory("http:same").conversations) == ["turn 0", "turn 1", "turn 2"]
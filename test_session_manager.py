@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+from session_manager import SessionManager, safe_session_name
+
+
+def test_lru_eviction_flushes_and_rehydrates(tmp_path):
+    manager = SessionManager(str(tmp_path / "sessions"), max_resident=2)
+    manager.get("alice").add_interaction("Remember my cat is Tom", "Noted!")
+    manager.get("bob").add_interaction("Hello", "Hi bob")
+    manager.get("bob").user_preferences['tone'] = 'casual'
+    manager.get("alice")
+    manager.get("carol")
+
+    assert manager.resident_ids() == ["alice", "carol"]
+    assert manager.stats()['evictions'] == 1
+    assert manager.writer.flush(timeout=5)
+    assert os.path.exists(manager.conversation_path("bob"))
+
+    bob = manager.get("bob")
+    assert [i.user_input for i in bob.conversations] == ["Hello"]
+    assert bob.user_preferences == {'tone': 'casual'}
+    assert "alice" not in manager
+
+    alice = manager.get("alice")
+    assert alice.get_relevant_memories("cat")[0].user_input == "Remember my cat is Tom"
+    manager.close()
+
+
+def test_sessions_in_use_and_pinned_are_not_evicted(tmp_path):
+    manager = SessionManager(str(tmp_path / "sessions"), max_resident=1)
+    manager.add("default", manager.get("default"), pinned=True)
+
+    with manager.use("alice") as alice:
+        manager.get("bob")
+        assert "alice" in manager and "default" in manager
+        alice.add_interaction("still here", "yes")
+
+    assert manager.resident_ids() == ["default"]
+    assert [i.user_input for i in manager.get("alice").conversations] == ["still here"]
+
+
+def test_resident_memories_cap_evicts_large_sessions(tmp_path):
+    manager = SessionManager(str(tmp_path / "sessions"), max_resident=10, max_resident_memories=5)
+    for i in range(4):
+        manager.get("big").add_interaction(f"Remember fact {i}", "Noted!")
+    manager.get("small").add_interaction("Remember one thing", "Noted!")
+    assert manager.resident_ids() == ["big", "small"]
+
+    manager.get("small").add_interaction("Remember another thing", "Noted!")
+    manager.get("other")
+
+    assert manager.resident_ids() == ["small", "other"]
+    assert manager.writer.flush(timeout=5)
+    assert manager.get("big").resident_size() == 4
+    manager.close()
+
+
+def test_cold_load_does_not_block_other_sessions(tmp_path):
+    manager = SessionManager(str(tmp_path / "sessions"), max_resident=4)
+    warm = manager.get("warm")
+    release = threading.Event()
+    load = manager._load
+    calls = []
+
+    def slow_load(session_id):
+        calls.append(session_id)
+        release.wait(timeout=5)
+        return load(session_id)
+
+    manager._load = slow_load
+    results = []
+    loaders = [threading.Thread(target=lambda: results.append(manager.get("cold"))) for _ in range(2)]
+    for thread in loaders:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+
+    # The cold load is still in progress, yet a resident session is served at once
+    start = time.monotonic()
+    assert manager.get("warm") is warm
+    with manager.use("warm") as memory:
+        assert memory is warm
+    assert time.monotonic() - start < 1
+    release.set()
+    for thread in loaders:
+        thread.join(timeout=5)
+
+    assert calls == ["cold"] and len(results) == 2 and results[0] is results[1]
+    manager.close()
+
+
+def test_sqlite_backend_shares_one_database(tmp_path):
+    manager = SessionManager(str(tmp_path / "sessions"), max_resident=1, memory_backend='sqlite')
+    manager.get("alice").add_interaction("Remember I like tea", "Noted!")
+    manager.get("bob").add_interaction("Remember I like coffee", "Noted!")
+
+    assert os.listdir(tmp_path / "sessions").count("long_term_memory.sqlite") == 1
+    assert [m.user_input for m in manager.get("alice").get_relevant_memories("tea coffee")] == ["Remember I like tea"]
+    manager.close()
+
+
+def test_companion_routes_sessions(make_companion):
+    companion = make_companion(max_sessions=1)
+
+    companion.generate_response("Hello from alice", session_id="alice")
+    companion.generate_response("Hello from bob", session_id="bob")
+    companion.generate_response("Hello from the CLI")
+
+    assert [i.user_input for i in companion.get_memory("alice").conversations] == ["Hello from alice"]
+    assert [i.user_input for i in companion.memory.conversations] == ["Hello from the CLI"]
+
+
+def test_safe_session_name_avoids_collisions():
+    assert safe_session_name("user-42") == "user-42"
+    assert safe_session_name("a/b") != safe_session_name("a_b")
@@ -0,0 +1,32 @@
+import startup_profile
+from ai_companion import AICompanion
+
+
+def test_construction_defers_client_store_and_searcher(tmp_path, monkeypatch, personality_file):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    companion = AICompanion(personality_file)
+
+    assert not companion.llm.client_ready
+    assert not companion.memory.store_loaded
+    assert companion._web_searcher is None
+
+    companion.warm_up().join(30)
+    assert companion.llm.client_ready and companion.memory.store_loaded
+    assert companion._web_searcher is not None
+
+
+def test_lazy_store_is_opened_by_the_first_turn(make_companion):
+    companion = make_companion()
+
+    companion.generate_response("Please remember that my cat is called Tom")
+
+    assert companion.memory.store_loaded
+    assert len(companion.memory.long_term_memory) == 1
+
+
+def test_import_profile_lists_first_party_modules():
+    report = startup_profile.profile_imports('ai_companion')
+
+    assert report['total_ms'] > 0
+    assert 'conversation_memory' in report['first_party_ms']
@@ -0,0 +1,23 @@
+def test_stream_yields_chunks_and_saves_interaction(make_companion):
+    companion = make_companion(reply="Hello there, how are you?")
+
+    chunks = list(companion.generate_response_stream("Hi!"))
+
+    assert len(chunks) > 1
+    assert ''.join(chunks) == "Hello there, how are you?"
+    assert companion.memory.conversations[-1]['ai_response'] == "Hello there, how are you?"
+    metrics = companion.last_turn_metrics
+    assert 0 <= metrics['time_to_first_token'] <= metrics['total_latency']
+
+
+def test_stream_handles_commands(make_companion):
+    companion = make_companion(reply="unused")
+
+    chunks = list(companion.generate_response_stream("/clear"))
+
+    assert chunks == ["Conversation history cleared!"]
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,75 @@
+import numpy as np
+
+from conversation_memory import ConversationMemory
+from vector_store import HashingEmbedder, VectorMemoryStore
+
+
+class _CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+def test_hashing_embedder_is_normalized_and_deterministic():
+    embedder = HashingEmbedder(dim=128)
+    first = embedder.embed(["my dog loves the park", ""])
+    second = embedder.embed(["my dog loves the park"])
+
+    assert np.allclose(np.linalg.norm(first[0]), 1.0)
+    assert np.allclose(first[0], second[0])
+    assert not first[1].any()
+
+
+def test_cosine_top_k_ranks_most_similar_first():
+    store = VectorMemoryStore(HashingEmbedder(dim=256))
+    store.add_many(range(3), ["I play the piano every evening", "my dog loves the park", "piano lessons on tuesday"])
+
+    results = store.search("dog park", limit=2)
+
+    assert results[0][0] == 1
+    assert len(results) <= 2
+
+
+def test_embeddings_are_cached_on_disk(tmp_path):
+    cache_path = str(tmp_path / "embeddings.npz")
+    embedder = _CountingEmbedder()
+    store = VectorMemoryStore(embedder, cache_path=cache_path)
+    store.add_many(range(2), ["alpha beta", "gamma delta"])
+    store.save()
+
+    embedder = _CountingEmbedder()
+    reloaded = VectorMemoryStore(embedder, cache_path=cache_path)
+    reloaded.add_many(range(2), ["alpha beta", "gamma delta"])
+
+    assert embedder.embedded == 0
+
+
+def test_queries_are_not_written_to_the_disk_cache(tmp_path):
+    embedder = _CountingEmbedder()
+    store = VectorMemoryStore(embedder, cache_path=str(tmp_path / "embeddings.npz"), query_cache_size=2)
+    store.add_many(range(2), ["alpha beta", "gamma delta"])
+    store.save()
+
+    for query in ["alpha", "gamma", "alpha", "alpha beta"]:
+        store.search(query)
+
+    assert len(store.cache._vectors) == 2 and not store.cache._dirty
+    # "alpha" came from the query LRU the second time; "alpha beta" is a stored document
+    assert embedder.embedded == 4
+
+
+def test_memory_uses_vector_store_for_retrieval(tmp_path):
+    memory = ConversationMemory(memory_file=str(tmp_path / "ltm.json"), vector_store=VectorMemoryStore())
+    memory.add_interaction("Remember that my favorite food is sushi", "Noted!")
+    memory.add_interaction("Note: my brother plays guitar", "Cool!")
+
+    assert memory.get_relevant_memories("favorite food")[0]['user_input'] == "Remember that my favorite food is sushi"
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-q"])
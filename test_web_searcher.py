@@ -0,0 +1,146 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import threading
+import time
+
+import pytest
+
+from web_searcher import WebSearcher
+
+PAGES = {
+    '/rust': b"<html><head><title>x</title><script>var ignored = 1;</script></head>"
+             b"<body><p>Rust 2.0 was released today. It has a new borrow checker.</p>"
+             b"<p>Unrelated footer text.</p></body></html>",
+    '/python': b"<html><body><p>Python 4 is not planned. The Python release cycle is yearly.</p></body></html>",
+    '/big': b"<html><body>" + b"<p>filler sentence about rust.</p>" * 5000 + b"</body></html>",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(2)
+        body = PAGES.get(self.path, b"<p>slow page about rust.</p>")
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _searcher(base, paths, **kwargs):
+    calls = []
+
+    def search_fn(query, max_results):
+        calls.append(query)
+        return [{'title': p.strip('/'), 'url': base + p, 'snippet': ''} for p in paths][:max_results]
+
+    searcher = WebSearcher(search_fn=search_fn, **kwargs)
+    return searcher, calls
+
+
+def test_fetches_pages_and_extracts_relevant_sentences(server):
+    searcher, _ = _searcher(server, ['/rust', '/python'])
+
+    summary = searcher.search_and_summarize("rust release")
+
+    assert "Rust 2.0 was released today." in summary
+    assert "ignored" not in summary
+    assert "Python 4 is not planned." in summary or "Python release cycle" in summary
+
+
+def test_total_deadline_skips_slow_pages(server):
+    searcher, _ = _searcher(server, ['/rust', '/slow'], total_deadline=0.5)
+
+    start = time.monotonic()
+    summary = searcher.search_and_summarize("rust")
+
+    assert time.monotonic() - start < 1.5
+    assert "Rust 2.0" in summary
+    assert "slow page" not in summary
+
+
+def test_total_deadline_covers_the_search_call(server):
+    def slow_search(query, max_results):
+        time.sleep(1.0)
+        return [{'title': 'Rust', 'url': server + '/rust', 'snippet': ''}]
+
+    searcher = WebSearcher(search_fn=slow_search, total_deadline=0.2)
+    start = time.monotonic()
+    summary = searcher.search_and_summarize("rust")
+
+    assert time.monotonic() - start < 0.6
+    assert summary == ""
+    assert searcher.query_cache.get("rust") is None
+
+
+def test_page_size_is_capped(server):
+    searcher, _ = _searcher(server, ['/big'], max_page_chars=2000)
+
+    text = searcher.fetch_text(server + '/big')
+
+    assert len(text) <= 2000
+
+
+def test_results_are_cached_by_query(server):
+    searcher, calls = _searcher(server, ['/rust'])
+
+    first = searcher.search_and_summarize("Rust release")
+    second = searcher.search_and_summarize("rust   release")
+
+    assert first == second
+    assert len(calls) == 1
+    assert searcher.query_cache.stats()['hits'] == 1
+
+
+def _companion_with_search_delay(make_companion, delay):
+    companion = make_companion()
+
+    def search_and_summarize(query):
+        time.sleep(delay)
+        return "Fresh web result"
+
+    companion.web_searcher = SimpleNamespace(search_and_summarize=search_and_summarize)
+    companion.web_search_budget = 0.3
+    return companion
+
+
+def test_slow_web_search_is_dropped_after_budget(make_companion):
+    companion = _companion_with_search_delay(make_companion, delay=1.0)
+
+    start = time.perf_counter()
+    request = companion._prepare_request("latest news", None, companion.memory)
+
+    assert time.perf_counter() - start < 0.8
+    assert request['web_search_used'] is False
+    assert "Fresh web result" not in request['messages'][0]['content']
+
+
+def test_fast_web_search_is_used_and_stages_are_timed(make_companion):
+    companion = _companion_with_search_delay(make_companion, delay=0.05)
+
+    companion.generate_response("latest news")
+
+    metrics = companion.last_turn_metrics
+    assert metrics['web_search_used'] is True
+    assert {'routing', 'memory_retrieval', 'context', 'web_search', 'prompt_assembly', 'llm'} <= set(metrics['stages'])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+
+from conversation_memory import ConversationMemory
+from interaction import Interaction
+from memory_store import JournalMemoryStore
+from session_manager import SessionManager
+from write_behind import WriteBehindWorker, atomic_write_json
+
+
+def test_submits_for_one_key_coalesce_into_one_write():
+    writer = WriteBehindWorker(delay=60)
+    written = []
+
+    writer.submit('a', lambda: written.append(1))
+    writer.submit('a', lambda: written.append(2))
+    writer.submit('b', lambda: written.append(3))
+    assert written == [] and writer.is_pending('a')
+
+    assert writer.flush(timeout=5)
+    assert sorted(written) == [2, 3]
+    assert writer.stats() == {'pending': 0, 'writes': 2, 'coalesced': 1, 'errors': 0}
+
+
+def test_write_errors_are_counted_and_do_not_stop_the_worker():
+    writer = WriteBehindWorker(delay=0)
+    done = threading.Event()
+
+    writer.submit('bad', lambda: 1 / 0)
+    writer.submit('good', done.set)
+
+    assert done.wait(5)
+    assert writer.flush(timeout=5)
+    assert writer.stats()['errors'] == 1
+
+
+def test_atomic_write_leaves_no_temp_file(tmp_path):
+    path = str(tmp_path / "nested" / "data.json")
+    atomic_write_json(path, {'a': 1})
+    atomic_write_json(path, {'a': 2})
+
+    assert json.load(open(path)) == {'a': 2}
+    assert os.listdir(tmp_path / "nested") == ["data.json"]
+
+
+def test_journal_appends_reach_disk_on_flush(tmp_path):
+    writer = WriteBehindWorker(delay=60)
+    store = JournalMemoryStore(str(tmp_path / "ltm.json"), writer=writer)
+    store.append(Interaction("Remember my cat is Tom", "Noted!"))
+
+    assert not os.path.exists(store.journal.path)
+    assert store.search("cat")
+    writer.flush(timeout=5)
+    reopened = JournalMemoryStore(str(tmp_path / "ltm.json"), writer=writer)
+    assert [m.user_input for m in reopened] == ["Remember my cat is Tom"]
+
+
+def test_background_save_snapshots_the_conversation(tmp_path):
+    writer = WriteBehindWorker(delay=60)
+    memory = ConversationMemory(memory_file=str(tmp_path / "ltm.json"))
+    memory.add_interaction("Hello", "Hi")
+    filename = str(tmp_path / "conversation.json")
+
+    memory.save_in_background(filename, writer=writer)
+    memory.add_interaction("After the save", "Ok")
+    writer.flush(timeout=5)
+
+    assert [c['user_input'] for c in json.load(open(filename))['conversations']] == ["Hello"]
+
+
+def test_evicted_session_waits_for_its_pending_save(tmp_path):
+    writer = WriteBehindWorker(delay=60)
+    manager = SessionManager(str(tmp_path / "sessions"), max_resident=1, writer=writer)
+    manager.get("alice").add_interaction("Remember I like tea", "Noted!")
+    manager.get("bob")
+
+    assert writer.is_pending(manager._write_key("alice"))
+    alice = manager.get("alice")
+    assert [i.user_input for i in alice.conversations] == ["Remember I like tea"]
+    manager.close()
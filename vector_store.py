@@ -0,0 +1,218 @@
+"""
+Embedding-backed store for semantic long-term memory retrieval.
+
+Embedders are pluggable: any object with a ``name`` attribute and an
+``embed(texts) -> np.ndarray`` method works. The default HashingEmbedder runs
+fully offline, so semantic retrieval does not cost an API call per turn.
+Embeddings are computed in batches and cached on disk by content hash.
+Query embeddings are only kept in a small in-memory LRU, so retrieval does
+not grow the disk cache with every user message.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import os
+import uuid
+import zlib
+import numpy as np
+from memory_index import tokenize
+
+
+class HashingEmbedder:
+    """Local embedder that hashes word unigrams and bigrams into a fixed-size vector."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                # crc32 is stable across processes, unlike hash(), so cached vectors stay valid
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(np.sign(vectors) * np.log1p(np.abs(vectors)))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class EmbeddingCache:
+    """On-disk cache of embeddings keyed by a hash of the embedder name and text."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    for key, vector in zip(data['keys'], data['vectors']):
+                        self._vectors[str(key)] = vector
+            except Exception as e:
+                print(f"Error loading embedding cache: {e}")
+
+    @staticmethod
+    def key(embedder_name: str, text: str) -> str:
+        return hashlib.sha1(f"{embedder_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self._vectors.get(key)
+
+    def put(self, key: str, vector: np.ndarray):
+        self._vectors[key] = vector
+        self._dirty = True
+
+    def save(self):
+        """Write the cache to disk atomically if it has changed."""
+        if not self.path or not self._dirty or not self._vectors:
+            return
+        keys = list(self._vectors)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, keys=np.array(keys), vectors=np.stack([self._vectors[k] for k in keys]))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class ChromaANNIndex:
+    """Approximate nearest-neighbour index backed by an in-process chromadb collection."""
+
+    def __init__(self):
+        import chromadb
+
+        self._client = chromadb.Client()
+        # Collections of an in-process client are shared, so give each store its own
+        self._collection = self._client.create_collection(
+            f"memory_{uuid.uuid4().hex}", metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids: List[int], vectors: np.ndarray):
+        self._collection.add(ids=[str(i) for i in ids], embeddings=vectors.tolist())
+
+    def search(self, vector: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        result = self._collection.query(query_embeddings=[vector.tolist()], n_results=limit)
+        return [(int(i), 1.0 - float(d)) for i, d in zip(result['ids'][0], result['distances'][0])]
+
+
+class VectorMemoryStore:
+    """
+    Holds one normalized embedding per memory in a contiguous matrix and answers
+    cosine top-k queries with a single matrix-vector product. Once the store grows
+    past ``ann_threshold`` entries, queries go to an ANN index instead when chromadb
+    is installed.
+    """
+
+    def __init__(self, embedder=None, cache_path: Optional[str] = None,
+                 ann_threshold: Optional[int] = None, query_cache_size: int = 256):
+        self.embedder = embedder or HashingEmbedder()
+        self.cache = EmbeddingCache(cache_path)
+        self.query_cache_size = query_cache_size
+        self._query_vectors: OrderedDict = OrderedDict()
+        self.ann_threshold = ann_threshold
+        self._ann = None
+        self._matrix = None
+        self._ids: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one batch, reusing cached vectors where possible."""
+        keys = [EmbeddingCache.key(self.embedder.name, text) for text in texts]
+        vectors: List[Optional[np.ndarray]] = [self.cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embedder.embed([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+                self.cache.put(keys[i], vector)
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack(vectors).astype(np.float32)
+
+    def add_many(self, ids: Iterable[int], texts: List[str]):
+        """Add a batch of documents."""
+        ids = list(ids)
+        if not ids:
+            return
+        vectors = self.embed(texts)
+        self._append(ids, vectors)
+
+    def add(self, doc_id: int, text: str):
+        self.add_many([doc_id], [text])
+
+    def clear(self):
+        self._matrix = None
+        self._ids = []
+        self._ann = None
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """Return up to ``limit`` (doc_id, cosine similarity) pairs, best first."""
+        count = len(self._ids)
+        if not count or limit <= 0:
+            return []
+        query_vector = self._embed_query(query)
+        if self._ann is not None:
+            return self._ann.search(query_vector, min(limit, count))
+
+        scores = self._matrix[:count] @ query_vector
+        if limit < count:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self._ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a retrieval query, reusing document and recent query vectors without persisting it."""
+        key = EmbeddingCache.key(self.embedder.name, query)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        vector = self._query_vectors.get(key)
+        if vector is not None:
+            self._query_vectors.move_to_end(key)
+            return vector
+        vector = self.embedder.embed([query])[0].astype(np.float32)
+        self._query_vectors[key] = vector
+        if len(self._query_vectors) > self.query_cache_size:
+            self._query_vectors.popitem(last=False)
+        return vector
+
+    def save(self):
+        self.cache.save()
+
+    def _append(self, ids: List[int], vectors: np.ndarray):
+        count = len(self._ids)
+        needed = count + len(ids)
+        if self._matrix is None or needed > self._matrix.shape[0]:
+            # Grow geometrically so repeated single inserts stay amortized O(1)
+            capacity = max(needed, 64, 0 if self._matrix is None else self._matrix.shape[0] * 2)
+            matrix = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._matrix is not None:
+                matrix[:count] = self._matrix[:count]
+            self._matrix = matrix
+        self._matrix[count:needed] = vectors
+        self._ids.extend(ids)
+
+        if self._ann is not None:
+            self._ann.add(ids, vectors)
+        elif self.ann_threshold is not None and needed >= self.ann_threshold:
+            self._build_ann()
+
+    def _build_ann(self):
+        try:
+            ann = ChromaANNIndex()
+        except ImportError:
+            # chromadb is optional; keep using exact search without it
+            self.ann_threshold = None
+            return
+        ann.add(self._ids, self._matrix[:len(self._ids)])
+        self._ann = ann
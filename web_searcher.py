@@ -0,0 +1,174 @@
+"""
+Web search for questions that need current information.
+
+Result pages are fetched concurrently with per-request timeouts and an overall
+deadline, their text is extracted incrementally while downloading (up to a size
+cap), and both page text and per-query summaries are cached with a TTL.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+import codecs
+import re
+import time
+import requests
+from memory_index import tokenize
+from response_cache import ResponseCache
+
+_SENTENCE_RE = re.compile(r"\S.*?[.!?](?=\s|$)", re.S)
+
+
+def duckduckgo_search(query: str, max_results: int) -> List[Dict[str, str]]:
+    """Search DuckDuckGo and return dicts with 'title', 'url' and 'snippet'."""
+    from duckduckgo_search import DDGS
+
+    with DDGS() as ddgs:
+        results = list(ddgs.text(query, max_results=max_results))
+    return [
+        {'title': r.get('title', ''), 'url': r.get('href', ''), 'snippet': r.get('body', '')}
+        for r in results
+    ]
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text from HTML fed to it in chunks."""
+
+    _SKIP_TAGS = {'script', 'style', 'noscript', 'head', 'svg', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.length = 0
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = data.strip()
+        if text:
+            self.parts.append(text)
+            self.length += len(text) + 1
+
+    def text(self) -> str:
+        return ' '.join(self.parts)
+
+
+class WebSearcher:
+    def __init__(self, search_fn: Optional[Callable[[str, int], List[Dict[str, str]]]] = None,
+                 max_results: int = 4, max_workers: int = 4, request_timeout: float = 3.0,
+                 total_deadline: float = 6.0, max_page_bytes: int = 512 * 1024,
+                 max_page_chars: int = 20000, cache_ttl: float = 600.0):
+        self.search_fn = search_fn or duckduckgo_search
+        self.max_results = max_results
+        self.request_timeout = request_timeout
+        self.total_deadline = total_deadline
+        self.max_page_bytes = max_page_bytes
+        self.max_page_chars = max_page_chars
+
+        self.page_cache = ResponseCache(max_entries=256, ttl=cache_ttl)
+        self.query_cache = ResponseCache(max_entries=256, ttl=cache_ttl)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Mozilla/5.0 (compatible; AICompanion/1.0)'
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-fetch")
+
+    def search_and_summarize(self, query: str) -> str:
+        """Search the web and return a short digest of the most relevant passages."""
+        cache_key = ' '.join(query.lower().split())
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        deadline = time.monotonic() + self.total_deadline
+        # The search itself counts against the deadline; a search that misses it yields no digest
+        search = self._executor.submit(self.search_fn, query, self.max_results)
+        try:
+            found = search.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            return ""
+        results = [r for r in found if r.get('url')]
+        pages = self.fetch_pages([r['url'] for r in results], deadline)
+
+        sections = []
+        for result in results:
+            passages = self._relevant_passages(pages.get(result['url'], ''), query)
+            body = ' '.join(passages) or result.get('snippet', '')
+            if body:
+                sections.append(f"Source: {result.get('title') or result['url']} ({result['url']})\n{body}")
+
+        summary = '\n\n'.join(sections)
+        if summary:
+            self.query_cache.set(cache_key, summary)
+        return summary
+
+    def fetch_pages(self, urls: List[str], deadline: float) -> Dict[str, str]:
+        """Fetch pages concurrently; pages not finished by ``deadline`` are left out."""
+        pages = {}
+        futures = {}
+        for url in urls:
+            cached = self.page_cache.get(url)
+            if cached is not None:
+                pages[url] = cached
+            else:
+                futures[self._executor.submit(self.fetch_text, url, deadline)] = url
+
+        if futures:
+            done, _ = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+            for future in done:
+                url = futures[future]
+                try:
+                    text = future.result()
+                except Exception:
+                    continue
+                pages[url] = text
+                self.page_cache.set(url, text)
+        return pages
+
+    def fetch_text(self, url: str, deadline: Optional[float] = None) -> str:
+        """Download a page and extract its text, stopping at the size cap or the deadline."""
+        timeout = self.request_timeout
+        if deadline is not None:
+            timeout = max(0.1, min(timeout, deadline - time.monotonic()))
+
+        extractor = _TextExtractor()
+        with self.session.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', 'text/html')
+            if 'html' not in content_type and 'text' not in content_type:
+                return ''
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            received = 0
+            for chunk in response.iter_content(chunk_size=8192):
+                received += len(chunk)
+                extractor.feed(decoder.decode(chunk))
+                if (received >= self.max_page_bytes or extractor.length >= self.max_page_chars
+                        or (deadline is not None and time.monotonic() >= deadline)):
+                    break
+        extractor.close()
+        return extractor.text()[:self.max_page_chars]
+
+    @staticmethod
+    def _relevant_passages(text: str, query: str, limit: int = 3) -> List[str]:
+        """Pick the sentences sharing the most terms with the query, in page order."""
+        terms = set(tokenize(query))
+        if not text or not terms:
+            return []
+        scored = []
+        for position, match in enumerate(_SENTENCE_RE.finditer(text)):
+            sentence = ' '.join(match.group().split())
+            score = len(terms.intersection(tokenize(sentence)))
+            if score and len(sentence) <= 400:
+                scored.append((score, position, sentence))
+        best = sorted(scored, key=lambda item: (-item[0], item[1]))[:limit]
+        return [sentence for _, _, sentence in sorted(best, key=lambda item: item[1])]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,125 @@
+"""
+Write-behind persistence off the response path.
+
+Callers hand a write function to the worker under a key and return at once.
+A single background thread runs the writes after a short delay; a write
+submitted while another one for the same key is still pending replaces it, so
+bursts of saves collapse into one. Pending writes are flushed on ``flush()``
+and at interpreter exit.
+"""
+from typing import Callable, Dict, Hashable, Optional, Tuple
+import atexit
+import json
+import os
+import threading
+import time
+
+
+def atomic_write_text(path: str, text: str):
+    """Write a file via a temp file, fsync and rename, so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = None):
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+class WriteBehindWorker:
+    """
+    Background thread that runs ``write_fn`` callables ``delay`` seconds after
+    they were first submitted. Later submissions for a pending key replace the
+    queued callable (and can only bring its deadline forward).
+    """
+
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+        self._pending: Dict[Hashable, Tuple[float, Callable[[], None]]] = {}
+        self._running: Optional[Hashable] = None
+        self._cond = threading.Condition()
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Hashable, write_fn: Callable[[], None], delay: Optional[float] = None):
+        """Queue ``write_fn`` under ``key``. Never blocks on I/O."""
+        due = time.monotonic() + (self.delay if delay is None else delay)
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                due = min(due, pending[0])
+            self._pending[key] = (due, write_fn)
+            self._cond.notify()
+
+    def is_pending(self, key: Hashable) -> bool:
+        with self._cond:
+            return key in self._pending or self._running == key
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Run every pending write now and wait for them. Returns False on timeout."""
+        if threading.current_thread() is self._thread:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            for key, (_, write_fn) in list(self._pending.items()):
+                self._pending[key] = (0.0, write_fn)
+            self._cond.notify_all()
+            while self._pending or self._running is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {'pending': len(self._pending), 'writes': self.writes,
+                    'coalesced': self.coalesced, 'errors': self.errors}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        key, (due, write_fn) = min(self._pending.items(), key=lambda item: item[1][0])
+                        wait = due - time.monotonic()
+                        if wait <= 0:
+                            del self._pending[key]
+                            self._running = key
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            try:
+                write_fn()
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in background write: {e}")
+            with self._cond:
+                self._running = None
+                self.writes += 1
+                self._cond.notify_all()
+
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def default_writer() -> WriteBehindWorker:
+    """Return the process-wide write-behind worker, starting it on first use."""
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = WriteBehindWorker()
+            atexit.register(_default_writer.flush, 10.0)
+        return _default_writer